@@ -1,6 +1,26 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Product, Order, OrderItem , StockTransaction 
+from .models import User, Product, Order, OrderItem , StockTransaction , DailyRollup, StockSnapshot
+from . import routers
+
+
+class ReplicaChangelistMixin:
+    """Run the changelist (and its counts) on the read replica; edits pin the user to the primary."""
+
+    def changelist_view(self, request, extra_context=None):
+        with routers.reading_from_replica(request.user, replica=request.method == "GET"):
+            response = super().changelist_view(request, extra_context)
+            if hasattr(response, "render"):
+                response.render()
+        return response
+
+    def changeform_view(self, request, *args, **kwargs):
+        with routers.reading_from_replica(request.user, replica=False):
+            return super().changeform_view(request, *args, **kwargs)
+
+    def delete_view(self, request, *args, **kwargs):
+        with routers.reading_from_replica(request.user, replica=False):
+            return super().delete_view(request, *args, **kwargs)
 
 
 @admin.register(User)
@@ -25,29 +45,57 @@ class ProductAdmin(admin.ModelAdmin):
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ("id", "customer", "status", "get_total", "created_at", "updated_at")
     list_filter = ("status", "created_at")
     search_fields = ("customer__username",)
     ordering = ("-created_at",)
+    list_select_related = ("customer",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals()
 
-    @admin.display(description="Total Price")
+    @admin.display(description="Total Price", ordering="total_price")
     def get_total(self, obj):
         return obj.get_total_price()
 
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ("order", "product", "quantity", "get_total")
     search_fields = ("product__name",)
+    list_select_related = ("order__customer", "product")
 
     @admin.display(description="Total")
     def get_total(self, obj):
         return obj.get_total_price()
 
 @admin.register(StockTransaction)
-class StockTransactionAdmin(admin.ModelAdmin):
+class StockTransactionAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ("product", "transaction_type", "quantity", "date", "created_at")
     list_filter = ("transaction_type", "date")
     search_fields = ("product__name",)
     ordering = ("-created_at",)
+
+    # Append-only ledger: fix mistakes with a new transaction instead.
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ("date", "product", "stock_in", "stock_out", "stock_closed", "revenue")
+    list_filter = ("date",)
+    search_fields = ("product__name",)
+    list_select_related = ("product",)
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ("date", "product", "balance", "created_at")
+    list_filter = ("date",)
+    search_fields = ("product__name",)
+    list_select_related = ("product",)
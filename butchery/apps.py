@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ButcheryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'butchery'
+
+    def ready(self):
+        from . import database, metrics, signals, tasks  # noqa: F401
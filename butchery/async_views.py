@@ -0,0 +1,143 @@
+"""
+Async read endpoints for the ASGI application (``tamucuts.asgi``).
+
+These mirror the busiest read paths (product catalog, daily report and the
+scale-reading feed) as native Django async views using the async ORM, so a
+single ASGI worker can keep many slow polls in flight at once. ``live_feed``
+replaces polling altogether with server-sent events from ``butchery.live``.
+"""
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
+
+from . import catalog, live, reports, routers
+from .authentication import CachedJWTAuthentication
+from .renderers import FastJSONRenderer
+from .models import Product, ScaleReading
+from .serializers import ProductSerializer, ScaleReadingSerializer
+
+FEED_LIMIT = 500
+HEARTBEAT_SECONDS = 15
+
+
+async def authenticate(request):
+    """Resolve the user from a JWT bearer token, falling back to the session."""
+    try:
+        result = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    if result is not None:
+        return result[0]
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+def unauthorized():
+    return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+
+def render(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), content_type="application/json", status=status)
+
+
+@require_GET
+async def product_catalog(request):
+    if await authenticate(request) is None:
+        return unauthorized()
+    tag = catalog.etag(await catalog.aget_version(), request)
+    if catalog.etag_matches(tag, request.headers.get("If-None-Match")):
+        response = HttpResponseNotModified()
+        response["ETag"] = tag
+        return response
+    body = await catalog.aget_body(tag)
+    if body is None:
+        products = [product async for product in Product.objects.aiterator(chunk_size=1000)]
+        body = FastJSONRenderer().render(ProductSerializer(products, many=True).data)
+        await catalog.aset_body(tag, body)
+    response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = tag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@require_GET
+async def daily_report(request, date):
+    user = await authenticate(request)
+    if user is None:
+        return unauthorized()
+    if user.role != "admin":
+        return JsonResponse({"detail": "You do not have permission to perform this action."}, status=403)
+    try:
+        start = datetime.strptime(date, "%Y-%m-%d").date()
+        end = request.GET.get("end")
+        end = datetime.strptime(end, "%Y-%m-%d").date() if end else start
+    except ValueError:
+        return JsonResponse({"error": "Invalid date format. Use YYYY-MM-DD."}, status=400)
+    with routers.reading_from_replica(user):
+        report = {"date": date, **await reports.asummarize(start, end)}
+    if end != start:
+        report["end"] = end.isoformat()
+    return render(report)
+
+
+@require_GET
+async def scale_reading_feed(request):
+    """
+    Readings newer than ``?after=<id>``, oldest first. Displays poll with the
+    ``last_id`` of the previous page.
+    """
+    if await authenticate(request) is None:
+        return unauthorized()
+    try:
+        after = int(request.GET.get("after", 0))
+        limit = min(max(int(request.GET.get("limit", 100)), 1), FEED_LIMIT)
+    except ValueError:
+        return JsonResponse({"error": "after and limit must be integers."}, status=400)
+    readings = ScaleReading.objects.select_related("product").filter(id__gt=after).order_by("id")[:limit]
+    readings = [reading async for reading in readings]
+    return render({
+        "results": ScaleReadingSerializer(readings, many=True).data,
+        "last_id": readings[-1].id if readings else after,
+    })
+
+
+@require_GET
+async def live_feed(request):
+    """
+    Server-sent events for front-counter displays: ``scale_reading`` and
+    ``stock`` events (narrow with ``?topics=stock``), a ``resync`` event when
+    the display fell behind and must re-fetch, and a heartbeat comment.
+    Reconnecting browsers resume from ``Last-Event-ID``.
+    """
+    if await authenticate(request) is None:
+        return unauthorized()
+    topics = [topic for topic in request.GET.get("topics", "").split(",") if topic]
+    if set(topics) - set(live.TOPICS):
+        return JsonResponse({"error": f"topics must be among: {', '.join(live.TOPICS)}."}, status=400)
+    try:
+        last_event_id = int(request.headers["Last-Event-ID"])
+    except (KeyError, ValueError):
+        last_event_id = None
+
+    async def stream():
+        subscription = live.hub.subscribe(topics, last_event_id)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                events, overflowed = await subscription.get(timeout=HEARTBEAT_SECONDS)
+                if overflowed:
+                    yield f"id: {live.hub.last_id}\nevent: resync\ndata: {{}}\n\n"
+                for event in events:
+                    yield event.encode()
+                if not events and not overflowed:
+                    yield ": keepalive\n\n"
+        finally:
+            live.hub.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,104 @@
+"""
+Token-first API authentication.
+
+``CachedJWTAuthentication`` resolves the user id from a verified access
+token and loads the ``User`` from a short-lived cache rather than the
+database on every call; ``signals.py`` drops the entry whenever the user is
+saved or deleted. Only the fields authentication and permissions need are
+cached (never the password hash); the user is rebuilt from them with the
+other fields deferred. The cache named by ``AUTH_USER_CACHE_ALIAS`` is per
+process with the local-memory default, so other workers may serve a
+changed user for up to ``AUTH_USER_CACHE_TIMEOUT`` seconds; use a shared
+backend when that matters.
+
+Tokens carry the user's ``role`` so clients can shape their UI without
+fetching the profile. Permissions still check the (cached) ``User``, so a
+role change takes effect without waiting for old tokens to expire.
+
+HTTP Basic authentication, which costs a password hash per request, is only
+accepted by the opt-in ``/api/token/basic/`` exchange, throttled per client
+by ``BasicAuthRateThrottle`` before the password is checked.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.throttling import SimpleRateThrottle
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def _cache():
+    return caches[getattr(settings, "AUTH_USER_CACHE_ALIAS", "default")]
+
+
+# What the API reads from ``request.user``; other fields load on access.
+CACHED_FIELDS = ("id", "username", "role", "is_active", "is_staff", "is_superuser")
+
+
+def _user_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def forget_user(user_id):
+    """Drop a cached user; called when the row changes."""
+    _cache().delete(_user_key(user_id))
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["role"] = user.role
+        return token
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` with the user row served from the cache."""
+
+    def cached_fields(self):
+        # from_db() takes deferred-instance values in model field order.
+        return [field.attname for field in self.user_model._meta.concrete_fields if field.attname in CACHED_FIELDS]
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        cache = _cache()
+        cached = cache.get(_user_key(user_id))
+        if cached is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            # The revoke claim is this digest, so caching it adds nothing a token lacks.
+            cached = {
+                "values": [getattr(user, name) for name in self.cached_fields()],
+                "revoke": get_md5_hash_password(user.password) if api_settings.CHECK_REVOKE_TOKEN else None,
+            }
+            cache.set(_user_key(user_id), cached, getattr(settings, "AUTH_USER_CACHE_TIMEOUT", 60))
+        else:
+            user = self.user_model.from_db(self.user_model.objects.db, self.cached_fields(), cached["values"])
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != cached["revoke"]:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
+
+
+class BasicAuthRateThrottle(SimpleRateThrottle):
+    """Per-client (IP) limit on Basic-auth attempts, successful or not."""
+    scope = "basic_auth"
+
+    def get_rate(self):
+        return getattr(settings, "BASIC_AUTH_RATE", "5/minute")
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {"scope": self.scope, "ident": self.get_ident(request)}
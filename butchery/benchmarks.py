@@ -0,0 +1,358 @@
+"""
+Helpers for the benchmark management commands: drive the WSGI and ASGI
+applications in-process with the Django test clients and summarise the
+timings as JSON-friendly dicts.
+"""
+import asyncio
+import json
+import multiprocessing
+import random
+import statistics
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import OperationalError, connection, connections
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import pricing, renderers
+from .models import DailyRollup, Order, OrderItem, Product, ScaleReading, StockTransaction
+
+SUITE_MODELS = (Product, Order, OrderItem, StockTransaction, ScaleReading)
+
+
+def test_hosts():
+    """Let the test clients' ``testserver`` host through ALLOWED_HOSTS for a run."""
+    return override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"])
+
+
+def summarize(latencies, elapsed):
+    """Throughput and p50/p95 latency (milliseconds) for one run."""
+    latencies = sorted(latencies)
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 4),
+        "requests_per_second": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+    }
+
+
+def run_wsgi(url, headers, requests, concurrency):
+    """GET ``url`` ``requests`` times from ``concurrency`` threads through the WSGI handler."""
+    local = threading.local()
+
+    def one(_):
+        if not hasattr(local, "client"):
+            local.client = Client(headers=headers)
+        started = time.perf_counter()
+        response = local.client.get(url)
+        if response.status_code >= 400:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(requests)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def run_asgi(url, headers, requests, concurrency):
+    """GET ``url`` ``requests`` times with ``concurrency`` in flight through the ASGI handler."""
+
+    async def main():
+        client = AsyncClient()
+        gate = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with gate:
+                started = time.perf_counter()
+                response = await client.get(url, headers=headers)
+                if response.status_code >= 400:
+                    raise RuntimeError(f"GET {url} returned {response.status_code}")
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(one() for _ in range(requests)))
+        return summarize(latencies, time.perf_counter() - started)
+
+    return asyncio.run(main())
+
+
+def suite_endpoints(report_date):
+    return {
+        "products": "/api/products/",
+        "orders": "/api/orders/",
+        "order-items": "/api/order-items/",
+        "reports": f"/api/reports/{report_date.isoformat()}/",
+        "scale-readings": "/api/scale-readings/",
+    }
+
+
+def latest_report_date():
+    """Most recent day with rollup data, so the report has something to add up."""
+    return DailyRollup.objects.order_by("-date").values_list("date", flat=True).first() or timezone.localdate()
+
+
+def profile(url, headers):
+    """One warm-up GET in this thread: its query count and body size."""
+    client = Client(headers=headers)
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    if response.status_code >= 400:
+        raise RuntimeError(f"GET {url} returned {response.status_code}")
+    body = b"".join(response.streaming_content) if response.streaming else response.content
+    return {"queries": len(queries), "bytes": len(body)}
+
+
+def environment():
+    """What a result was measured against, for comparing runs across commits."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": timezone.now().isoformat(),
+        "database": connection.vendor,
+        "rows": {model._meta.model_name: model.objects.count() for model in SUITE_MODELS},
+    }
+
+
+def compare(results, baseline):
+    """Percent change per endpoint against an earlier run (negative latency = faster)."""
+    def change(new, old):
+        return round((new - old) / old * 100, 1) if old else None
+
+    comparison = {}
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous:
+            comparison[name] = {
+                key: change(current[key], previous[key])
+                for key in ("p50_ms", "p95_ms", "requests_per_second", "queries")
+                if current.get(key) is not None and previous.get(key) is not None
+            }
+    return comparison
+
+
+def run_writes(alias, writers, writes):
+    """
+    ``writers`` threads (counters) each record ``writes`` sales on ``alias``:
+    one ScaleReading insert plus a stock reservation on a shared product,
+    each committed on its own. Returns the timings plus failed writes.
+    """
+    # bulk_create: the model signals would write rollups/alerts to "default".
+    product, = Product.objects.using(alias).bulk_create([
+        Product(name="Bench cut", category="beef", price=10, stock_quantity=writers * writes)
+    ])
+    latencies, errors, crashes = [], [], []
+
+    def counter():
+        try:
+            for _ in range(writes):
+                started = time.perf_counter()
+                try:
+                    ScaleReading.objects.using(alias).create(product=product, weight_kg=1.25, price_per_kg=10)
+                    Product.objects.db_manager(alias).reserve(product.pk, 1)
+                except OperationalError as error:
+                    errors.append(str(error))
+                else:
+                    latencies.append(time.perf_counter() - started)
+        except Exception as error:
+            crashes.append(error)
+        finally:
+            connections[alias].close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=counter) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if crashes:
+        raise crashes[0]
+    result = summarize(latencies, elapsed) if latencies else {"requests": 0, "seconds": round(elapsed, 4)}
+    return {
+        "writers": writers,
+        "writes": result.pop("requests"),
+        "writes_per_second": result.pop("requests_per_second", 0),
+        **result,
+        "errors": len(errors),
+    }
+
+
+def _read_reports(report_url, headers, stop, served, failed):
+    client = Client(headers=headers)
+    while not stop.is_set():
+        if client.get(report_url).status_code >= 400:
+            failed.set()
+            break
+        with served.get_lock():
+            served.value += 1
+
+
+def checkout_under_load(checkout, report_url, clerk_headers, admin_headers, checkouts, readers):
+    """
+    Time ``checkouts`` sequential POSTs of ``checkout`` (url, payload) while
+    ``readers`` forked processes (other workers) request ``report_url`` in a loop.
+    """
+    url, payload = checkout
+    context = multiprocessing.get_context("fork")
+    stop, failed, served = context.Event(), context.Event(), context.Value("i", 0)
+    # Children must open their own connections.
+    connections.close_all()
+    processes = [
+        context.Process(target=_read_reports, args=(report_url, admin_headers, stop, served, failed))
+        for _ in range(readers)
+    ]
+    for process in processes:
+        process.start()
+    client = Client(headers=clerk_headers)
+    latencies = []
+    started = time.perf_counter()
+    try:
+        for _ in range(checkouts):
+            began = time.perf_counter()
+            response = client.post(url, payload, content_type="application/json")
+            if response.status_code != 201:
+                raise RuntimeError(f"POST {url} returned {response.status_code}: {response.content[:200]!r}")
+            latencies.append(time.perf_counter() - began)
+    finally:
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for process in processes:
+            process.join()
+    if failed.is_set():
+        raise RuntimeError(f"GET {report_url} failed in a reader process")
+    return {"checkout": summarize(latencies, elapsed), "readers": readers, "reports_served": served.value}
+
+
+def pricing_lines(count, seed=42):
+    """``count`` weighed sale lines (kg, price per kg), some discounted, from a fixed seed."""
+    generator = random.Random(seed)
+    prices = [pricing.to_decimal(generator.randint(200, 4000)) / 100 for _ in range(200)]
+    return [
+        pricing.Line(
+            round(generator.uniform(0.05, 10), 3),
+            generator.choice(prices),
+            generator.choice((0, 0, 0, 5, 10)),
+        )
+        for _ in range(count)
+    ]
+
+
+def run_pricing(lines, rate, inclusive):
+    """
+    Time pricing ``lines`` three ways: the old float arithmetic (for
+    reference only), ``price_line`` per line, and one ``price_lines`` call.
+    Also reports how far the float total drifts from the exact one.
+    """
+    def timed(function):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        return result, {"seconds": round(elapsed, 4), "lines_per_second": round(len(lines) / elapsed, 1)}
+
+    floats, float_timing = timed(lambda: [
+        quantity * float(price) * (1 - percent / 100) for quantity, price, percent, _ in lines
+    ])
+    single, single_timing = timed(lambda: [
+        pricing.price_line(*line, rate=rate, inclusive=inclusive) for line in lines
+    ])
+    quote, batch_timing = timed(lambda: pricing.price_lines(lines, rate, inclusive))
+    if [line.total for line in single] != [line.total for line in quote.lines]:
+        raise RuntimeError("price_line and price_lines disagree")
+    net = quote.subtotal - quote.discount
+    return {
+        "lines": len(lines),
+        "float": float_timing,
+        "price_line": single_timing,
+        "price_lines": batch_timing,
+        "total": str(quote.total),
+        "float_drift": str(abs(pricing.to_decimal(sum(floats)) - net).quantize(pricing.CENT)),
+        "lines_off_by_a_cent": sum(
+            round(value, 2) != float(line.subtotal - line.discount) for value, line in zip(floats, quote.lines)
+        ),
+    }
+
+
+# List endpoint -> a typical sparse fieldset for it.
+LEAN_ENDPOINTS = {
+    "scale-readings": "id,product,weight_kg,total_price",
+    "stock-transactions": "id,product,transaction_type,quantity",
+    "order-items": "id,order,product,quantity",
+    "orders": "id,customer,status,total_price",
+}
+
+
+def run_rows(url, headers, pages):
+    """
+    Walk up to ``pages`` pages of a list endpoint by its ``next`` links and
+    return the rows served per second of wall time.
+    """
+    client = Client(headers=headers)
+    rows = size = 0
+    started = time.perf_counter()
+    for _ in range(pages):
+        response = client.get(url)
+        if response.status_code >= 400:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+        size += len(response.content)
+        body = json.loads(response.content)
+        rows += len(body["results"])
+        url = body["next"]
+        if not url:
+            break
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "seconds": round(elapsed, 4),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed else None,
+        "bytes_per_row": round(size / rows) if rows else 0,
+    }
+
+
+def best_of(repeat, function):
+    """Fastest of ``repeat`` calls, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return round(min(timings) * 1000, 3)
+
+
+def run_json(data, repeat):
+    """
+    Encode and decode ``data`` (serializer output) with each JSON backend
+    available; both must give the same document.
+    """
+    results = {}
+    for backend in ("stdlib", "orjson"):
+        if backend == "orjson" and renderers.orjson is None:
+            continue
+        with override_settings(JSON_BACKEND=backend):
+            body = renderers.dumps(data)
+            results[backend] = {
+                "bytes": len(body),
+                "encode_ms": best_of(repeat, lambda: renderers.dumps(data)),
+                "decode_ms": best_of(repeat, lambda: renderers.loads(body)),
+                "document": renderers.loads(body),
+            }
+    documents = [result.pop("document") for result in results.values()]
+    if any(document != documents[0] for document in documents):
+        raise RuntimeError("JSON backends produced different documents")
+    if "orjson" in results:
+        results["encode_speedup"] = round(results["stdlib"]["encode_ms"] / results["orjson"]["encode_ms"], 2)
+        results["decode_speedup"] = round(results["stdlib"]["decode_ms"] / results["orjson"]["decode_ms"], 2)
+    return results
@@ -0,0 +1,293 @@
+"""
+Bulk CSV / NDJSON import and export of products and stock transactions.
+
+Imports read the upload line by line and work in chunks of ``chunk_size``
+rows: each chunk is validated with the API serializers' field rules (one
+query per chunk for the products it references), then written with
+``bulk_create`` / ``bulk_update`` in its own transaction. Invalid rows are
+reported by index and skipped; the rest of the file still loads. Bulk
+writes bypass model signals, so the rollup, catalog and stock alerts are
+updated here per chunk.
+
+Exports stream ``values_list().iterator(chunk_size)`` rows, so a
+multi-million-row ledger exports in constant memory.
+"""
+import codecs
+import csv
+import io
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from . import catalog, ledger, live, notifications, renderers, rollups
+from .models import Product, StockTransaction
+from .serializers import ProductSerializer, StockTransactionSerializer
+
+FORMATS = ("csv", "ndjson")
+CHUNK_SIZE = 1000
+MAX_ERRORS = 1000
+
+
+def format_for(name, default="csv"):
+    """Guess the format from a file name or content type."""
+    name = (name or "").lower()
+    if "ndjson" in name or name.endswith((".jsonl", ".json")):
+        return "ndjson"
+    if "csv" in name:
+        return "csv"
+    return default
+
+
+def read_rows(lines, file_format):
+    """
+    Rows (dicts) from an iterable of text lines. Empty CSV cells are left
+    out so serializer defaults apply; an NDJSON line that is not a JSON
+    object is passed through as its text, to be reported as a row error.
+    """
+    if file_format == "csv":
+        for row in csv.DictReader(lines):
+            yield {key: value for key, value in row.items() if key and value not in ("", None)}
+        return
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield renderers.loads(line)
+        except ValueError:
+            yield line
+
+
+def chunks(rows, size):
+    chunk = []
+    for item in enumerate(rows):
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ProductImportSerializer(ProductSerializer):
+    """
+    Product rules, plus an optional ``id`` that updates the existing row.
+    Timestamps are left out, so re-importing an export keeps creation times.
+    """
+    id = serializers.IntegerField(required=False)
+
+    class Meta(ProductSerializer.Meta):
+        fields = ["id", "name", "category", "price", "stock_quantity"]
+        read_only_fields = []
+
+
+class StockTransactionImportSerializer(StockTransactionSerializer):
+    """Ledger rules with ``product_id`` checked per chunk instead of per row."""
+    product_id = serializers.IntegerField(write_only=True)
+
+
+class Importer:
+    serializer_class = None
+    # Whether a row with an ``id`` updates that row, so only its given
+    # columns are validated.
+    updates_by_id = False
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.created = self.updated = 0
+        self.errors = []
+        self.error_count = 0
+        # Building a ModelSerializer's fields costs more than validating a
+        # row with them, so every row reuses these (full, and partial for updates).
+        self.serializers = {partial: self.serializer_class(partial=partial) for partial in {False, self.updates_by_id}}
+
+    def add_error(self, index, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"index": index, "errors": errors})
+
+    def validate(self, chunk):
+        """``[(index, validated_data)]`` for the rows in ``chunk`` that pass the field rules."""
+        valid = []
+        for index, row in chunk:
+            if not isinstance(row, dict):
+                self.add_error(index, {"non_field_errors": ["Expected an object with the column names as keys."]})
+                continue
+            try:
+                partial = self.updates_by_id and "id" in row
+                valid.append((index, self.serializers[partial].run_validation(row)))
+            except serializers.ValidationError as exc:
+                self.add_error(index, serializers.as_serializer_error(exc))
+        return valid
+
+    def run(self, rows):
+        for chunk in chunks(rows, self.chunk_size):
+            valid = self.validate(chunk)
+            if valid:
+                with transaction.atomic():
+                    self.write(valid)
+        return self.result()
+
+    def result(self):
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+class ProductImporter(Importer):
+    """Creates products, or updates them when the row has an ``id``."""
+    serializer_class = ProductImportSerializer
+    updates_by_id = True
+
+    def write(self, valid):
+        existing = Product.objects.in_bulk([data["id"] for _, data in valid if "id" in data])
+        new, changed, fields = [], {}, set()
+        for index, data in valid:
+            data = dict(data)
+            pk = data.pop("id", None)
+            if pk is None:
+                new.append(Product(**data))
+            elif pk not in existing:
+                self.add_error(index, {"id": [f"No product with id {pk}."]})
+            else:
+                product = changed.get(pk) or existing[pk]
+                for field, value in data.items():
+                    setattr(product, field, value)
+                changed[pk] = product
+                fields.update(data)
+        created = Product.objects.bulk_create(new)
+        if changed:
+            # bulk_update skips auto_now; stamp the rows ourselves.
+            now = timezone.now()
+            for product in changed.values():
+                product.updated_at = now
+            Product.objects.bulk_update(list(changed.values()), sorted(fields | {"updated_at"}))
+        self.created += len(created)
+        self.updated += len(changed)
+        product_ids = [product.pk for product in created] + list(changed)
+        if product_ids:
+            catalog.bump()
+            notifications.stock_changed(product_ids)
+            live.stock_changed(product_ids)
+
+
+class StockTransactionImporter(Importer):
+    """Appends ledger rows; ``id`` columns are ignored (the ledger is append-only)."""
+    serializer_class = StockTransactionImportSerializer
+
+    def write(self, valid):
+        known = set(
+            Product.objects.filter(pk__in={data["product_id"] for _, data in valid}).values_list("pk", flat=True)
+        )
+        rows = []
+        for index, data in valid:
+            if data["product_id"] in known:
+                rows.append(StockTransaction(**data))
+            else:
+                self.add_error(index, {"product_id": [f"Invalid pk \"{data['product_id']}\" - object does not exist."]})
+        StockTransaction.objects.bulk_create(rows)
+        rollups.record_stock(rows)
+        ledger.rows_changed((row.product_id, row.date) for row in rows)
+        notifications.stock_changed({row.product_id for row in rows})
+        self.created += len(rows)
+
+
+IMPORTERS = {"products": ProductImporter, "stock-transactions": StockTransactionImporter}
+
+EXPORT_COLUMNS = {
+    "products": ("id", "name", "category", "price", "stock_quantity", "created_at", "updated_at"),
+    "stock-transactions": ("id", "product_id", "transaction_type", "quantity", "date", "remarks", "created_at"),
+}
+
+
+def export_queryset(kind, since=None, until=None):
+    if kind == "products":
+        return Product.objects.order_by("id")
+    queryset = StockTransaction.objects.order_by("date", "id")
+    if since:
+        queryset = queryset.filter(date__gte=since)
+    if until:
+        queryset = queryset.filter(date__lte=until)
+    return queryset
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def export_rows(queryset, columns, file_format, chunk_size=CHUNK_SIZE):
+    """Yield the export as text, one chunk per ``chunk_size`` rows."""
+    rows = queryset.values_list(*columns).iterator(chunk_size=chunk_size)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if file_format == "csv":
+        writer.writerow(columns)
+    count = 0
+    for values in rows:
+        values = [_plain(value) for value in values]
+        if file_format == "csv":
+            writer.writerow(values)
+        else:
+            buffer.write(renderers.dumps(dict(zip(columns, values))).decode() + "\n")
+        count += 1
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+CONTENT_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+class BulkTransferMixin:
+    """
+    ViewSet actions for ``bulk_kind``: ``POST <list>/import/`` loads a CSV
+    or NDJSON body (by Content-Type) and ``GET <list>/export/`` streams
+    every row (``?file_format=csv|ndjson``, ledger also ``?since=``/``?until=``).
+    """
+    bulk_kind = None
+
+    @action(detail=False, methods=["post"], url_path="import")
+    def import_rows(self, request):
+        file_format = format_for(request.content_type, default=None)
+        if file_format is None:
+            return Response({"error": "Send a text/csv or application/x-ndjson body."}, status=415)
+        # Read the raw body line by line rather than through request.data.
+        lines = codecs.iterdecode(request._request, request._request.encoding or settings.DEFAULT_CHARSET)
+        result = IMPORTERS[self.bulk_kind]().run(read_rows(lines, file_format))
+        loaded = result["created"] or result["updated"]
+        return Response(result, status=201 if loaded or not result["error_count"] else 400)
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        file_format = request.query_params.get("file_format", "csv")
+        try:
+            since, until = (
+                datetime.strptime(request.query_params[name], "%Y-%m-%d").date() if name in request.query_params else None
+                for name in ("since", "until")
+            )
+        except ValueError:
+            return Response({"error": "Dates must be YYYY-MM-DD."}, status=400)
+        if file_format not in FORMATS:
+            return Response({"error": f"file_format must be one of {', '.join(FORMATS)}."}, status=400)
+        queryset = export_queryset(self.bulk_kind, since, until)
+        response = StreamingHttpResponse(
+            export_rows(queryset, EXPORT_COLUMNS[self.bulk_kind], file_format), content_type=CONTENT_TYPES[file_format]
+        )
+        response["Content-Disposition"] = f'attachment; filename="{self.bulk_kind}.{file_format}"'
+        return response
@@ -0,0 +1,95 @@
+"""
+Versioned cache for the product catalog (``GET /api/products/``).
+
+A version counter is bumped whenever a product changes. Rendered list
+responses are stored as bytes under a strong ETag derived from that version
+and the request URL, so polling clients get a 304 for an unchanged catalog
+without the database being touched.
+
+The backend is whichever Django cache ``CATALOG_CACHE_ALIAS`` names. The
+local-memory default is per process: use a shared backend (FileBasedCache,
+RedisCache) when running several workers.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import parse_etags
+
+VERSION_KEY = "catalog:version"
+
+
+def _cache():
+    return caches[getattr(settings, "CATALOG_CACHE_ALIAS", "default")]
+
+
+def _timeout():
+    return getattr(settings, "CATALOG_CACHE_TIMEOUT", 3600)
+
+
+def get_version():
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses old ETags.
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+async def aget_version():
+    """``get_version`` for async views, without blocking the event loop."""
+    cache = _cache()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, time.time_ns(), timeout=None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def _bump():
+    cache = _cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def bump():
+    """
+    Invalidate cached catalog responses. Bumped again on commit, so nothing
+    cached from pre-commit data by a concurrent reader survives.
+    """
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def etag(version, request):
+    key = f"{version}|{request.get_host()}|{request.get_full_path()}"
+    return '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+
+def etag_matches(tag, if_none_match):
+    """Whether an ``If-None-Match`` header names ``tag`` (weak comparison, or ``*``)."""
+    for candidate in parse_etags(if_none_match or ""):
+        if candidate == "*" or candidate.removeprefix("W/") == tag:
+            return True
+    return False
+
+
+def get_body(tag):
+    return _cache().get(f"catalog:body:{tag}")
+
+
+def set_body(tag, body):
+    _cache().set(f"catalog:body:{tag}", body, timeout=_timeout())
+
+
+async def aget_body(tag):
+    return await _cache().aget(f"catalog:body:{tag}")
+
+
+async def aset_body(tag, body):
+    await _cache().aset(f"catalog:body:{tag}", body, timeout=_timeout())
@@ -0,0 +1,35 @@
+"""
+Per-connection database setup.
+
+SQLite connections get the ``SQLITE_PRAGMAS`` from settings as soon as they
+open: WAL journaling lets the counters read while one of them writes,
+``synchronous=NORMAL`` is durable across application crashes in WAL mode,
+``busy_timeout`` makes a writer wait for the lock instead of failing, and
+``cache_size`` keeps more pages in memory. PostgreSQL needs nothing here;
+its persistent connections and health checks are plain ``DATABASES``
+options.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DEFAULT_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -20000,
+    "temp_store": "MEMORY",
+}
+
+
+def sqlite_pragmas():
+    return getattr(settings, "SQLITE_PRAGMAS", DEFAULT_SQLITE_PRAGMAS)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in sqlite_pragmas().items():
+            cursor.execute(f"PRAGMA {name} = {value}")
@@ -0,0 +1,146 @@
+"""
+Database-backed background jobs.
+
+Work is registered by name with ``@task`` (see ``butchery.tasks``), queued
+with ``submit`` and executed by ``manage.py run_jobs`` worker processes.
+Workers claim a job with a conditional UPDATE, so any number of them can
+poll the same table without running a job twice. Failed jobs are retried
+with exponential backoff up to ``max_attempts``.
+
+A running job's worker renews ``heartbeat_at`` every ``HEARTBEAT_INTERVAL``.
+A job whose heartbeat is older than ``STALE_AFTER`` belongs to a dead
+worker: it is claimed again, or marked FAILED once it has used its
+attempts. Outcomes are only recorded by the worker holding the current
+attempt, so a worker that was presumed dead cannot overwrite a retry.
+"""
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+HEARTBEAT_INTERVAL = timedelta(seconds=30)
+# A RUNNING job without a heartbeat for this long belongs to a dead worker.
+STALE_AFTER = timedelta(minutes=2)
+
+
+def task(name):
+    """Register ``func(**payload)`` as the handler for jobs called ``name``."""
+    def register(func):
+        registry[name] = func
+        return func
+    return register
+
+
+def submit(name, payload=None, idempotency_key=None, max_attempts=3):
+    """
+    Queue a job and return ``(job, created)``. With an ``idempotency_key``
+    that was already used, the earlier job is returned and nothing is queued.
+    """
+    if name not in registry:
+        raise KeyError(f"Unknown job {name!r}")
+    if idempotency_key:
+        existing = Job.objects.filter(idempotency_key=idempotency_key).first()
+        if existing:
+            return existing, False
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(
+                name=name,
+                payload=payload or {},
+                idempotency_key=idempotency_key,
+                max_attempts=max_attempts,
+            )
+    except IntegrityError:
+        # Lost a race with another submit using the same key.
+        return Job.objects.get(idempotency_key=idempotency_key), False
+    return job, True
+
+
+def claim():
+    """Atomically take the next runnable job, or return None."""
+    now = timezone.now()
+    stale = Q(status=Job.Status.RUNNING, heartbeat_at__lt=now - STALE_AFTER)
+    abandoned = Job.objects.filter(stale, attempts__gte=F("max_attempts")).update(
+        status=Job.Status.FAILED, error="The worker running the job stopped responding.", finished_at=now
+    )
+    if abandoned:
+        logger.warning("Marked %s abandoned jobs as failed", abandoned)
+    runnable = Q(status=Job.Status.PENDING, run_after__lte=now) | stale
+    for job in Job.objects.filter(runnable).order_by("run_after", "id")[:10]:
+        claimed = Job.objects.filter(pk=job.pk, status=job.status, attempts=job.attempts).update(
+            status=Job.Status.RUNNING, attempts=F("attempts") + 1, started_at=now, heartbeat_at=now
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def _current(job):
+    """The job's row, if this worker still holds the attempt it claimed."""
+    return Job.objects.filter(pk=job.pk, status=Job.Status.RUNNING, attempts=job.attempts)
+
+
+class Heartbeat(threading.Thread):
+    """Renews a running job's ``heartbeat_at`` until stopped."""
+
+    def __init__(self, job):
+        super().__init__(daemon=True)
+        self.job = job
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(HEARTBEAT_INTERVAL.total_seconds()):
+                if not _current(self.job).update(heartbeat_at=timezone.now()):
+                    return
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run(job):
+    """Execute a claimed job and record its outcome."""
+    heartbeat = Heartbeat(job)
+    heartbeat.start()
+    try:
+        result = registry[job.name](**job.payload)
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.Status.PENDING
+            job.run_after = timezone.now() + timedelta(seconds=2 ** job.attempts)
+        else:
+            job.status = Job.Status.FAILED
+            job.finished_at = timezone.now()
+        logger.warning("Job %s #%s failed (attempt %s/%s)", job.name, job.pk, job.attempts, job.max_attempts)
+    else:
+        job.status = Job.Status.SUCCEEDED
+        job.result = result
+        job.error = ""
+        job.finished_at = timezone.now()
+    finally:
+        heartbeat.stop()
+    fields = ["status", "result", "error", "run_after", "finished_at"]
+    if not _current(job).update(**{field: getattr(job, field) for field in fields}):
+        logger.warning("Job %s #%s was claimed by another worker; discarding this outcome", job.name, job.pk)
+    return job
+
+
+def run_next():
+    """Claim and run one job. Returns the job, or None if the queue is empty."""
+    job = claim()
+    return run(job) if job else None
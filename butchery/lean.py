@@ -0,0 +1,128 @@
+"""
+Lean list responses.
+
+``?fields=id,product,weight_kg`` (a sparse fieldset) or ``?flat=true``
+(every field) switch a list endpoint to rows built straight from
+``.values()``: no model instances, no nested serializers, and foreign keys
+rendered as their ids. Columns that need formatting (decimals, dates) go
+through the serializer field that would have rendered them, so values look
+the same as in the full response. Nested lists, such as an order's
+``items``, are not available in this mode.
+"""
+from django.http import StreamingHttpResponse
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import ManyRelatedField
+from rest_framework.response import Response
+
+from . import metrics, renderers
+
+TRUE = ("1", "true", "yes")
+# Serializer fields whose representation differs from the database value.
+FORMATTED = (
+    serializers.DecimalField,
+    serializers.DateTimeField,
+    serializers.DateField,
+    serializers.TimeField,
+    serializers.DurationField,
+    serializers.UUIDField,
+)
+
+
+def available_columns(serializer, annotations):
+    """
+    ``{name: (lookup, formatter)}`` for every field of ``serializer`` that
+    can be read from ``.values()``. Method fields need a same-named entry in
+    ``annotations``.
+    """
+    model = serializer.Meta.model
+    columns = {}
+    for name, field in serializer.fields.items():
+        if field.write_only or isinstance(field, (serializers.ListSerializer, ManyRelatedField)):
+            continue
+        if isinstance(field, (serializers.BaseSerializer, serializers.RelatedField)):
+            columns[name] = (model._meta.get_field(field.source).attname, None)
+        elif isinstance(field, serializers.SerializerMethodField):
+            if name in annotations:
+                columns[name] = (name, None)
+        elif field.source != "*" and "." not in field.source:
+            columns[name] = (field.source, field.to_representation if isinstance(field, FORMATTED) else None)
+    return columns
+
+
+class Columns:
+    """The selected columns: their ``.values()`` lookups and how to format each."""
+
+    def __init__(self, names, available):
+        self.names = names
+        self.lookups = [available[name][0] for name in names]
+        self.formatters = [available[name][1] for name in names]
+
+    def row(self, values):
+        """One output row from a ``values_list`` tuple in ``lookups`` order."""
+        return {
+            name: value if formatter is None or value is None else formatter(value)
+            for name, value, formatter in zip(self.names, values, self.formatters)
+        }
+
+    def rows(self, dicts):
+        lookups = self.lookups
+        return [self.row([values[lookup] for lookup in lookups]) for values in dicts]
+
+
+class LeanListMixin:
+    """
+    DRF list mixin for ``?fields=`` / ``?flat=true``. ``lean_annotations``
+    supplies SQL for method fields (e.g. a line total); annotations already
+    on the queryset are used as they are. Combine it before
+    ``StreamingListMixin`` to stream lean rows with ``?stream=true``.
+    """
+    fields_param = "fields"
+    flat_param = "flat"
+    lean_annotations = {}
+
+    def get_lean_columns(self, queryset):
+        params = self.request.query_params
+        requested = params.get(self.fields_param)
+        if requested is None and params.get(self.flat_param, "").lower() not in TRUE:
+            return None
+        available = available_columns(
+            self.get_serializer(), set(self.lean_annotations) | set(queryset.query.annotations)
+        )
+        names = [name.strip() for name in (requested or "").split(",") if name.strip()]
+        if not names:
+            return Columns(list(available), available)
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise ValidationError({
+                self.fields_param: f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(available)}."
+            })
+        return Columns(list(dict.fromkeys(names)), available)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = self.get_lean_columns(queryset)
+        if columns is None:
+            return super().list(request, *args, **kwargs)
+        annotations = {name: expression for name, expression in self.lean_annotations.items() if name in columns.lookups}
+        queryset = queryset.prefetch_related(None).annotate(**annotations)
+
+        stream_param = getattr(self, "stream_param", None)
+        if stream_param and request.query_params.get(stream_param, "").lower() in TRUE:
+            response = StreamingHttpResponse(self.stream_lean_rows(queryset, columns), content_type="application/json")
+            response["Cache-Control"] = "no-cache"
+            return response
+
+        # Cursor pagination reads its position from the ordering columns.
+        ordering = getattr(self.paginator, "get_ordering", None)
+        extra = [name.lstrip("-") for name in ordering(request, queryset, self)] if ordering else []
+        page = self.paginate_queryset(queryset.values(*dict.fromkeys(columns.lookups + extra)))
+        with metrics.serializing():
+            if page is None:
+                return Response(columns.rows(queryset.values(*columns.lookups)))
+            rows = columns.rows(page)
+        return self.get_paginated_response(rows)
+
+    def stream_lean_rows(self, queryset, columns):
+        rows = queryset.values_list(*columns.lookups).iterator(chunk_size=self.stream_chunk_size)
+        return renderers.stream_array(map(columns.row, rows), self.stream_chunk_size)
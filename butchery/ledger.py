@@ -0,0 +1,205 @@
+"""
+Stock balances derived from the append-only ``StockTransaction`` ledger.
+
+IN adds to a product's balance, OUT takes from it and CLOSE records a
+stock count that replaces it. ``StockSnapshot`` rows store the balance at
+the end of a day, so a balance as of any date costs one snapshot read plus
+a scan of the ledger rows after that snapshot.
+
+A ledger row written, edited or deleted on or before a product's snapshot
+makes it stale; ``rows_changed`` recomputes the affected snapshots. Rows
+dated before an archived snapshot cannot change it (the history it replaced
+is gone) and are logged instead.
+"""
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Max, Q
+
+from .models import Product, StockSnapshot, StockTransaction
+
+LEDGER_ORDER = ("date", "created_at", "id")
+# Rows deleted per statement; stays under SQLite's 999 parameter limit.
+ARCHIVE_BATCH = 900
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def apply_movement(balance, transaction_type, quantity):
+    if transaction_type == StockTransaction.TransactionType.IN:
+        return balance + quantity
+    if transaction_type == StockTransaction.TransactionType.OUT:
+        return balance - quantity
+    return quantity  # CLOSE: a physical count replaces the running balance
+
+
+def balance_at(product_id, date):
+    """
+    Return ``(balance, snapshot)`` for a product at the end of ``date``.
+    ``snapshot`` is the StockSnapshot the tail scan started from, or None.
+    """
+    snapshot = (
+        StockSnapshot.objects.filter(product_id=product_id, date__lte=date)
+        .order_by("-date")
+        .first()
+    )
+    tail = StockTransaction.objects.filter(product_id=product_id, date__lte=date)
+    balance = 0.0
+    if snapshot:
+        tail = tail.filter(date__gt=snapshot.date)
+        balance = snapshot.balance
+    for transaction_type, quantity in tail.order_by(*LEDGER_ORDER).values_list("transaction_type", "quantity"):
+        balance = apply_movement(balance, transaction_type, quantity)
+    return balance, snapshot
+
+
+@transaction.atomic
+def take_snapshots(date):
+    """
+    Store every product's balance at the end of ``date``, starting from the
+    previous snapshot. Returns the number of snapshots written.
+    """
+    if StockSnapshot.objects.filter(date__gte=date, archived=True).exists():
+        raise ArchiveError(f"The ledger up to {date} has been archived; its snapshots cannot be retaken.")
+    # Snapshots are taken for every product at once, so the latest earlier
+    # snapshot date holds the starting balance for all but brand-new products.
+    last_date = StockSnapshot.objects.filter(date__lt=date).aggregate(last=Max("date"))["last"]
+    previous = {}
+    tail = StockTransaction.objects.filter(date__lte=date)
+    if last_date:
+        previous = dict(StockSnapshot.objects.filter(date=last_date).values_list("product_id", "balance"))
+        tail = tail.filter(Q(date__gt=last_date) | ~Q(product_id__in=list(previous)))
+
+    movements = defaultdict(list)
+    rows = tail.order_by(*LEDGER_ORDER).values_list("product_id", "transaction_type", "quantity")
+    for product_id, transaction_type, quantity in rows.iterator(chunk_size=2000):
+        movements[product_id].append((transaction_type, quantity))
+
+    snapshots = []
+    for product_id in Product.objects.values_list("id", flat=True):
+        balance = previous.get(product_id, 0.0)
+        for transaction_type, quantity in movements.get(product_id, ()):
+            balance = apply_movement(balance, transaction_type, quantity)
+        snapshots.append(StockSnapshot(product_id=product_id, date=date, balance=balance))
+
+    StockSnapshot.objects.filter(date=date).delete()
+    StockSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+    return len(snapshots)
+
+
+def rows_changed(rows):
+    """
+    Recompute the snapshots made stale by ledger rows written, edited or
+    deleted; ``rows`` is an iterable of ``(product_id, date)``.
+    """
+    since = {}
+    for product_id, day in rows:
+        day = day.date() if isinstance(day, datetime) else day
+        if product_id not in since or day < since[product_id]:
+            since[product_id] = day
+    if not since:
+        return
+    stale = Q()
+    for product_id, day in since.items():
+        stale |= Q(product_id=product_id, date__gte=day)
+    for product_id in set(StockSnapshot.objects.filter(stale).order_by().values_list("product_id", flat=True)):
+        refresh_snapshots(product_id, since[product_id])
+
+
+def refresh_snapshots(product_id, since):
+    """Replay the ledger into a product's snapshots dated on or after ``since``."""
+    snapshots = list(StockSnapshot.objects.filter(product_id=product_id, date__gte=since).order_by("date"))
+    archived = [snapshot for snapshot in snapshots if snapshot.archived]
+    if archived:
+        base = archived[-1]
+        logger.warning(
+            "Ledger change for product %s dated %s is before its archived snapshot of %s; "
+            "balances from that snapshot on ignore it.", product_id, since, base.date,
+        )
+        snapshots = [snapshot for snapshot in snapshots if snapshot.date > base.date]
+    else:
+        base = StockSnapshot.objects.filter(product_id=product_id, date__lt=since).order_by("-date").first()
+    if not snapshots:
+        return
+
+    rows = StockTransaction.objects.filter(product_id=product_id, date__lte=snapshots[-1].date)
+    balance = 0.0
+    if base:
+        rows = rows.filter(date__gt=base.date)
+        balance = base.balance
+    rows = rows.order_by(*LEDGER_ORDER).values_list("date", "transaction_type", "quantity").iterator(chunk_size=2000)
+    pending = iter(snapshots)
+    snapshot = next(pending)
+    for day, transaction_type, quantity in rows:
+        while snapshot is not None and day > snapshot.date:
+            snapshot.balance = balance
+            snapshot = next(pending, None)
+        balance = apply_movement(balance, transaction_type, quantity)
+    while snapshot is not None:
+        snapshot.balance = balance
+        snapshot = next(pending, None)
+    StockSnapshot.objects.bulk_update(snapshots, ["balance"], batch_size=1000)
+
+
+def _delete_rows(ids):
+    # A raw DELETE: the ORM collector would load every row and send
+    # post_delete for each (rollup, sync tombstones), but archived rows are
+    # not deleted in any sense clients or the rollup should see.
+    quote = connection.ops.quote_name
+    sql = "DELETE FROM {} WHERE {} IN ({})".format(
+        quote(StockTransaction._meta.db_table), quote(StockTransaction._meta.pk.column), ", ".join(["%s"] * len(ids))
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, ids)
+
+
+@transaction.atomic
+def archive(before, stream):
+    """
+    Move ledger rows dated before ``before`` to ``stream`` as NDJSON and
+    delete them, in batches of ``ARCHIVE_BATCH``. Every product with
+    archived rows must have a snapshot on or after the last archived day, so
+    no balance is lost; the snapshots before ``before`` are then marked
+    archived. Rows added while this runs are left alone. The daily rollup
+    keeps its totals. Returns the number of rows archived.
+    """
+    max_id = StockTransaction.objects.aggregate(last=Max("id"))["last"] or 0
+    old_rows = StockTransaction.objects.filter(date__lt=before, id__lte=max_id)
+    last_archived = dict(
+        old_rows.order_by().values("product_id").annotate(last=Max("date")).values_list("product_id", "last")
+    )
+    last_snapshot = dict(
+        StockSnapshot.objects.filter(date__lt=before)
+        .order_by().values("product_id").annotate(last=Max("date")).values_list("product_id", "last")
+    )
+    uncovered = sorted(
+        product_id for product_id, last in last_archived.items()
+        if product_id not in last_snapshot or last_snapshot[product_id] < last
+    )
+    if uncovered:
+        raise ArchiveError(
+            f"Take a snapshot on or after the last archived day first; products without one: {uncovered}"
+        )
+
+    count = 0
+    # Archived rows are deleted as they are written, so each batch is the
+    # next ARCHIVE_BATCH rows in ledger order.
+    batches = old_rows.order_by(*LEDGER_ORDER).values()
+    while True:
+        batch = list(batches[:ARCHIVE_BATCH])
+        if not batch:
+            break
+        for row in batch:
+            stream.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+        _delete_rows([row["id"] for row in batch])
+        count += len(batch)
+    StockSnapshot.objects.filter(date__lt=before, archived=False).update(archived=True)
+    return count
@@ -0,0 +1,178 @@
+"""
+In-process pub/sub hub behind the live display feed (``/api/async/live/``).
+
+Writes publish small events (a new scale reading, a product's new stock
+level) after their transaction commits. Every connected display holds a
+``Subscription`` with a bounded buffer; a display that falls too far
+behind loses its oldest events and is told to ``resync`` (re-fetch the
+REST lists) instead of slowing the publisher down. Nothing is queried
+while no display is connected.
+
+The hub lives in one process: run the feed on a single ASGI worker, and
+note that writes made by other processes (``run_jobs`` workers, other web
+workers) are not seen by it.
+"""
+import asyncio
+import json
+import threading
+from collections import deque
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .models import Product
+
+BUFFER_SIZE = 100
+HISTORY_SIZE = 1000
+TOPICS = ("scale_reading", "stock")
+
+
+class Event:
+    __slots__ = ("id", "name", "data")
+
+    def __init__(self, id, name, data):
+        self.id, self.name, self.data = id, name, data
+
+    def encode(self):
+        """The event in ``text/event-stream`` framing."""
+        data = json.dumps(self.data, cls=DjangoJSONEncoder)
+        return f"id: {self.id}\nevent: {self.name}\ndata: {data}\n\n"
+
+
+class Subscription:
+    """One client's bounded buffer, filled from any thread and drained on its event loop."""
+
+    def __init__(self, hub, topics, loop, size):
+        self.hub = hub
+        self.topics = topics
+        self.buffer = deque(maxlen=size)
+        self.overflowed = False
+        self._loop = loop
+        self._ready = asyncio.Event()
+
+    def wants(self, event):
+        return not self.topics or event.name in self.topics
+
+    def push(self, event):
+        if not self.wants(event):
+            return
+        with self.hub._lock:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.overflowed = True
+            self.buffer.append(event)
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            # The client's loop is gone; it will be unsubscribed on the way out.
+            pass
+
+    async def get(self, timeout=None):
+        """
+        Wait up to ``timeout`` seconds and return ``(events, overflowed)``;
+        both empty/False on timeout. A subscription that overflowed must be
+        resynced by the client, so its buffer is discarded.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return [], False
+        with self.hub._lock:
+            self._ready.clear()
+            events, overflowed = list(self.buffer), self.overflowed
+            self.buffer.clear()
+            self.overflowed = False
+        return ([] if overflowed else events), overflowed
+
+
+class Hub:
+    def __init__(self, buffer_size=BUFFER_SIZE, history_size=HISTORY_SIZE):
+        self.buffer_size = buffer_size
+        self.history = deque(maxlen=history_size)
+        self.subscriptions = set()
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    @property
+    def has_subscribers(self):
+        return bool(self.subscriptions)
+
+    def publish(self, name, data):
+        with self._lock:
+            self._last_id += 1
+            event = Event(self._last_id, name, data)
+            self.history.append(event)
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            subscription.push(event)
+        return event
+
+    def subscribe(self, topics=None, last_event_id=None):
+        """
+        Register a subscription on the running event loop. With the
+        ``Last-Event-ID`` of a reconnecting client, missed events still in
+        the history are replayed, or a resync is flagged if they are not.
+        """
+        subscription = Subscription(self, set(topics or ()), asyncio.get_running_loop(), self.buffer_size)
+        with self._lock:
+            self.subscriptions.add(subscription)
+            if last_event_id is not None:
+                oldest = self.history[0].id if self.history else self._last_id + 1
+                missed = [
+                    event for event in self.history
+                    if event.id > last_event_id and subscription.wants(event)
+                ]
+                if last_event_id > self._last_id or oldest > last_event_id + 1 or len(missed) > self.buffer_size:
+                    subscription.overflowed = True
+                else:
+                    subscription.buffer.extend(missed)
+                if subscription.overflowed or subscription.buffer:
+                    subscription._ready.set()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self.subscriptions.discard(subscription)
+
+
+hub = Hub()
+
+
+def readings_created(readings):
+    """Publish new ScaleReading rows once the current transaction commits."""
+    if not hub.has_subscribers:
+        return
+    data = [
+        {
+            "id": reading.id,
+            "product_id": reading.product_id,
+            "weight_kg": reading.weight_kg,
+            "price_per_kg": reading.price_per_kg,
+            "total_price": reading.total_price,
+            "recorded_at": reading.recorded_at,
+        }
+        for reading in readings
+    ]
+
+    def run():
+        for row in data:
+            hub.publish("scale_reading", row)
+
+    transaction.on_commit(run)
+
+
+def stock_changed(product_ids):
+    """Publish the committed stock level of ``product_ids``; one query, and only with subscribers."""
+    if not hub.has_subscribers:
+        return
+    product_ids = set(product_ids)
+
+    def run():
+        rows = Product.objects.filter(pk__in=product_ids).values_list("id", "name", "stock_quantity")
+        for pk, name, stock_quantity in rows:
+            hub.publish("stock", {"product_id": pk, "name": name, "stock_quantity": stock_quantity})
+
+    transaction.on_commit(run)
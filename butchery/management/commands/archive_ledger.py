@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from butchery import ledger
+
+
+class Command(BaseCommand):
+    help = "Move stock transactions older than a date to an NDJSON file and delete them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("before", help="Archive rows dated before this day (YYYY-MM-DD).")
+        parser.add_argument("output", help="NDJSON file to write the archived rows to.")
+
+    def handle(self, *args, **options):
+        try:
+            before = datetime.strptime(options["before"], "%Y-%m-%d").date()
+        except ValueError:
+            raise CommandError("Invalid date format. Use YYYY-MM-DD.")
+        try:
+            with open(options["output"], "x", encoding="utf-8") as stream:
+                count = ledger.archive(before, stream)
+        except FileExistsError:
+            raise CommandError(f"{options['output']} already exists.")
+        except ledger.ArchiveError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"Archived {count} stock transactions to {options['output']}."))
@@ -0,0 +1,68 @@
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from butchery import benchmarks
+from butchery.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the main list/report endpoints in-process and print throughput, "
+        "p50/p95 latency, query count and response size per endpoint as JSON. "
+        "Use generate_data first for realistic volumes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", default="bench", help="Admin user to authenticate as.")
+        parser.add_argument("--requests", type=int, default=100, help="Requests per endpoint.")
+        parser.add_argument("--concurrency", type=int, default=1)
+        parser.add_argument("--date", help="Report date (YYYY-MM-DD). Defaults to the latest day with data.")
+        parser.add_argument("--endpoint", action="append", help="Only run these endpoints (repeatable).")
+        parser.add_argument("--output", help="Also write the results to this JSON file.")
+        parser.add_argument("--compare", help="Earlier results file to report percent changes against.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}; run generate_data first.")
+        try:
+            report_date = (
+                datetime.strptime(options["date"], "%Y-%m-%d").date()
+                if options["date"] else benchmarks.latest_report_date()
+            )
+        except ValueError:
+            raise CommandError("Invalid date format. Use YYYY-MM-DD.")
+        endpoints = benchmarks.suite_endpoints(report_date)
+        unknown = set(options["endpoint"] or ()) - set(endpoints)
+        if unknown:
+            raise CommandError(f"Unknown endpoint(s): {', '.join(sorted(unknown))}. Choose from {', '.join(endpoints)}.")
+        if options["endpoint"]:
+            endpoints = {name: url for name, url in endpoints.items() if name in options["endpoint"]}
+
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+        results = {}
+        with benchmarks.test_hosts():
+            for name, url in endpoints.items():
+                results[name] = {
+                    "url": url,
+                    **benchmarks.profile(url, headers),
+                    **benchmarks.run_wsgi(url, headers, options["requests"], options["concurrency"]),
+                }
+        output = {
+            "environment": benchmarks.environment(),
+            "settings": {"requests": options["requests"], "concurrency": options["concurrency"]},
+            "results": results,
+        }
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as stream:
+                output["comparison"] = benchmarks.compare(results, json.load(stream))
+
+        output = json.dumps(output, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as stream:
+                stream.write(output + "\n")
+        self.stdout.write(output)
@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from butchery import benchmarks
+from butchery.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the sync (WSGI) and async (ASGI) read endpoints in-process "
+        "and print requests/second and p50/p95 latency for each as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", required=True, help="Admin user to authenticate as.")
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument("--date", help="Report date (YYYY-MM-DD). Defaults to today.")
+        parser.add_argument("--output", help="Also write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+        date = options["date"] or timezone.localdate().isoformat()
+        endpoints = {
+            "products": ("/api/products/", "/api/async/products/"),
+            "report": (f"/api/reports/{date}/", f"/api/async/reports/{date}/"),
+            "scale-readings": ("/api/scale-readings/", "/api/async/scale-readings/"),
+        }
+
+        results = {}
+        with benchmarks.test_hosts():
+            for name, (sync_url, async_url) in endpoints.items():
+                results[name] = {
+                    "wsgi": benchmarks.run_wsgi(sync_url, headers, options["requests"], options["concurrency"]),
+                    "asgi": benchmarks.run_asgi(async_url, headers, options["requests"], options["concurrency"]),
+                }
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as stream:
+                stream.write(output + "\n")
+        self.stdout.write(output)
@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from butchery import benchmarks, renderers
+from butchery.models import ScaleReading, StockTransaction
+from butchery.serializers import ScaleReadingSerializer, StockTransactionSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark the JSON backends (stdlib vs orjson) on real serializer "
+        "output: a page of scale readings and of stock transactions, full and flat."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500, help="Rows per payload (a large page).")
+        parser.add_argument("--repeat", type=int, default=20, help="Best of this many runs.")
+        parser.add_argument("--output", help="Also write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        readings = ScaleReading.objects.select_related("product").order_by("-recorded_at", "-id")[:rows]
+        transactions = StockTransaction.objects.select_related("product")[:rows]
+        payloads = {
+            "scale-readings": ScaleReadingSerializer(readings, many=True).data,
+            "stock-transactions": StockTransactionSerializer(transactions, many=True).data,
+        }
+        for name in list(payloads):
+            payloads[f"{name} (flat)"] = [
+                {**row, "product": row["product"]["id"]} for row in payloads[name]
+            ]
+        if not payloads["scale-readings"]:
+            raise CommandError("No scale readings to encode; run generate_data first.")
+
+        results = {
+            name: {"rows": len(data), **benchmarks.run_json(data, options["repeat"])}
+            for name, data in payloads.items()
+        }
+        output = json.dumps({
+            "environment": benchmarks.environment(),
+            "orjson": renderers.orjson.__version__ if renderers.orjson else None,
+            "results": results,
+        }, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as stream:
+                stream.write(output + "\n")
+        self.stdout.write(output)
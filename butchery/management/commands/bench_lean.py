@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from butchery import benchmarks
+from butchery.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows per second of the high-volume list endpoints in the full "
+        "(nested) representation, the lean ?flat=true mode and a sparse ?fields= "
+        "list. Use generate_data first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", default="bench", help="User to authenticate as.")
+        parser.add_argument("--pages", type=int, default=20, help="Pages to walk per endpoint and mode.")
+        parser.add_argument("--page-size", type=int, default=500)
+        parser.add_argument("--output", help="Also write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}; run generate_data first.")
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+        results = {}
+        with benchmarks.test_hosts():
+            for endpoint, fields in benchmarks.LEAN_ENDPOINTS.items():
+                base = f"/api/{endpoint}/?page_size={options['page_size']}"
+                modes = {"full": "", "flat": "&flat=true", "fields": f"&fields={fields}"}
+                results[endpoint] = {
+                    mode: benchmarks.run_rows(base + query, headers, options["pages"])
+                    for mode, query in modes.items()
+                }
+                full, flat = results[endpoint]["full"], results[endpoint]["flat"]
+                if full["rows_per_second"] and flat["rows_per_second"]:
+                    results[endpoint]["speedup"] = round(flat["rows_per_second"] / full["rows_per_second"], 2)
+        output = json.dumps({"environment": benchmarks.environment(), "results": results}, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as stream:
+                stream.write(output + "\n")
+        self.stdout.write(output)
@@ -0,0 +1,30 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from butchery import benchmarks, pricing
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the pricing engine on synthetic weighed sale lines: price_line per "
+        "line against one price_lines batch call, with float arithmetic as a reference."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lines", type=int, default=100000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--tax-rate", help="Defaults to SALES_TAX_RATE.")
+        parser.add_argument("--exclusive", action="store_true", help="Add tax on top of prices.")
+        parser.add_argument("--output", help="Also write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        lines = benchmarks.pricing_lines(options["lines"], options["seed"])
+        rate = pricing.tax_rate() if options["tax_rate"] is None else pricing.to_decimal(options["tax_rate"])
+        results = benchmarks.run_pricing(lines, rate, not options["exclusive"])
+        results["tax_rate"] = str(rate)
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as stream:
+                stream.write(output + "\n")
+        self.stdout.write(output)
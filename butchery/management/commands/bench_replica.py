@@ -0,0 +1,90 @@
+import json
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from butchery import benchmarks
+from butchery.models import DailyRollup, Product, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Local two-database check of the read-replica router: builds a throwaway "
+        "SQLite primary with synthetic data plus a replica copy, then times checkouts "
+        "alone, with report readers on the primary, and with report readers on the replica. "
+        "Readers are separate processes, like other web workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=4, help="Concurrent report readers.")
+        parser.add_argument("--checkouts", type=int, default=200)
+        parser.add_argument("--orders", type=int, default=20000, help="Synthetic orders to generate.")
+        parser.add_argument("--transactions", type=int, default=100000, help="Synthetic stock transactions.")
+        parser.add_argument("--output", help="Also write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("bench_replica builds SQLite databases; run it with the default DB_ENGINE.")
+        with tempfile.TemporaryDirectory(prefix="tamucuts-replica-") as directory:
+            primary, replica = os.path.join(directory, "primary.sqlite3"), os.path.join(directory, "replica.sqlite3")
+            connection.settings_dict["TEST"]["NAME"] = primary
+            old_name = connection.settings_dict["NAME"]
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                results = self.run(options, primary, replica)
+            finally:
+                if "replica" in connections.settings:
+                    connections["replica"].close()
+                    del connections["replica"]
+                    del connections.settings["replica"]
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as stream:
+                stream.write(output + "\n")
+        self.stdout.write(output)
+
+    def run(self, options, primary, replica):
+        self.stderr.write("Generating data...")
+        call_command(
+            "generate_data", orders=options["orders"], transactions=options["transactions"],
+            readings=0, stdout=StringIO(),
+        )
+        clerk = User.objects.create_user(username="counter", password="counter", role=User.Role.STAFF)
+        Product.objects.update(stock_quantity=options["checkouts"] * 10)
+        products = list(Product.objects.values_list("pk", flat=True)[:3])
+        dates = DailyRollup.objects.order_by("date").values_list("date", flat=True)
+        report_url = f"/api/reports/{dates.first()}/?end={dates.last()}&group_by=product"
+        checkout = ("/api/orders/checkout/", json.dumps({
+            "customer_id": clerk.pk,
+            "payment_type": "CASH",
+            "items": [{"product_id": pk, "quantity": 1} for pk in products],
+        }))
+        clerk_headers = {"Authorization": f"Bearer {AccessToken.for_user(clerk)}"}
+        admin_headers = {"Authorization": f"Bearer {AccessToken.for_user(User.objects.get(username='bench'))}"}
+
+        # The replica is a point-in-time copy; fine here, reports only read.
+        connection.close()
+        with sqlite3.connect(primary) as source, sqlite3.connect(replica) as target:
+            source.backup(target)
+        connections.settings["replica"] = {**connections.settings["default"], "NAME": replica}
+
+        scenarios = {"idle": (0, None), "reports-on-primary": (options["readers"], None),
+                     "reports-on-replica": (options["readers"], "replica")}
+        results = {}
+        with benchmarks.test_hosts():
+            for name, (readers, alias) in scenarios.items():
+                self.stderr.write(f"Running {name}...")
+                with override_settings(REPLICA_DATABASE=alias, REQUEST_LATENCY_BUDGET_MS=None):
+                    results[name] = benchmarks.checkout_under_load(
+                        checkout, report_url, clerk_headers, admin_headers, options["checkouts"], readers,
+                    )
+        return results
@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import override_settings
+
+from butchery import benchmarks
+
+# SQLite's own defaults; the driver's 5 s busy timeout is left in place.
+SQLITE_ROLLBACK_JOURNAL = {"journal_mode": "DELETE", "synchronous": "FULL"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent write throughput of the database modes: SQLite with the "
+        "default rollback journal, SQLite with the WAL pragmas from SQLITE_PRAGMAS and, "
+        "when DB_ENGINE=postgresql, PostgreSQL. Each mode runs in a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8, help="Concurrent counters.")
+        parser.add_argument("--writes", type=int, default=200, help="Sales per counter.")
+        parser.add_argument("--output", help="Also write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp(prefix="tamucuts-bench-")
+        sqlite = {"ENGINE": "django.db.backends.sqlite3"}
+        modes = {
+            "sqlite-rollback-journal": (
+                {**sqlite, "TEST": {"NAME": os.path.join(directory, "journal.sqlite3")}}, SQLITE_ROLLBACK_JOURNAL,
+            ),
+            "sqlite-wal": (
+                {**sqlite, "TEST": {"NAME": os.path.join(directory, "wal.sqlite3")}}, settings.SQLITE_PRAGMAS,
+            ),
+        }
+        if connections["default"].vendor == "postgresql":
+            modes["postgresql"] = ({**settings.DATABASES["default"], "TEST": {}}, settings.SQLITE_PRAGMAS)
+
+        results = {}
+        for mode, (database, pragmas) in modes.items():
+            self.stderr.write(f"Benchmarking {mode}...")
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                results[mode] = self.run_mode(mode, database, options["writers"], options["writes"])
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as stream:
+                stream.write(output + "\n")
+        self.stdout.write(output)
+
+    def run_mode(self, mode, database, writers, writes):
+        """Create a test database under a temporary alias, run the writers, drop it."""
+        alias = f"bench_{mode.replace('-', '_')}"
+        # configure_settings() fills in the defaults (and insists on a "default").
+        # connections.settings is settings.DATABASES, which create_test_db updates.
+        connections.settings[alias] = connections.configure_settings(
+            {"default": {**connections.settings["default"]}, alias: database}
+        )[alias]
+        connection = connections[alias]
+        old_name = connection.settings_dict.get("NAME")
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            result = benchmarks.run_writes(alias, writers, writes)
+            if connection.vendor == "sqlite":
+                with connection.cursor() as cursor:
+                    cursor.execute("PRAGMA journal_mode")
+                    result["journal_mode"] = cursor.fetchone()[0]
+            return result
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            connection.close()
+            del connections[alias]
+            del connections.settings[alias]
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from butchery import bulk
+
+
+class Command(BaseCommand):
+    help = "Write every product or stock transaction to a CSV or NDJSON file, in constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(bulk.EXPORT_COLUMNS))
+        parser.add_argument("path", help="File to write, or - for standard output.")
+        parser.add_argument("--format", choices=bulk.FORMATS, help="Defaults to the file extension, else csv.")
+        parser.add_argument("--since", help="Ledger rows dated on or after this day (YYYY-MM-DD).")
+        parser.add_argument("--until", help="Ledger rows dated on or before this day (YYYY-MM-DD).")
+        parser.add_argument("--chunk-size", type=int, default=bulk.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            since, until = (
+                datetime.strptime(options[name], "%Y-%m-%d").date() if options[name] else None
+                for name in ("since", "until")
+            )
+        except ValueError:
+            raise CommandError("Invalid date format. Use YYYY-MM-DD.")
+        file_format = options["format"] or bulk.format_for(options["path"])
+        queryset = bulk.export_queryset(options["kind"], since, until)
+        chunks = bulk.export_rows(queryset, bulk.EXPORT_COLUMNS[options["kind"]], file_format, options["chunk_size"])
+        if options["path"] == "-":
+            self.stdout.writelines(chunks)
+            return
+        try:
+            with open(options["path"], "x", encoding="utf-8", newline="") as stream:
+                stream.writelines(chunks)
+        except FileExistsError:
+            raise CommandError(f"{options['path']} already exists.")
+        self.stderr.write(self.style.SUCCESS(f"Exported {options['kind']} to {options['path']}."))
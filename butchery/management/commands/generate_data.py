@@ -0,0 +1,149 @@
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from butchery import catalog, rollups
+from butchery.models import Order, OrderItem, Product, ScaleReading, StockTransaction, User
+
+CUTS = {
+    "beef": ["Ribeye", "Sirloin", "Brisket", "Fillet", "Short Rib", "Mince", "Oxtail", "T-Bone"],
+    "goat": ["Leg", "Shoulder", "Ribs", "Chops", "Liver", "Neck"],
+    "chicken": ["Breast", "Thigh", "Drumstick", "Wings", "Whole", "Gizzards"],
+    "pork": ["Belly", "Loin", "Chops", "Ribs", "Sausages"],
+    "other": ["Tripe", "Kidney", "Bones", "Mixed Offal"],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic butchery data (products, customers, "
+        "orders with items, stock transactions and scale readings) for benchmarks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=2000)
+        parser.add_argument("--customers", type=int, default=200)
+        parser.add_argument("--orders", type=int, default=50000)
+        parser.add_argument("--max-items", type=int, default=5, help="Items per order, 1..N.")
+        parser.add_argument("--transactions", type=int, default=1000000)
+        parser.add_argument("--readings", type=int, default=1000000)
+        parser.add_argument("--days", type=int, default=365, help="Spread rows over this many past days.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--username", default="bench", help="Admin user to create for the benchmarks.")
+        parser.add_argument("--password", default="bench")
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        today = timezone.localdate()
+        self.days = [today - timedelta(days=offset) for offset in range(options["days"])]
+
+        if not User.objects.filter(username=options["username"]).exists():
+            User.objects.create_user(username=options["username"], password=options["password"], role=User.Role.ADMIN)
+        with rollups.paused():
+            customers = self.create_customers(options["customers"])
+            products = self.create_products(options["products"])
+            self.create_orders(options["orders"], options["max_items"], customers, products)
+            self.create_transactions(options["transactions"], products)
+            self.create_readings(options["readings"], products)
+        self.log(f"Rebuilt {rollups.rebuild()} daily rollup rows")
+        catalog.bump()
+        self.stdout.write(self.style.SUCCESS("Synthetic data ready."))
+
+    def log(self, message):
+        self.stdout.write(message)
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield min(self.batch_size, total - start)
+
+    def create_customers(self, count):
+        start = User.objects.count()
+        users = [
+            User(username=f"customer{start + n}", role=User.Role.CUSTOMER, password="!")
+            for n in range(count)
+        ]
+        users = User.objects.bulk_create(users, batch_size=self.batch_size)
+        self.log(f"Created {len(users)} customers")
+        return [user.pk for user in users] or list(User.objects.values_list("pk", flat=True))
+
+    def create_products(self, count):
+        rows = []
+        categories = list(CUTS)
+        for n in range(count):
+            category = self.random.choice(categories)
+            rows.append(Product(
+                name=f"{self.random.choice(CUTS[category])} #{n + 1}",
+                category=category,
+                price=Decimal(self.random.randint(200, 4000)) / 100,
+                stock_quantity=self.random.randint(0, 500),
+            ))
+        products = Product.objects.bulk_create(rows, batch_size=self.batch_size)
+        self.log(f"Created {len(products)} products")
+        return [(product.pk, product.price) for product in products]
+
+    def create_orders(self, count, max_items, customers, products):
+        created = items = 0
+        per_day = -(-count // len(self.days))
+        for day in self.days:
+            if created >= count:
+                break
+            day_count = min(per_day, count - created)
+            with transaction.atomic():
+                orders = Order.objects.bulk_create([
+                    Order(
+                        customer_id=self.random.choice(customers),
+                        status=self.random.choice(Order.Status.values),
+                        payment_type=self.random.choice(["CASH", "MOBILE"]),
+                    )
+                    for _ in range(day_count)
+                ], batch_size=self.batch_size)
+                # created_at is auto_now_add, so date the day's orders afterwards.
+                moment = timezone.make_aware(datetime.combine(day, time(12)))
+                Order.objects.filter(pk__in=[order.pk for order in orders]).update(created_at=moment)
+                rows = [
+                    OrderItem(order_id=order.pk, product_id=product_id, quantity=self.random.randint(1, 5), unit_price=price)
+                    for order in orders
+                    for product_id, price in self.random.sample(products, min(len(products), self.random.randint(1, max_items)))
+                ]
+                OrderItem.objects.bulk_create(rows, batch_size=self.batch_size)
+            created += len(orders)
+            items += len(rows)
+        self.log(f"Created {created} orders with {items} items")
+
+    def create_transactions(self, count, products):
+        types = StockTransaction.TransactionType.values
+        for size in self.batches(count):
+            StockTransaction.objects.bulk_create([
+                StockTransaction(
+                    product_id=self.random.choice(products)[0],
+                    transaction_type=self.random.choice(types),
+                    quantity=round(self.random.uniform(0.5, 50), 2),
+                    date=self.random.choice(self.days),
+                )
+                for _ in range(size)
+            ])
+        self.log(f"Created {count} stock transactions")
+
+    def create_readings(self, count, products):
+        now = timezone.now()
+        span = len(self.days) * 86400
+        for size in self.batches(count):
+            rows = []
+            for _ in range(size):
+                product_id, price = self.random.choice(products)
+                weight = round(self.random.uniform(0.1, 10), 3)
+                rows.append(ScaleReading(
+                    product_id=product_id,
+                    weight_kg=weight,
+                    price_per_kg=price,
+                    total_price=ScaleReading.compute_total(weight, price),
+                    recorded_at=now - timedelta(seconds=self.random.randrange(span)),
+                ))
+            ScaleReading.objects.bulk_create(rows)
+        self.log(f"Created {count} scale readings")
@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from butchery import bulk
+
+
+class Command(BaseCommand):
+    help = (
+        "Load products or stock transactions from a CSV or NDJSON file in chunks. "
+        "Rows are validated like the API; invalid rows are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(bulk.IMPORTERS))
+        parser.add_argument("path", help="File to load, or - for standard input.")
+        parser.add_argument("--format", choices=bulk.FORMATS, help="Defaults to the file extension, else csv.")
+        parser.add_argument("--chunk-size", type=int, default=bulk.CHUNK_SIZE, help="Rows per transaction.")
+
+    def handle(self, *args, **options):
+        file_format = options["format"] or bulk.format_for(options["path"])
+        importer = bulk.IMPORTERS[options["kind"]](chunk_size=options["chunk_size"])
+        try:
+            stream = sys.stdin if options["path"] == "-" else open(options["path"], encoding="utf-8", newline="")
+        except OSError as exc:
+            raise CommandError(str(exc))
+        with stream:
+            result = importer.run(bulk.read_rows(stream, file_format))
+        for error in result["errors"]:
+            self.stderr.write(f"Row {error['index']}: {error['errors']}")
+        if result["error_count"] > len(result["errors"]):
+            self.stderr.write(f"... and {result['error_count'] - len(result['errors'])} more invalid rows")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['created']}, updated {result['updated']}, skipped {result['error_count']} invalid rows."
+        ))
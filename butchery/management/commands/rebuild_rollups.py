@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from butchery import rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailyRollup table from the stock ledger and order items."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="Only rebuild buckets on or after this date (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        since = options["since"]
+        if since:
+            try:
+                since = datetime.strptime(since, "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("Invalid date format. Use YYYY-MM-DD.")
+        count = rollups.rebuild(since=since)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} daily rollup rows."))
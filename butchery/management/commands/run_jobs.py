@@ -0,0 +1,60 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def drain(poll_interval, once):
+    """Run jobs until interrupted, or until the queue is empty with ``once``."""
+    from butchery import jobs
+
+    while True:
+        job = jobs.run_next()
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+
+
+def worker_process(poll_interval, once):
+    """Entry point of a pool process; spawned children must set up Django first."""
+    import django
+
+    django.setup()
+    try:
+        drain(poll_interval, once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the Job table with a pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=2, help="Number of worker processes.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        processes = max(1, options["processes"])
+        if processes == 1:
+            drain(options["poll_interval"], options["once"])
+            return
+        # Children must not share the parent's database connections.
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=worker_process, args=(options["poll_interval"], options["once"]))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {processes} job workers.")
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
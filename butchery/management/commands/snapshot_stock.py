@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from butchery import ledger
+
+
+class Command(BaseCommand):
+    help = "Store every product's ledger balance at the end of a day (run daily or monthly from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Day to snapshot (YYYY-MM-DD). Defaults to yesterday.")
+
+    def handle(self, *args, **options):
+        date = options["date"]
+        if date:
+            try:
+                date = datetime.strptime(date, "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("Invalid date format. Use YYYY-MM-DD.")
+        else:
+            date = timezone.localdate() - timedelta(days=1)
+        count = ledger.take_snapshots(date)
+        self.stdout.write(self.style.SUCCESS(f"Stored {count} stock snapshots for {date}."))
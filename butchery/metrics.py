@@ -0,0 +1,179 @@
+"""
+Per-request performance metrics.
+
+``RequestMetricsMiddleware`` (``butchery.middleware``) opens a ``Sample``
+for every request; a database execute wrapper adds each query's count and
+time to it, and ``InstrumentedViewMixin`` adds the DRF action name and the
+time spent serializing/rendering. Finished samples are folded into
+in-memory histograms labelled by endpoint, method and action, which
+``/api/metrics/`` exposes in the Prometheus text format.
+
+The histograms are per process and reset on restart; scrape every worker.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.response import Response
+
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES = (1, 2, 5, 10, 20, 50, 100, 200)
+BYTES = (512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608)
+
+METRICS = {
+    "request_duration_seconds": ("Wall time per request.", SECONDS),
+    "request_queries": ("SQL queries per request.", QUERIES),
+    "request_sql_seconds": ("Time spent in SQL per request.", SECONDS),
+    "request_serialize_seconds": ("Time spent serializing and rendering DRF responses.", SECONDS),
+    "response_size_bytes": ("Response body size (non-streaming responses).", BYTES),
+}
+PREFIX = "tamucuts_"
+LABELS = ("endpoint", "method", "action")
+
+_current = contextvars.ContextVar("request_metrics_sample", default=None)
+
+
+class Sample:
+    """What one request cost; mutated by the query hook and the DRF mixin."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.action = None
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+
+def start():
+    """Begin a sample for the current request; returns the token for ``finish``."""
+    sample = Sample()
+    return sample, _current.set(sample)
+
+
+def current():
+    return _current.get()
+
+
+def finish(token):
+    _current.reset(token)
+
+
+@contextmanager
+def serializing():
+    """Count the enclosed block as serialization time of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        sample = _current.get()
+        if sample is not None:
+            sample.serialize_seconds += time.perf_counter() - started
+
+
+def record_query(execute, sql, params, many, context):
+    sample = _current.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.queries += 1
+        sample.sql_seconds += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_query_hook(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        counts, total, observed = self.series.get(labels, ([0] * len(self.buckets), 0.0, 0))
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+        self.series[labels] = counts, total + value, observed + 1
+
+    def render(self, name):
+        for labels, (counts, total, observed) in sorted(self.series.items()):
+            base = ",".join(f'{key}="{_escape(value)}"' for key, value in zip(LABELS, labels))
+            for bound, count in zip(self.buckets, counts):
+                yield f'{name}_bucket{{{base},le="{bound}"}} {count}'
+            yield f'{name}_bucket{{{base},le="+Inf"}} {observed}'
+            yield f"{name}_sum{{{base}}} {total:.6f}"
+            yield f"{name}_count{{{base}}} {observed}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {name: Histogram(buckets) for name, (_, buckets) in METRICS.items()}
+
+    def observe(self, labels, **values):
+        with self._lock:
+            for name, value in values.items():
+                if value is not None:
+                    self.histograms[name].observe(labels, value)
+
+    def render(self):
+        """All histograms in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, (help_text, _) in METRICS.items():
+                lines.append(f"# HELP {PREFIX}{name} {help_text}")
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                lines.extend(self.histograms[name].render(PREFIX + name))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class InstrumentedViewMixin:
+    """
+    DRF view mixin: labels the current sample with the view's action and
+    renders the response eagerly so its serialization cost is measured.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        sample = current()
+        if sample is not None:
+            sample.action = getattr(self, "action", None)
+        super().initial(request, *args, **kwargs)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        to_representation = serializer.to_representation
+
+        def timed(instance):
+            with serializing():
+                return to_representation(instance)
+
+        serializer.to_representation = timed
+        return serializer
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if isinstance(response, Response) and not response.is_rendered and current() is not None:
+            with serializing():
+                response.render()
+        return response
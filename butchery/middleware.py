@@ -0,0 +1,72 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger("butchery.metrics")
+
+
+class RequestMetricsMiddleware:
+    """
+    Times every request, counts its SQL queries and records the results in
+    ``butchery.metrics.registry``. Requests over ``REQUEST_QUERY_BUDGET``
+    queries or ``REQUEST_LATENCY_BUDGET_MS`` milliseconds are logged as
+    warnings; set either budget to None to disable it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        sample, token = metrics.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish(token)
+        self.record(request, response, sample)
+        return response
+
+    async def __acall__(self, request):
+        sample, token = metrics.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish(token)
+        self.record(request, response, sample)
+        return response
+
+    def record(self, request, response, sample):
+        elapsed = time.perf_counter() - sample.started
+        match = request.resolver_match
+        endpoint = match.view_name if match else "unmatched"
+        action = sample.action or request.method.lower()
+        size = None if response.streaming else len(response.content)
+        metrics.registry.observe(
+            (endpoint, request.method, action),
+            request_duration_seconds=elapsed,
+            request_queries=sample.queries,
+            request_sql_seconds=sample.sql_seconds,
+            request_serialize_seconds=sample.serialize_seconds,
+            response_size_bytes=size,
+        )
+
+        query_budget = getattr(settings, "REQUEST_QUERY_BUDGET", None)
+        latency_budget = getattr(settings, "REQUEST_LATENCY_BUDGET_MS", None)
+        over_queries = query_budget is not None and sample.queries > query_budget
+        over_latency = latency_budget is not None and elapsed * 1000 > latency_budget
+        if over_queries or over_latency:
+            logger.warning(
+                "%s %s (%s/%s) took %.0f ms with %d queries (%.0f ms SQL, %.0f ms serializing); "
+                "budget %s ms / %s queries",
+                request.method, request.path, endpoint, action, elapsed * 1000, sample.queries,
+                sample.sql_seconds * 1000, sample.serialize_seconds * 1000, latency_budget, query_budget,
+            )
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.7 on 2026-10-17 22:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('butchery', '0010_stock_ledger_indexes_stocksnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at', 'id'], name='butchery_or_created_ea281c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at'], name='butchery_or_status_7e0ac4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scalereading',
+            index=models.Index(fields=['recorded_at', 'id'], name='butchery_sc_recorde_558bc8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scalereading',
+            index=models.Index(fields=['product', 'recorded_at'], name='butchery_sc_product_6e8618_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['date'], name='butchery_st_date_1291cd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['created_at', 'id'], name='butchery_st_created_e50ee8_idx'),
+        ),
+    ]
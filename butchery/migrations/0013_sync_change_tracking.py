@@ -0,0 +1,71 @@
+# Generated by Django 5.0.7 on 2026-10-17 23:07
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    # Existing rows were last changed when they were written.
+    apps.get_model("butchery", "StockTransaction").objects.update(updated_at=F("created_at"))
+    apps.get_model("butchery", "ScaleReading").objects.update(updated_at=F("recorded_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('butchery', '0012_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stream', models.CharField(max_length=50)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Tombstone',
+                'verbose_name_plural': 'Tombstones',
+                'ordering': ['-deleted_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='client_ref',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='scalereading',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='stocktransaction',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['updated_at', 'id'], name='butchery_or_updated_7c898c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at', 'id'], name='butchery_pr_updated_831ba6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scalereading',
+            index=models.Index(fields=['updated_at', 'id'], name='butchery_sc_updated_4199b5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['updated_at', 'id'], name='butchery_st_updated_8b2bec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='butchery_to_deleted_3f12ea_idx'),
+        ),
+    ]
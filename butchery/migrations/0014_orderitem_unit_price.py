@@ -0,0 +1,32 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_unit_price(apps, schema_editor):
+    # The sale price was never stored; the current price is the best guess.
+    OrderItem = apps.get_model("butchery", "OrderItem")
+    Product = apps.get_model("butchery", "Product")
+    OrderItem.objects.update(
+        unit_price=Subquery(Product.objects.filter(pk=OuterRef("product_id")).values("price")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('butchery', '0013_sync_change_tracking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True),
+        ),
+        migrations.RunPython(backfill_unit_price, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-17 23:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('butchery', '0014_orderitem_unit_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stocksnapshot',
+            name='archived',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.7 on 2026-10-17 23:22
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_heartbeat(apps, schema_editor):
+    # Jobs running during the upgrade go stale from when they started.
+    apps.get_model("butchery", "Job").objects.filter(status="RUNNING").update(heartbeat_at=F("started_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('butchery', '0015_stocksnapshot_archived'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_heartbeat, migrations.RunPython.noop),
+    ]
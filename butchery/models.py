@@ -1,8 +1,13 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 
+from . import catalog, pricing
+
 
 class User(AbstractUser):
     class Role(models.TextChoices):
@@ -22,6 +27,24 @@ class User(AbstractUser):
         return f"{self.username} ({self.get_role_display()})"
 
 
+class ProductQuerySet(models.QuerySet):
+    def reserve(self, product_id, quantity):
+        """
+        Atomically take ``quantity`` off a product's stock.
+
+        Runs a single ``UPDATE ... SET stock_quantity = stock_quantity - n
+        WHERE stock_quantity >= n`` so concurrent sales can neither lose an
+        update nor oversell. Returns False if there was not enough stock.
+        """
+        reserved = self.filter(pk=product_id, stock_quantity__gte=quantity).update(
+            stock_quantity=F("stock_quantity") - quantity,
+            updated_at=timezone.now(),
+        )
+        if reserved:
+            catalog.bump()
+        return bool(reserved)
+
+
 class Product(models.Model):
     class Category(models.TextChoices):
         BEEF = "beef", "Beef"
@@ -38,6 +61,8 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         ordering = ["name"]
         verbose_name = "Product"
@@ -45,6 +70,7 @@ class Product(models.Model):
         indexes = [
             models.Index(fields=["name"]),
             models.Index(fields=["category"]),
+            models.Index(fields=["updated_at", "id"]),
         ]
 
     def __str__(self):
@@ -55,6 +81,48 @@ class Product(models.Model):
         return self.stock_quantity > 0
 
 
+def line_total(prefix=""):
+    """SQL expression for ``quantity * unit_price`` of an order item."""
+    return ExpressionWrapper(
+        F(f"{prefix}quantity") * F(f"{prefix}unit_price"),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def sum_or_zero(expression):
+    """Decimal ``Sum`` that yields 0 rather than NULL for empty groups."""
+    return Coalesce(
+        Sum(expression),
+        Value(0, output_field=DecimalField(max_digits=12, decimal_places=2)),
+    )
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        Annotate each order with ``total_price`` summed in SQL. A correlated
+        subquery (rather than JOIN + GROUP BY) lets a paginated list walk the
+        created_at index and stop after one page.
+        """
+        totals = (
+            OrderItem.objects.filter(order=OuterRef("pk"))
+            .order_by()
+            .values("order")
+            .annotate(total=Sum(line_total()))
+            .values("total")
+        )
+        return self.annotate(
+            total_price=Coalesce(
+                Subquery(totals, output_field=DecimalField(max_digits=12, decimal_places=2)),
+                Value(0, output_field=DecimalField(max_digits=12, decimal_places=2)),
+            )
+        )
+
+    def revenue(self):
+        """Total value of every item in these orders, as one aggregate query."""
+        return self.aggregate(revenue=sum_or_zero(line_total("items__")))["revenue"]
+
+
 class Order(models.Model):
     class Status(models.TextChoices):
         PENDING = "PENDING", "Pending"
@@ -79,17 +147,31 @@ class Order(models.Model):
     choices=[("CASH", "Cash"), ("MOBILE", "Mobile Money")],
     default="CASH"
     )
+    # Set by offline clients so a replayed sale is recorded once (see butchery.sync).
+    client_ref = models.CharField(max_length=64, unique=True, null=True, blank=True)
+
+    objects = OrderQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created_at"]
         verbose_name = "Order"
         verbose_name_plural = "Orders"
+        indexes = [
+            models.Index(fields=["created_at", "id"]),
+            models.Index(fields=["status", "created_at"]),
+            models.Index(fields=["updated_at", "id"]),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} by {self.customer.username}"
 
     def get_total_price(self):
-        """Calculate total order cost from items."""
+        """
+        Total order cost. Uses the ``with_totals()`` annotation when present,
+        otherwise sums the (possibly prefetched) items.
+        """
+        if hasattr(self, "total_price"):
+            return self.total_price
         return sum(item.get_total_price() for item in self.items.all())
 
 
@@ -97,6 +179,9 @@ class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="order_items")
     quantity = models.PositiveIntegerField(default=1)
+    # The product's price when the item was sold; later price changes leave
+    # the sale (and its revenue in the rollup) as it was.
+    unit_price = models.DecimalField(max_digits=8, decimal_places=2, blank=True)
 
     class Meta:
         unique_together = ("order", "product")
@@ -106,9 +191,15 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
 
+    def save(self, *args, **kwargs):
+        if self.unit_price is None:
+            self.unit_price = self.product.price
+        super().save(*args, **kwargs)
+
     def get_total_price(self):
         """Get total price for this order item."""
-        return self.quantity * self.product.price
+        price = self.product.price if self.unit_price is None else self.unit_price
+        return pricing.line_total(self.quantity, price)
 
 class ScaleReading(models.Model):
     """
@@ -120,11 +211,24 @@ class ScaleReading(models.Model):
     price_per_kg = models.DecimalField(max_digits=10, decimal_places=2)
     total_price = models.DecimalField(max_digits=12, decimal_places=2, blank=True)
     recorded_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["recorded_at", "id"]),
+            models.Index(fields=["product", "recorded_at"]),
+            models.Index(fields=["updated_at", "id"]),
+        ]
+
+    @staticmethod
+    def compute_total(weight_kg, price_per_kg):
+        """Exact ``weight * price`` rounded half-up to cents (see ``butchery.pricing``)."""
+        return pricing.line_total(weight_kg, price_per_kg)
 
     def save(self, *args, **kwargs):
         # auto-calc total_price if not provided
         if not self.total_price:
-            self.total_price = self.weight_kg * float(self.price_per_kg)
+            self.total_price = self.compute_total(self.weight_kg, self.price_per_kg)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -141,13 +245,16 @@ class StockNotification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def check_and_trigger(self):
-        """Simple check for low stock."""
-        if self.product.stock_quantity < self.threshold_kg:
-            self.is_triggered = True
-            # In production, integrate SMS/email here
-        else:
-            self.is_triggered = False
-        self.save()
+        """
+        Check this notification now. Stock-changing writes already do this in
+        bulk via ``butchery.notifications``; alerts go to its dispatcher.
+        """
+        from . import notifications
+
+        alerts = notifications.evaluate([self.product_id])
+        if alerts:
+            notifications.dispatcher.submit(alerts)
+        self.refresh_from_db(fields=["is_triggered"])
 
     def __str__(self):
         status = "⚠️ Low Stock" if self.is_triggered else "OK"
@@ -176,11 +283,132 @@ class StockTransaction(models.Model):
     date = models.DateField(default=timezone.now)
     remarks = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-created_at"]
         verbose_name = "Stock Transaction"
         verbose_name_plural = "Stock Transactions"
+        indexes = [
+            models.Index(fields=["product", "date"]),
+            models.Index(fields=["transaction_type", "date"]),
+            models.Index(fields=["date"]),
+            models.Index(fields=["created_at", "id"]),
+            models.Index(fields=["updated_at", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_type} - {self.product.name} ({self.quantity} kg)"
+
+
+class DailyRollup(models.Model):
+    """
+    Per-day, per-product totals of the stock ledger and order revenue.
+    Kept current on every StockTransaction / OrderItem write (see
+    ``butchery.rollups``); ``manage.py rebuild_rollups`` recomputes it.
+    """
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="daily_rollups")
+    stock_in = models.FloatField(default=0)
+    stock_out = models.FloatField(default=0)
+    stock_closed = models.FloatField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ["-date"]
+        unique_together = ("date", "product")
+        verbose_name = "Daily Rollup"
+        verbose_name_plural = "Daily Rollups"
+
+    def __str__(self):
+        return f"{self.date} - {self.product.name}: {self.stock_out} out, {self.revenue} revenue"
+
+
+
+class StockSnapshot(models.Model):
+    """
+    A product's ledger balance at the end of ``date``.
+
+    Balances as of any later date are this snapshot plus the (short) tail of
+    the ledger after it, and ledger rows older than a snapshot can be
+    archived. See ``butchery.ledger``.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="stock_snapshots")
+    date = models.DateField()
+    balance = models.FloatField()
+    # The ledger rows before this snapshot were archived, so it is the
+    # starting point for every later balance and cannot be recomputed.
+    archived = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-date"]
+        unique_together = ("product", "date")
+        verbose_name = "Stock Snapshot"
+        verbose_name_plural = "Stock Snapshots"
+
+    def __str__(self):
+        return f"{self.product.name} @ {self.date}: {self.balance} kg"
+
+
+
+class Job(models.Model):
+    """
+    A unit of background work run by ``manage.py run_jobs`` (see
+    ``butchery.jobs``). Submitting again with the same ``idempotency_key``
+    returns the existing job instead of queueing a duplicate.
+    """
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Pending"
+        RUNNING = "RUNNING", "Running"
+        SUCCEEDED = "SUCCEEDED", "Succeeded"
+        FAILED = "FAILED", "Failed"
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    idempotency_key = models.CharField(max_length=100, unique=True, null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Renewed by the worker while the job runs; see butchery.jobs.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Job"
+        verbose_name_plural = "Jobs"
+        indexes = [
+            models.Index(fields=["status", "run_after"]),
+            models.Index(fields=["created_at", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.get_status_display()})"
+
+
+class Tombstone(models.Model):
+    """
+    Marks a synced row as deleted so offline clients can drop their copy
+    (see ``butchery.sync``). ``stream`` names the sync stream, e.g.
+    ``"products"``. Pruned after ``SYNC_TOMBSTONE_DAYS``.
+    """
+    stream = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-deleted_at"]
+        verbose_name = "Tombstone"
+        verbose_name_plural = "Tombstones"
+        indexes = [
+            models.Index(fields=["deleted_at", "id"]),
+        ]
 
     def __str__(self):
-        return f"{self.transaction_type} - {self.product.name} ({self.quantity} kg)"
\ No newline at end of file
+        return f"{self.stream} #{self.object_id} deleted {self.deleted_at}"
@@ -0,0 +1,122 @@
+"""
+Low-stock notification engine.
+
+After a stock-changing write commits, every StockNotification of the
+affected products is evaluated in one query and ``is_triggered`` is flipped
+with one UPDATE, only for rows whose state actually changed. Newly
+triggered rows become alerts that a background thread hands to the backend
+named by ``NOTIFICATION_BACKEND``, so SMS/email never run on the request path.
+"""
+import logging
+import queue
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Value, When
+from django.utils.module_loading import import_string
+
+from .models import StockNotification
+
+logger = logging.getLogger(__name__)
+
+Alert = namedtuple("Alert", ["notification_id", "product_id", "product_name", "stock_quantity", "threshold_kg"])
+
+
+class LoggingBackend:
+    """Default backend: writes alerts to the log."""
+
+    def send(self, alert):
+        logger.warning(
+            "Low stock: %s has %s left (threshold %s)",
+            alert.product_name, alert.stock_quantity, alert.threshold_kg,
+        )
+
+
+class LocmemBackend:
+    """Keeps sent alerts in ``LocmemBackend.outbox``; for tests."""
+    outbox = []
+
+    def send(self, alert):
+        self.outbox.append(alert)
+
+
+def get_backend():
+    return import_string(getattr(settings, "NOTIFICATION_BACKEND", "butchery.notifications.LoggingBackend"))()
+
+
+class Dispatcher:
+    """Bounded queue drained by a daemon thread; submitting never blocks."""
+
+    def __init__(self, maxsize=1000):
+        self.queue = queue.Queue(maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, alerts):
+        self._start()
+        for alert in alerts:
+            try:
+                self.queue.put_nowait(alert)
+            except queue.Full:
+                logger.error("Alert queue full, dropping low-stock alert for %s", alert.product_name)
+
+    def flush(self):
+        """Block until every submitted alert has been handled."""
+        self.queue.join()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="stock-alerts", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            alert = self.queue.get()
+            try:
+                get_backend().send(alert)
+            except Exception:
+                logger.exception("Failed to send low-stock alert for %s", alert.product_name)
+            finally:
+                self.queue.task_done()
+
+
+dispatcher = Dispatcher()
+
+
+def evaluate(product_ids):
+    """
+    Re-evaluate the thresholds of ``product_ids`` and return the alerts for
+    notifications that just became triggered. One SELECT, plus one UPDATE
+    when anything changed.
+    """
+    rows = StockNotification.objects.filter(product_id__in=set(product_ids)).values_list(
+        "id", "is_triggered", "threshold_kg", "product_id", "product__name", "product__stock_quantity"
+    )
+    triggered, changed, alerts = [], [], []
+    for pk, is_triggered, threshold, product_id, name, stock in rows:
+        low = stock < threshold
+        if low != is_triggered:
+            changed.append(pk)
+            if low:
+                triggered.append(pk)
+                alerts.append(Alert(pk, product_id, name, stock, threshold))
+    if changed:
+        StockNotification.objects.filter(pk__in=changed).update(
+            is_triggered=Case(When(pk__in=triggered, then=Value(True)), default=Value(False))
+        )
+    return alerts
+
+
+def stock_changed(product_ids):
+    """Evaluate ``product_ids`` after the current transaction commits and dispatch alerts."""
+    product_ids = set(product_ids)
+
+    def run():
+        alerts = evaluate(product_ids)
+        if alerts:
+            dispatcher.submit(alerts)
+
+    transaction.on_commit(run)
@@ -0,0 +1,54 @@
+from django.http import StreamingHttpResponse
+from rest_framework.pagination import CursorPagination
+
+from . import renderers
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Keyset (cursor) pagination for the router endpoints.
+
+    The ordering follows the model's ``Meta.ordering`` with the primary key
+    appended as a tie-breaker, so pages stay stable while new rows arrive.
+    A view can override this with a ``cursor_ordering`` attribute.
+    """
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, "cursor_ordering", None)
+        if ordering is None:
+            ordering = list(queryset.model._meta.ordering) or ["-pk"]
+            if not any(field.lstrip("-") in ("pk", "id") for field in ordering):
+                # Tie-break in the same direction as the leading field.
+                ordering.append("-pk" if ordering[0].startswith("-") else "pk")
+        return tuple(ordering)
+
+
+class StreamingListMixin:
+    """
+    Opt-in streaming for list endpoints.
+
+    ``?stream=true`` skips pagination and writes the JSON array in chunks
+    of ``stream_chunk_size`` rows from a server-side iterator, so exports
+    never hold the whole queryset in memory.
+    """
+    stream_param = "stream"
+    stream_chunk_size = 500
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get(self.stream_param, "").lower() not in ("1", "true", "yes"):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(self.stream_rows(queryset), content_type="application/json")
+        response["Cache-Control"] = "no-cache"
+        return response
+
+    def stream_rows(self, queryset):
+        serializer_class = self.get_serializer_class()
+        context = self.get_serializer_context()
+        rows = (
+            serializer_class(instance, context=context).data
+            for instance in queryset.iterator(chunk_size=self.stream_chunk_size)
+        )
+        return renderers.stream_array(rows, self.stream_chunk_size)
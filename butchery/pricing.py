@@ -0,0 +1,136 @@
+"""
+Exact sale pricing.
+
+Money is ``Decimal`` throughout and is rounded half-up to the cent at three
+defined points per line: the subtotal (quantity x unit price), the discount
+and the tax. Totals are sums of already-rounded lines, so a receipt always
+adds up to its lines. Quantities may be fractional (kilograms of a weighed
+cut); floats from the scales are converted through ``repr`` so 1.1 kg is
+1.1, not 1.100000000000000088817841970012523.
+
+Tax comes from ``SALES_TAX_RATE`` (a fraction, e.g. ``0.16``) and
+``PRICES_INCLUDE_TAX``: shelf prices that include tax have it carved out of
+the line, otherwise it is added on top.
+
+``price_lines`` prices many lines in one call (reports, bulk ingestion);
+``price_line`` is the single-line form and gives identical results.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+from typing import NamedTuple
+
+from django.conf import settings
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0")
+ONE = Decimal("1")
+HUNDRED = Decimal("100")
+ROUNDING = ROUND_HALF_UP
+
+
+class Line(NamedTuple):
+    quantity: Decimal
+    unit_price: Decimal
+    discount_percent: Decimal = ZERO
+    discount: Decimal = ZERO  # fixed amount off the line, after the percentage
+
+
+class PricedLine(NamedTuple):
+    quantity: Decimal
+    unit_price: Decimal
+    subtotal: Decimal
+    discount: Decimal
+    tax: Decimal
+    total: Decimal
+
+
+class Quote(NamedTuple):
+    lines: list
+    subtotal: Decimal
+    discount: Decimal
+    tax: Decimal
+    total: Decimal
+
+
+def to_decimal(value):
+    """``value`` as an exact ``Decimal``; floats go through their shortest repr."""
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    return Decimal(value)
+
+
+def tax_rate():
+    return to_decimal(getattr(settings, "SALES_TAX_RATE", ZERO))
+
+
+def prices_include_tax():
+    return getattr(settings, "PRICES_INCLUDE_TAX", True)
+
+
+def line_total(quantity, unit_price):
+    """``quantity * unit_price`` rounded to the cent; no discount or tax."""
+    return (to_decimal(quantity) * to_decimal(unit_price)).quantize(CENT, rounding=ROUNDING)
+
+
+def price_line(quantity, unit_price, discount_percent=ZERO, discount=ZERO, rate=None, inclusive=None):
+    """Price one line; see ``price_lines``."""
+    return price_lines([Line(quantity, unit_price, discount_percent, discount)], rate, inclusive).lines[0]
+
+
+def price_lines(lines, rate=None, inclusive=None):
+    """
+    Price an iterable of ``Line`` (or equivalent tuples) and return a
+    ``Quote``. ``rate`` and ``inclusive`` default to the tax settings.
+    Raises ``ValueError`` for a negative quantity, price or discount, or a
+    percentage over 100; a discount larger than the line is capped at it.
+    """
+    rate = tax_rate() if rate is None else to_decimal(rate)
+    inclusive = prices_include_tax() if inclusive is None else inclusive
+    if rate < ZERO:
+        raise ValueError("Tax rate cannot be negative.")
+    divisor = ONE + rate
+    # Price lists repeat the same few prices; convert each one once.
+    prices = {}
+    priced = []
+    subtotal_sum = discount_sum = tax_sum = total_sum = ZERO
+    for line in lines:
+        quantity, unit_price, discount_percent, discount = line if len(line) == 4 else Line(*line)
+        quantity = to_decimal(quantity)
+        price = prices.get(unit_price)
+        if price is None:
+            price = prices[unit_price] = to_decimal(unit_price)
+        if quantity < ZERO or price < ZERO:
+            raise ValueError("Quantity and unit price cannot be negative.")
+        subtotal = (quantity * price).quantize(CENT, rounding=ROUNDING)
+
+        off = ZERO
+        if discount_percent:
+            discount_percent = to_decimal(discount_percent)
+            if not ZERO <= discount_percent <= HUNDRED:
+                raise ValueError("Discount percentage must be between 0 and 100.")
+            off = (subtotal * discount_percent / HUNDRED).quantize(CENT, rounding=ROUNDING)
+        if discount:
+            discount = to_decimal(discount)
+            if discount < ZERO:
+                raise ValueError("Discount cannot be negative.")
+            off += discount.quantize(CENT, rounding=ROUNDING)
+        if off > subtotal:
+            off = subtotal
+        net = subtotal - off
+
+        if not rate:
+            tax, total = ZERO, net
+        elif inclusive:
+            tax = net - (net / divisor).quantize(CENT, rounding=ROUNDING)
+            total = net
+        else:
+            tax = (net * rate).quantize(CENT, rounding=ROUNDING)
+            total = net + tax
+
+        priced.append(PricedLine(quantity, price, subtotal, off, tax, total))
+        subtotal_sum += subtotal
+        discount_sum += off
+        tax_sum += tax
+        total_sum += total
+    return Quote(priced, subtotal_sum, discount_sum, tax_sum, total_sum)
@@ -0,0 +1,87 @@
+"""
+Fast JSON for API responses and request bodies.
+
+``FastJSONRenderer`` / ``FastJSONParser`` use orjson when it is installed,
+which encodes datetimes, dates and UUIDs natively in one C pass, and fall
+back to DRF's stdlib implementation otherwise (or with
+``JSON_BACKEND = "stdlib"``). Output matches ``JSONRenderer``: the other
+types go through DRF's ``JSONEncoder.default`` (a raw ``Decimal`` becomes a
+number), UTC datetimes end in ``Z`` and U+2028/U+2029 are escaped.
+
+``stream_array`` encodes big lists for ``StreamingHttpResponse`` in chunks
+of rows rather than one write per row.
+"""
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional, see requirements.txt
+    orjson = None
+
+_default = JSONEncoder().default
+OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def backend():
+    """``"orjson"`` when it is installed and not switched off, else ``"stdlib"``."""
+    if orjson is not None and getattr(settings, "JSON_BACKEND", "orjson") == "orjson":
+        return "orjson"
+    return "stdlib"
+
+
+def dumps(data):
+    """Compact UTF-8 JSON bytes, as ``JSONRenderer`` would render ``data``."""
+    if backend() == "orjson":
+        ret = orjson.dumps(data, default=_default, option=OPTIONS)
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
+    return JSONRenderer().render(data)
+
+
+def loads(data):
+    if backend() == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def stream_array(items, chunk_size=500):
+    """Encode ``items`` as one JSON array, yielding a bytes chunk per ``chunk_size`` items."""
+    yield b"["
+    separator = b""
+    batch = []
+    for item in items:
+        batch.append(dumps(item))
+        if len(batch) >= chunk_size:
+            yield separator + b",".join(batch)
+            separator, batch = b",", []
+    if batch:
+        yield separator + b",".join(batch)
+    yield b"]"
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        # orjson only indents by two; leave pretty-printing to the stdlib.
+        if backend() == "stdlib" or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        if backend() == "stdlib" or encoding.lower().replace("-", "") != "utf8":
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
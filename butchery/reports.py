@@ -0,0 +1,81 @@
+from django.db.models import Sum
+
+from .models import DailyRollup, SalesInsight, sum_or_zero
+
+# Breakdown keys: output name -> DailyRollup lookup.
+GROUPINGS = {
+    "date": {"date": "date"},
+    "product": {"product_id": "product_id", "product": "product__name"},
+    "category": {"category": "product__category"},
+}
+
+# Report figure -> DailyRollup column.
+STOCK_FIELDS = {
+    "opening_stock": "stock_in",
+    "sales": "stock_out",
+    "closing_stock": "stock_closed",
+}
+
+
+def _totals():
+    # "revenue" would clash with the model field, so it is aggregated as "total_revenue".
+    totals = {name: Sum(column, default=0.0) for name, column in STOCK_FIELDS.items()}
+    totals["total_revenue"] = sum_or_zero("revenue")
+    return totals
+
+
+def _figures(row):
+    figures = {name: row[name] for name in STOCK_FIELDS}
+    figures["revenue"] = row["total_revenue"]
+    return figures
+
+
+def _rollups(start, end):
+    rollups = DailyRollup.objects.all()
+    if start:
+        rollups = rollups.filter(date__range=(start, end or start))
+    return rollups
+
+
+def summarize(start=None, end=None):
+    """
+    IN/OUT/CLOSE quantities and revenue for ``start``..``end`` (all time if
+    ``start`` is None), read from the daily rollup in one aggregate query.
+    """
+    return _figures(_rollups(start, end).aggregate(**_totals()))
+
+
+async def asummarize(start=None, end=None):
+    """``summarize`` for async views, via ``aaggregate``."""
+    return _figures(await _rollups(start, end).aaggregate(**_totals()))
+
+
+def breakdown(start=None, end=None, group_by="date"):
+    """Same figures as ``summarize`` split by date, product or category, in one grouped query."""
+    keys = GROUPINGS[group_by]
+    rows = _rollups(start, end).values(*keys.values()).annotate(**_totals()).order_by(*keys.values())
+    return [
+        {**{name: row[lookup] for name, lookup in keys.items()}, **_figures(row)}
+        for row in rows
+    ]
+
+
+def best_seller(start=None, end=None):
+    """``(product name, quantity sold)`` of the top product by stock out, or None."""
+    row = (
+        _rollups(start, end)
+        .values("product__name")
+        .annotate(sold=Sum("stock_out"))
+        .order_by("-sold")
+        .first()
+    )
+    return (row["product__name"], row["sold"]) if row else None
+
+
+def record_insight(start=None, end=None):
+    """Store a SalesInsight for the current best seller and return it."""
+    best = best_seller(start, end)
+    return SalesInsight.objects.create(
+        best_selling_product=best[0] if best else None,
+        total_quantity_sold=best[1] if best else 0,
+    )
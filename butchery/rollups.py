@@ -0,0 +1,222 @@
+"""
+Incremental maintenance of ``DailyRollup``.
+
+Every StockTransaction / OrderItem write is turned into a per-(date, product)
+delta and applied with a single ``UPDATE ... SET col = col + delta``. Bulk
+write paths, which bypass model signals, call ``record_stock`` and
+``record_sales`` directly.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailyRollup, OrderItem, StockSnapshot, StockTransaction, line_total, sum_or_zero
+
+CENT = Decimal("0.01")
+BULK_MIN_BUCKETS = 50
+
+# Ledger transaction type -> rollup column.
+STOCK_COLUMNS = {
+    StockTransaction.TransactionType.IN: "stock_in",
+    StockTransaction.TransactionType.OUT: "stock_out",
+    StockTransaction.TransactionType.CLOSE: "stock_closed",
+}
+
+_local = threading.local()
+
+
+@contextmanager
+def paused():
+    """
+    Stop model signals from touching the rollup or writing sync
+    tombstones, e.g. while generating data that is rolled up afterwards
+    with ``rebuild``.
+    """
+    previous = is_paused()
+    _local.paused = True
+    try:
+        yield
+    finally:
+        _local.paused = previous
+
+
+def is_paused():
+    return getattr(_local, "paused", False)
+
+
+def apply(deltas, create_missing=True):
+    """
+    Apply ``{(date, product_id): {column: delta}}`` to the rollup table.
+
+    Missing buckets are created unless ``create_missing`` is False (used on
+    deletes, where a missing bucket means the product itself is going away).
+    Large batches (bulk imports) go through ``apply_many``.
+    """
+    if create_missing and len(deltas) >= BULK_MIN_BUCKETS:
+        return apply_many(deltas)
+    apply_each(deltas, create_missing)
+
+
+def apply_each(deltas, create_missing=True):
+    """One conditional ``UPDATE`` (and ``INSERT`` when missing) per bucket."""
+    for (date, product_id), columns in deltas.items():
+        columns = {column: delta for column, delta in columns.items() if delta}
+        if not columns:
+            continue
+        bucket = DailyRollup.objects.filter(date=date, product_id=product_id)
+        if bucket.update(**{column: F(column) + delta for column, delta in columns.items()}):
+            continue
+        if not create_missing:
+            continue
+        try:
+            with transaction.atomic():
+                DailyRollup.objects.create(date=date, product_id=product_id, **columns)
+        except IntegrityError:
+            # Another writer created the bucket first; add on top of theirs.
+            bucket.update(**{column: F(column) + delta for column, delta in columns.items()})
+
+
+def apply_many(deltas):
+    """
+    ``apply`` in a fixed number of statements: one query to find the
+    existing buckets, one ``col = col + delta`` UPDATE executed for each of
+    them (still safe against concurrent writers) and a ``bulk_create`` of
+    the missing buckets. If another writer creates one of those first, they are applied
+    one by one instead.
+    """
+    deltas = {key: {column: delta for column, delta in columns.items() if delta} for key, columns in deltas.items()}
+    deltas = {key: columns for key, columns in deltas.items() if columns}
+    if not deltas:
+        return
+    candidates = DailyRollup.objects.filter(
+        date__in={date for date, _ in deltas}, product_id__in={product_id for _, product_id in deltas}
+    ).values_list("pk", "date", "product_id")
+    existing = {(date, product_id): pk for pk, date, product_id in candidates if (date, product_id) in deltas}
+
+    if existing:
+        # bulk_update would build one CASE per column over every row; one
+        # parametrised UPDATE run for each bucket is much cheaper.
+        columns = sorted({column for key in existing for column in deltas[key]})
+        quote = connection.ops.quote_name
+        sql = "UPDATE {} SET {} WHERE {} = %s".format(
+            quote(DailyRollup._meta.db_table),
+            ", ".join(f"{quote(column)} = {quote(column)} + %s" for column in columns),
+            quote(DailyRollup._meta.pk.column),
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [
+                [deltas[key].get(column, 0) for column in columns] + [pk] for key, pk in existing.items()
+            ])
+
+    missing = {key: changes for key, changes in deltas.items() if key not in existing}
+    try:
+        with transaction.atomic():
+            DailyRollup.objects.bulk_create(
+                [DailyRollup(date=date, product_id=product_id, **changes) for (date, product_id), changes in missing.items()],
+                batch_size=500,
+            )
+    except IntegrityError:
+        apply_each(missing)
+
+
+def stock_deltas(transactions, sign=1):
+    deltas = defaultdict(lambda: defaultdict(float))
+    for txn in transactions:
+        column = STOCK_COLUMNS.get(txn.transaction_type)
+        if column:
+            # ``date`` defaults to timezone.now, so unsaved rows can hold a datetime.
+            date = txn.date.date() if isinstance(txn.date, datetime) else txn.date
+            deltas[(date, txn.product_id)][column] += sign * txn.quantity
+    return deltas
+
+
+def sales_deltas(items, sign=1):
+    """Revenue deltas for order items at their stored unit prices; ``order`` should be loaded."""
+    deltas = defaultdict(lambda: defaultdict(Decimal))
+    for item in items:
+        date = timezone.localtime(item.order.created_at).date()
+        # Unsaved instances may still hold a float price; normalise to cents.
+        total = Decimal(item.get_total_price()).quantize(CENT)
+        deltas[(date, item.product_id)]["revenue"] += sign * total
+    return deltas
+
+
+def record_stock(transactions, sign=1, create_missing=True):
+    apply(stock_deltas(transactions, sign), create_missing=create_missing)
+
+
+def record_sales(items, sign=1, create_missing=True):
+    apply(sales_deltas(items, sign), create_missing=create_missing)
+
+
+def record(transactions=(), items=()):
+    """Roll up ledger rows and order items together, one UPDATE per bucket."""
+    deltas = stock_deltas(transactions)
+    for key, columns in sales_deltas(items).items():
+        deltas[key].update(columns)
+    apply(deltas)
+
+
+@transaction.atomic
+def rebuild(since=None):
+    """
+    Recompute the rollup from the raw ledger and order items.
+
+    Revenue uses each item's stored ``unit_price`` (the price it was sold
+    at), the same as the incremental path. Days on or before a product's
+    latest archived snapshot keep their stock totals, since their ledger
+    rows have been archived. Returns the number of buckets written.
+    """
+    ledger = StockTransaction.objects.all()
+    items = OrderItem.objects.annotate(day=TruncDate("order__created_at"))
+    existing = DailyRollup.objects.all()
+    if since:
+        ledger = ledger.filter(date__gte=since)
+        items = items.filter(day__gte=since)
+        existing = existing.filter(date__gte=since)
+
+    buckets = {}
+
+    def bucket(date, product_id):
+        if (date, product_id) not in buckets:
+            buckets[(date, product_id)] = DailyRollup(date=date, product_id=product_id)
+        return buckets[(date, product_id)]
+
+    sealed = dict(
+        StockSnapshot.objects.filter(archived=True)
+        .order_by().values("product_id").annotate(last=Max("date")).values_list("product_id", "last")
+    )
+
+    def is_sealed(date, product_id):
+        return product_id in sealed and date <= sealed[product_id]
+
+    kept = existing.filter(product_id__in=sealed).values("date", "product_id", *STOCK_COLUMNS.values())
+    for row in kept:
+        if is_sealed(row["date"], row["product_id"]):
+            rollup = bucket(row["date"], row["product_id"])
+            for column in STOCK_COLUMNS.values():
+                setattr(rollup, column, row[column])
+
+    stock_totals = {
+        column: Coalesce(Sum("quantity", filter=Q(transaction_type=transaction_type)), Value(0.0))
+        for transaction_type, column in STOCK_COLUMNS.items()
+    }
+    for row in ledger.values("date", "product_id").annotate(**stock_totals).order_by():
+        if is_sealed(row["date"], row["product_id"]):
+            continue
+        rollup = bucket(row["date"], row["product_id"])
+        for column in STOCK_COLUMNS.values():
+            setattr(rollup, column, row[column])
+    for row in items.values("day", "product_id").annotate(revenue=sum_or_zero(line_total())).order_by():
+        bucket(row["day"], row["product_id"]).revenue = row["revenue"]
+
+    existing.delete()
+    DailyRollup.objects.bulk_create(buckets.values(), batch_size=1000)
+    return len(buckets)
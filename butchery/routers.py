@@ -0,0 +1,121 @@
+"""
+Read-replica routing.
+
+When a ``REPLICA_DATABASE`` alias is configured, the heavy reads (reports,
+insights, list endpoints, admin changelists) run there instead of on the
+primary that takes checkout writes. Views opt in with
+``ReplicaRoutingMixin.replica_actions``, or anything can use the
+``reading_from_replica`` context manager. Everything else, and every write,
+stays on ``default``.
+
+Replicas lag, so a user who writes is pinned to the primary for
+``REPLICA_PIN_SECONDS`` (read-your-writes). Pins live in the default cache;
+use a shared cache backend with several workers.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = contextvars.ContextVar("replica_routing", default=None)
+
+
+class RoutingState:
+    def __init__(self, user_id, replica):
+        self.user_id = user_id
+        self.replica = replica
+        self.wrote = False
+
+
+def replica_alias():
+    """The configured replica alias, or None when there is no replica."""
+    alias = getattr(settings, "REPLICA_DATABASE", None)
+    return alias if alias and alias in connections.settings else None
+
+
+def _pin_key(user_id):
+    return f"replica:pin:{user_id}"
+
+
+def pin(user_id):
+    """Send ``user_id``'s reads to the primary for the next ``REPLICA_PIN_SECONDS``."""
+    cache.set(_pin_key(user_id), True, timeout=getattr(settings, "REPLICA_PIN_SECONDS", 5))
+
+
+def is_pinned(user_id):
+    return cache.get(_pin_key(user_id), False)
+
+
+def begin(user, replica=True):
+    """Start routing for a request by ``user``; returns the token for ``end``."""
+    user_id = user.pk if user is not None and user.is_authenticated else None
+    return _state.set(RoutingState(user_id, replica))
+
+
+def end(token):
+    _state.reset(token)
+
+
+@contextmanager
+def reading_from_replica(user, replica=True):
+    token = begin(user, replica)
+    try:
+        yield
+    finally:
+        end(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        alias = replica_alias()
+        if state is None or not state.replica or alias is None:
+            return None
+        if state.wrote or (state.user_id is not None and is_pinned(state.user_id)):
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+            if state.user_id is not None and replica_alias():
+                pin(state.user_id)
+        # Never the replica, even for instances that were read from it.
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db and instance._state.db != replica_alias():
+            return instance._state.db
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        primary = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in primary and obj2._state.db in primary:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary, never migrated directly.
+        return False if db == replica_alias() else None
+
+
+class ReplicaRoutingMixin:
+    """
+    DRF view mixin: the actions in ``replica_actions`` (the HTTP method for
+    plain APIViews) read from the replica; writes in any action pin the user.
+    """
+    replica_actions = ("list",)
+
+    def initial(self, request, *args, **kwargs):
+        action = getattr(self, "action", None) or request.method.lower()
+        self._routing_token = begin(request.user, replica=action in self.replica_actions)
+        super().initial(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        token = getattr(self, "_routing_token", None)
+        if token is not None:
+            self._routing_token = None
+            end(token)
+        return response
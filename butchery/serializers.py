@@ -1,5 +1,9 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
 from rest_framework import serializers
-from .models import User, Product, Order, OrderItem, ScaleReading ,StockNotification,StockTransaction, SalesInsight
+from .models import User, Product, Order, OrderItem, ScaleReading ,StockNotification,StockTransaction, SalesInsight, Job
+from . import catalog, jobs, ledger, live, notifications, pricing, rollups
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -34,8 +38,7 @@ class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = ["id", "name", "category", "price", "stock_quantity", "created_at", "updated_at"]
-        read_only_fields = ["Created_at","updated_at"
-                            ]
+        read_only_fields = ["created_at", "updated_at"]
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
@@ -46,7 +49,8 @@ class OrderItemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = OrderItem
-        fields = ["id", "order", "product", "product_id", "quantity", "total_price"]
+        fields = ["id", "order", "product", "product_id", "quantity", "unit_price", "total_price"]
+        read_only_fields = ["unit_price"]
 
     def get_total_price(self, obj):
         return obj.get_total_price()
@@ -63,33 +67,173 @@ class OrderItemSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         product = validated_data["product"]
         quantity = validated_data["quantity"]
-        product.stock_quantity -= quantity
-        product.save()
-        # Create corresponding StockTransaction
-        StockTransaction.objects.create(
-            product=product,
-            transaction_type="OUT",
-            quantity=quantity,
-            date=timezone.now().date(),
-            remarks="Sale via order"
-        )
-        return super().create(validated_data)
+        with transaction.atomic():
+            # The stock check in validate() is advisory; the conditional
+            # UPDATE is what actually guards against concurrent sales.
+            if not Product.objects.reserve(product.pk, quantity):
+                raise serializers.ValidationError("Insufficient stock for this product")
+            # Create corresponding StockTransaction
+            StockTransaction.objects.create(
+                product=product,
+                transaction_type="OUT",
+                quantity=quantity,
+                date=timezone.now().date(),
+                remarks="Sale via order"
+            )
+            item = super().create(validated_data)
+            live.stock_changed([product.pk])
+        product.refresh_from_db(fields=["stock_quantity", "updated_at"])
+        return item
+
+    def update(self, instance, validated_data):
+        # A line moved to another product is sold at that product's price.
+        product = validated_data.get("product", instance.product)
+        if product.pk != instance.product_id:
+            validated_data["unit_price"] = product.price
+        return super().update(instance, validated_data)
 
 class OrderSerializer(serializers.ModelSerializer):
     customer = UserSerializer(read_only=True)
     customer_id = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(), source="customer", write_only=True
     )
-    items = OrderItemSerializer(source="orderitem_set", many=True, read_only=True)
+    items = OrderItemSerializer(many=True, read_only=True)
+    total_price = serializers.SerializerMethodField()
 
     class Meta:
         model = Order
-        fields = ["id", "customer", "customer_id", "status", "payment_type", "created_at", "updated_at", "items"]
-        read_only_fields = ["created_at", "updated_at", "items"]
+        fields = ["id", "customer", "customer_id", "status", "payment_type", "client_ref", "created_at", "updated_at", "items", "total_price"]
+        read_only_fields = ["client_ref", "created_at", "updated_at", "items"]
     
     def get_total_price(self,obj):
         return obj.get_total_price()
 
+class CheckoutItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class CheckoutSerializer(serializers.ModelSerializer):
+    """
+    Creates an order together with all of its items in one transaction.
+    Stock for every product in the basket is locked and checked in a single
+    query, then items, ledger rows and stock levels are written in bulk.
+    """
+    customer_id = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.all(), source="customer"
+    )
+    items = CheckoutItemSerializer(many=True, write_only=True)
+
+    class Meta:
+        model = Order
+        fields = ["customer_id", "status", "payment_type", "items"]
+
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one item is required.")
+        # An order holds one line per product; merge repeated products.
+        quantities = {}
+        for item in value:
+            quantities[item["product_id"]] = quantities.get(item["product_id"], 0) + item["quantity"]
+        return quantities
+
+    def create(self, validated_data):
+        quantities = validated_data.pop("items")
+        sold_at = validated_data.pop("sold_at", None)
+        try:
+            with transaction.atomic():
+                products = Product.objects.select_for_update().in_bulk(list(quantities))
+                missing = sorted(set(quantities) - set(products))
+                if missing:
+                    raise serializers.ValidationError({"items": f"Unknown product ids: {missing}"})
+                short = [
+                    products[product_id].name
+                    for product_id, quantity in quantities.items()
+                    if products[product_id].stock_quantity < quantity
+                ]
+                if short:
+                    raise serializers.ValidationError({"items": f"Insufficient stock for: {', '.join(short)}"})
+
+                order = self.create_order(validated_data)
+                now = timezone.now()
+                if sold_at:
+                    # auto_now_add ignores a given value; date the sale when it happened.
+                    Order.objects.filter(pk=order.pk).update(created_at=sold_at)
+                    order.created_at = sold_at
+                for product_id, quantity in quantities.items():
+                    # F-expressions keep the update safe on backends where
+                    # select_for_update() is a no-op (SQLite).
+                    products[product_id].stock_quantity = F("stock_quantity") - quantity
+                    products[product_id].updated_at = now
+                Product.objects.bulk_update(products.values(), ["stock_quantity", "updated_at"])
+                catalog.bump()
+                items = OrderItem.objects.bulk_create([
+                    OrderItem(
+                        order=order,
+                        product=products[product_id],
+                        quantity=quantity,
+                        unit_price=products[product_id].price,
+                    )
+                    for product_id, quantity in quantities.items()
+                ])
+                transactions = StockTransaction.objects.bulk_create([
+                    StockTransaction(
+                        product=products[product_id],
+                        transaction_type="OUT",
+                        quantity=quantity,
+                        date=(sold_at or now).date(),
+                        remarks=f"Sale via checkout (order #{order.id})",
+                    )
+                    for product_id, quantity in quantities.items()
+                ])
+                # bulk_create skips model signals, so roll up and check
+                # thresholds explicitly.
+                rollups.record(transactions=transactions, items=items)
+                ledger.rows_changed((row.product_id, row.date) for row in transactions)
+                notifications.stock_changed(quantities)
+                live.stock_changed(quantities)
+        except IntegrityError:
+            # stock_quantity is unsigned: a concurrent sale beat us to the last units.
+            raise serializers.ValidationError({"items": "Insufficient stock for one or more products"})
+        return order
+
+    def create_order(self, validated_data):
+        return Order.objects.create(**validated_data)
+
+
+class DuplicateSale(Exception):
+    """An offline sale whose ``client_ref`` another upload recorded first."""
+
+
+class OfflineSaleSerializer(CheckoutSerializer):
+    """
+    A sale queued on a counter tablet while offline, replayed by
+    ``butchery.sync.replay_sales``. ``client_ref`` identifies it across
+    retries; ``customer_id`` defaults to the uploading user.
+    """
+    customer_id = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.all(), source="customer", required=False
+    )
+    client_ref = serializers.CharField(max_length=64)
+    sold_at = serializers.DateTimeField(required=False)
+
+    class Meta(CheckoutSerializer.Meta):
+        fields = CheckoutSerializer.Meta.fields + ["client_ref", "sold_at"]
+
+    def validate_sold_at(self, value):
+        # Tablet clocks drift; a sale cannot be dated after it reached us.
+        return min(value, timezone.now())
+
+    def create_order(self, validated_data):
+        try:
+            with transaction.atomic():
+                return super().create_order(validated_data)
+        except IntegrityError:
+            if Order.objects.filter(client_ref=validated_data["client_ref"]).exists():
+                raise DuplicateSale(validated_data["client_ref"])
+            raise
+
+
 class ScaleReadingSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     product_id = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all(), source="product", write_only=True)
@@ -109,6 +253,119 @@ class ScaleReadingSerializer(serializers.ModelSerializer):
         return instance 
 
 
+class ScaleReadingRowSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    weight_kg = serializers.FloatField(min_value=0)
+    price_per_kg = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
+    recorded_at = serializers.DateTimeField(required=False)
+
+
+class ScaleReadingBatch:
+    """
+    Validates and stores a batch of scale readings.
+
+    Rows are checked independently, products are looked up once per distinct
+    id, totals are priced in one ``pricing.price_lines`` call and valid rows
+    are written with a single ``bulk_create``. Invalid rows are reported in
+    ``errors`` by index.
+    """
+    max_rows = 5000
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.readings = []
+        self.errors = []
+
+    def is_valid(self):
+        if not isinstance(self.rows, list):
+            raise serializers.ValidationError("Expected a list of readings.")
+        if len(self.rows) > self.max_rows:
+            raise serializers.ValidationError(f"At most {self.max_rows} readings per batch.")
+
+        valid = []
+        for index, row in enumerate(self.rows):
+            if not isinstance(row, dict):
+                self.errors.append({"index": index, "errors": {"non_field_errors": ["Expected a JSON object."]}})
+                continue
+            serializer = ScaleReadingRowSerializer(data=row)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                self.errors.append({"index": index, "errors": serializer.errors})
+
+        products = Product.objects.in_bulk({data["product_id"] for _, data in valid})
+        now = timezone.now()
+        for index, data in valid:
+            product = products.get(data["product_id"])
+            if product is None:
+                self.errors.append({"index": index, "errors": {"product_id": ["Invalid pk - object does not exist."]}})
+                continue
+            self.readings.append(ScaleReading(
+                product=product,
+                weight_kg=data["weight_kg"],
+                price_per_kg=data.get("price_per_kg") or product.price,
+                recorded_at=data.get("recorded_at", now),
+            ))
+        # Readings are raw weight x price: no discount, and tax is accounted at sale.
+        quote = pricing.price_lines(
+            [pricing.Line(reading.weight_kg, reading.price_per_kg) for reading in self.readings], rate=0
+        )
+        for reading, line in zip(self.readings, quote.lines):
+            reading.total_price = line.total
+        self.errors.sort(key=lambda error: error["index"])
+        return not self.errors
+
+    def save(self):
+        readings = ScaleReading.objects.bulk_create(self.readings, batch_size=1000)
+        live.readings_created(readings)
+        return readings
+
+
+class PriceQuoteLineSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.DecimalField(max_digits=10, decimal_places=3, min_value=pricing.ZERO)
+    discount_percent = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=pricing.ZERO, max_value=pricing.HUNDRED, default=pricing.ZERO
+    )
+    discount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=pricing.ZERO, default=pricing.ZERO)
+
+
+class PriceQuoteSerializer(serializers.Serializer):
+    """
+    Prices a basket (or a bulk price list) at current product prices in one
+    ``pricing.price_lines`` call; quantities are units or kilograms.
+    """
+    lines = PriceQuoteLineSerializer(many=True, allow_empty=False, max_length=5000)
+
+    def validate_lines(self, value):
+        products = Product.objects.in_bulk({line["product_id"] for line in value})
+        missing = sorted({line["product_id"] for line in value} - set(products))
+        if missing:
+            raise serializers.ValidationError(f"Unknown product ids: {missing}")
+        self.products = products
+        return value
+
+    def quote(self):
+        lines = self.validated_data["lines"]
+        quote = pricing.price_lines(
+            pricing.Line(line["quantity"], self.products[line["product_id"]].price,
+                         line["discount_percent"], line["discount"])
+            for line in lines
+        )
+        return {
+            "lines": [
+                {"product_id": line["product_id"], **priced._asdict()}
+                for line, priced in zip(lines, quote.lines)
+            ],
+            "subtotal": quote.subtotal,
+            "discount": quote.discount,
+            "tax": quote.tax,
+            "total": quote.total,
+            "tax_rate": pricing.tax_rate(),
+            "prices_include_tax": pricing.prices_include_tax(),
+        }
+
+
 class StockNotificationSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     product_id = serializers.PrimaryKeyRelatedField(
@@ -145,4 +402,27 @@ class SalesInsightSerializer(serializers.ModelSerializer):
     class Meta:
         model = SalesInsight
         fields = ["id", "best_selling_product", "total_quantity_sold", "calculated_at"]
-        read_only_fields = ["calculated_at"]
\ No newline at end of file
+        read_only_fields = ["calculated_at"]
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            "id", "name", "payload", "idempotency_key", "max_attempts", "status", "attempts",
+            "result", "error", "created_at", "started_at", "heartbeat_at", "finished_at",
+        ]
+        read_only_fields = [
+            "status", "attempts", "result", "error", "created_at", "started_at", "heartbeat_at", "finished_at",
+        ]
+        # Duplicate keys are answered with the existing job, not a 400.
+        extra_kwargs = {"idempotency_key": {"validators": []}}
+
+    def validate_name(self, value):
+        if value not in jobs.registry:
+            raise serializers.ValidationError(f"Unknown job. Choose from: {', '.join(sorted(jobs.registry))}.")
+        return value
+
+    def validate_payload(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("payload must be a JSON object of job arguments.")
+        return value
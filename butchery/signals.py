@@ -0,0 +1,107 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import authentication, catalog, ledger, live, notifications, rollups, sync
+from .models import Order, OrderItem, Product, ScaleReading, StockNotification, StockTransaction, User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    authentication.forget_user(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_catalog_version(sender, **kwargs):
+    catalog.bump()
+
+
+@receiver(post_save, sender=Product)
+def check_product_thresholds(sender, instance, **kwargs):
+    notifications.stock_changed([instance.pk])
+    live.stock_changed([instance.pk])
+
+
+@receiver(post_save, sender=ScaleReading)
+def publish_scale_reading(sender, instance, created, **kwargs):
+    if created:
+        live.readings_created([instance])
+
+
+@receiver(post_save, sender=StockTransaction)
+@receiver(post_save, sender=StockNotification)
+def check_thresholds(sender, instance, **kwargs):
+    notifications.stock_changed([instance.product_id])
+
+
+@receiver(pre_save, sender=StockTransaction)
+@receiver(pre_save, sender=OrderItem)
+def remember_previous_row(sender, instance, **kwargs):
+    """Keep the stored row so an update can be rolled up as (new - old)."""
+    instance._rollup_previous = None
+    if rollups.is_paused():
+        return
+    if instance.pk and not instance._state.adding:
+        queryset = sender.objects.filter(pk=instance.pk)
+        if sender is OrderItem:
+            queryset = queryset.select_related("order", "product")
+        instance._rollup_previous = queryset.first()
+
+
+@receiver(post_save, sender=StockTransaction)
+def rollup_stock_transaction(sender, instance, **kwargs):
+    if rollups.is_paused():
+        return
+    previous = getattr(instance, "_rollup_previous", None)
+    if previous is not None:
+        rollups.record_stock([previous], sign=-1)
+    rollups.record_stock([instance])
+    changed = [(instance.product_id, instance.date)]
+    if previous is not None:
+        changed.append((previous.product_id, previous.date))
+    ledger.rows_changed(changed)
+
+
+@receiver(post_delete, sender=StockTransaction)
+def rollup_stock_transaction_delete(sender, instance, **kwargs):
+    if rollups.is_paused():
+        return
+    rollups.record_stock([instance], sign=-1, create_missing=False)
+    ledger.rows_changed([(instance.product_id, instance.date)])
+
+
+@receiver(post_save, sender=OrderItem)
+def rollup_order_item(sender, instance, **kwargs):
+    if rollups.is_paused():
+        return
+    previous = getattr(instance, "_rollup_previous", None)
+    if previous is not None:
+        rollups.record_sales([previous], sign=-1)
+    rollups.record_sales([instance])
+
+
+@receiver(post_delete, sender=OrderItem)
+def rollup_order_item_delete(sender, instance, **kwargs):
+    if rollups.is_paused():
+        return
+    rollups.record_sales([instance], sign=-1, create_missing=False)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=StockTransaction)
+@receiver(post_delete, sender=ScaleReading)
+def record_tombstone(sender, instance, **kwargs):
+    # Writes made under rollups.paused() (bulk maintenance such as
+    # generate_data) are not changes clients should mirror. Ledger archiving
+    # deletes with raw SQL, so it never reaches this receiver.
+    if rollups.is_paused():
+        return
+    sync.record_deletion(sender, instance.pk)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def touch_order(sender, instance, **kwargs):
+    sync.touch_orders([instance.order_id])
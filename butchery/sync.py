@@ -0,0 +1,227 @@
+"""
+Delta sync for offline counter tablets.
+
+``changes(cursor)`` returns the products, orders, stock transactions and
+scale readings changed since a client's cursor, plus the ids of rows deleted
+since (tombstones). Every stream is paged by ``(updated_at, id)``; the cursor
+is an opaque token holding each stream's position, which the client stores
+and sends back next time. Without a cursor it gets every row (``reset``:
+replace the local copy). Rows are the lean ``.values()`` rows of
+``butchery.lean``, and an order row carries its items.
+
+``updated_at`` is stamped before the writing transaction commits, so rows
+written in the last ``SYNC_SETTLE_SECONDS`` are held back to the next sync
+rather than risk a late commit falling behind a cursor. For the same reason
+sync reads the primary, never a lagging replica. Tombstones are kept for
+``SYNC_TOMBSTONE_DAYS``; an older cursor is refused and the client resyncs.
+
+``replay_sales`` records sales queued offline, in order, through checkout
+(stock locked and checked per sale). Each carries a ``client_ref``, unique
+across all customers; a ref already recorded is reported as a duplicate,
+so an upload can be retried. The existing order's id is only echoed to the
+user who is its customer.
+"""
+import base64
+import binascii
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+
+from . import lean, renderers
+from .models import Order, OrderItem, Product, ScaleReading, StockTransaction, Tombstone
+from .serializers import (
+    DuplicateSale, OfflineSaleSerializer, OrderSerializer, ProductSerializer, ScaleReadingSerializer,
+    StockTransactionSerializer,
+)
+
+PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+MAX_SALES = 500
+DELETED = "deleted"
+
+STREAMS = {
+    "products": (Product, ProductSerializer),
+    "orders": (Order, OrderSerializer),
+    "stock_transactions": (StockTransaction, StockTransactionSerializer),
+    "scale_readings": (ScaleReading, ScaleReadingSerializer),
+}
+MODEL_STREAMS = {model: stream for stream, (model, _) in STREAMS.items()}
+
+
+class CursorError(Exception):
+    pass
+
+
+class CursorExpired(CursorError):
+    pass
+
+
+def settle_seconds():
+    return getattr(settings, "SYNC_SETTLE_SECONDS", 2)
+
+
+def tombstone_days():
+    return getattr(settings, "SYNC_TOMBSTONE_DAYS", 30)
+
+
+def encode_cursor(positions):
+    data = {stream: [moment.isoformat(), last_id] for stream, (moment, last_id) in positions.items()}
+    return base64.urlsafe_b64encode(renderers.dumps(data)).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """``{stream: (updated_at, id or None)}`` from a cursor token."""
+    try:
+        data = renderers.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        positions = {}
+        for stream, (moment, last_id) in data.items():
+            moment = parse_datetime(moment)
+            if stream not in STREAMS and stream != DELETED or moment is None:
+                raise ValueError(stream)
+            if last_id is not None and not isinstance(last_id, int):
+                raise ValueError(last_id)
+            positions[stream] = (moment, last_id)
+        return positions
+    except (binascii.Error, ValueError, TypeError, AttributeError):
+        raise CursorError("Invalid sync cursor.")
+
+
+def record_deletion(model, object_id):
+    Tombstone.objects.create(stream=MODEL_STREAMS[model], object_id=object_id)
+
+
+def touch_orders(order_ids):
+    """Mark orders changed when their items change, so they sync again."""
+    Order.objects.filter(pk__in=order_ids).update(updated_at=timezone.now())
+
+
+def prune_tombstones():
+    cutoff = timezone.now() - timedelta(days=tombstone_days())
+    return Tombstone.objects.filter(deleted_at__lt=cutoff).delete()[0]
+
+
+def _page(queryset, field, position, until, limit, lookups):
+    """
+    Up to ``limit`` rows (``lookups`` tuples) changed after ``position`` and
+    by ``until``; returns ``(rows, new_position, more)``.
+    """
+    queryset = queryset.filter(**{f"{field}__lte": until})
+    if position:
+        moment, last_id = position
+        after = Q(**{f"{field}__gt": moment})
+        if last_id is not None:
+            after |= Q(**{field: moment, "id__gt": last_id})
+        queryset = queryset.filter(after)
+    rows = list(queryset.order_by(field, "id").values_list(field, "id", *lookups)[: limit + 1])
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return [row[2:] for row in rows], (rows[-1][0], rows[-1][1]), True
+    if position and position[0] > until:
+        return [row[2:] for row in rows], position, False
+    return [row[2:] for row in rows], (until, None), False
+
+
+def changes(cursor=None, limit=PAGE_SIZE):
+    """
+    One page of changes since ``cursor``: ``{"cursor", "has_more", "reset",
+    "changes": {stream: rows}, "deleted": {stream: ids}}``. Keep calling
+    with the returned cursor while ``has_more``; apply deletions last.
+    """
+    positions = decode_cursor(cursor) if cursor else {}
+    now = timezone.now()
+    if DELETED in positions and positions[DELETED][0] < now - timedelta(days=tombstone_days()):
+        raise CursorExpired("Sync cursor has expired; sync again without a cursor.")
+    until = now - timedelta(seconds=settle_seconds())
+    result = {"changes": {}, "deleted": {}}
+    more = False
+
+    for stream, (model, serializer_class) in STREAMS.items():
+        queryset = model.objects.all()
+        if model is Order:
+            queryset = queryset.with_totals()
+        available = lean.available_columns(serializer_class(), set(queryset.query.annotations))
+        columns = lean.Columns(list(available), available)
+        rows, positions[stream], stream_more = _page(
+            queryset, "updated_at", positions.get(stream), until, limit, columns.lookups
+        )
+        result["changes"][stream] = [columns.row(values) for values in rows]
+        more = more or stream_more
+    _attach_items(result["changes"]["orders"])
+
+    if cursor:
+        tombstones, positions[DELETED], stream_more = _page(
+            Tombstone.objects.all(), "deleted_at", positions.get(DELETED), until, limit, ("stream", "object_id")
+        )
+        for stream, object_id in tombstones:
+            result["deleted"].setdefault(stream, []).append(object_id)
+        more = more or stream_more
+    else:
+        # A full download replaces the client's copy; there is nothing to delete.
+        positions[DELETED] = (until, None)
+
+    return {"cursor": encode_cursor(positions), "has_more": more, "reset": not cursor, **result}
+
+
+def _attach_items(orders):
+    items = defaultdict(list)
+    rows = OrderItem.objects.filter(order_id__in=[order["id"] for order in orders]).order_by("id")
+    for order_id, item_id, product_id, quantity in rows.values_list("order_id", "id", "product_id", "quantity"):
+        items[order_id].append({"id": item_id, "product": product_id, "quantity": quantity})
+    for order in orders:
+        order["items"] = items[order["id"]]
+
+
+def replay_sales(sales, user):
+    """
+    Record offline ``sales`` in order, each through checkout in its own
+    transaction. Returns one result per sale: ``created`` (with the new
+    ``order_id``), ``duplicate`` (already recorded; the existing
+    ``order_id`` when ``user`` is its customer) or ``rejected`` (with
+    ``errors``, e.g. not enough stock).
+    """
+    refs = [sale.get("client_ref") for sale in sales if isinstance(sale, dict)]
+    recorded = {
+        ref: (order_id, customer_id)
+        for ref, order_id, customer_id in Order.objects.filter(
+            client_ref__in=[ref for ref in refs if isinstance(ref, str)]
+        ).values_list("client_ref", "id", "customer_id")
+    }
+    results = []
+    for index, sale in enumerate(sales):
+        ref = sale.get("client_ref") if isinstance(sale, dict) else None
+        if isinstance(ref, str) and ref in recorded:
+            # Checked before validation: its products may have changed since.
+            results.append(_duplicate(index, ref, recorded[ref], user))
+            continue
+        serializer = OfflineSaleSerializer(data=sale)
+        if not serializer.is_valid():
+            results.append({"index": index, "client_ref": ref, "status": "rejected", "errors": serializer.errors})
+            continue
+        customer = serializer.validated_data.get("customer", user)
+        try:
+            order = serializer.save(customer=customer)
+        except DuplicateSale:
+            # A concurrent upload of the same sale recorded it first.
+            recorded[ref] = Order.objects.filter(client_ref=ref).values_list("id", "customer_id").get()
+            results.append(_duplicate(index, ref, recorded[ref], user))
+            continue
+        except serializers.ValidationError as exc:
+            results.append({"index": index, "client_ref": ref, "status": "rejected", "errors": exc.detail})
+            continue
+        recorded[ref] = (order.pk, customer.pk)
+        results.append({"index": index, "client_ref": ref, "status": "created", "order_id": order.pk})
+    return results
+
+
+def _duplicate(index, ref, order, user):
+    order_id, customer_id = order
+    result = {"index": index, "client_ref": ref, "status": "duplicate"}
+    # client_ref is unique across all uploads; don't hand out other users' orders.
+    if customer_id == user.pk:
+        result["order_id"] = order_id
+    return result
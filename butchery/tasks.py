@@ -0,0 +1,43 @@
+"""Background jobs available through ``butchery.jobs`` and ``/api/jobs/``."""
+from datetime import date
+
+from . import notifications, reports, rollups, sync
+from .jobs import task
+
+
+def _date(value):
+    return date.fromisoformat(value) if value else None
+
+
+@task("reports.daily")
+def daily_report(start=None, end=None, group_by=None):
+    start, end = _date(start), _date(end)
+    report = {"date": start.isoformat() if start else "all", **reports.summarize(start, end or start)}
+    if group_by:
+        report["breakdown"] = reports.breakdown(start, end or start, group_by)
+    return report
+
+
+@task("rollups.rebuild")
+def rebuild_rollups(since=None):
+    return {"rows": rollups.rebuild(since=_date(since))}
+
+
+@task("insights.recompute")
+def recompute_insight():
+    return {"insight_id": reports.record_insight().id}
+
+
+@task("notifications.evaluate")
+def evaluate_notifications(product_ids):
+    """Check thresholds and deliver alerts from the worker itself."""
+    alerts = notifications.evaluate(product_ids)
+    backend = notifications.get_backend()
+    for alert in alerts:
+        backend.send(alert)
+    return {"alerts": len(alerts)}
+
+
+@task("sync.prune_tombstones")
+def prune_tombstones():
+    return {"deleted": sync.prune_tombstones()}
@@ -1,7 +1,29 @@
+import base64
+import json
+import os
+import re
+import tempfile
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase
-from .models import User, Product, Order, OrderItem, ScaleReading, StockNotification, StockTransaction
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from . import jobs, ledger, live, metrics, notifications, pricing, renderers, rollups, routers, sync
+from .models import User, Product, Order, OrderItem, ScaleReading, StockNotification, StockTransaction, DailyRollup, Job, StockSnapshot, Tombstone
+from .authentication import CachedJWTAuthentication
+from .serializers import DuplicateSale, OfflineSaleSerializer
 
 
 class UserTests(APITestCase):
@@ -128,4 +150,1381 @@ class StockNotificationTests(APITestCase):
         url = reverse("stocknotification-list")
         data = {"product_id": self.product.id, "threshold_kg": 3.0}
         response = self.client.post(url, data)
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+class PaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="pageuser", password="pass123", role="admin")
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(name="Brisket", category="beef", price=550.00, stock_quantity=50)
+        for i in range(5):
+            StockTransaction.objects.create(product=self.product, transaction_type="IN", quantity=i + 1)
+
+    def test_cursor_pages_cover_every_row_once(self):
+        url = reverse("stocktransaction-list") + "?page_size=2"
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(row["id"] for row in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_stream_returns_full_json_array(self):
+        url = reverse("stocktransaction-list") + "?stream=true"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]["product"]["id"], self.product.id)
+
+
+class OrderQueryCountTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="queryuser", password="pass123", role="staff")
+        self.client.force_authenticate(user=self.user)
+        self.products = [
+            Product.objects.create(name=f"Cut {i}", category="beef", price=100 + i, stock_quantity=100)
+            for i in range(3)
+        ]
+
+    def create_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(customer=self.user)
+            for product in self.products:
+                OrderItem.objects.create(order=order, product=product, quantity=2)
+
+    def test_order_list_query_count_is_constant(self):
+        self.create_orders(2)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("order-list"))
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertEqual(len(response.data["results"][0]["items"]), 3)
+
+        self.create_orders(10)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("order-list"))
+        self.assertEqual(len(response.data["results"]), 12)
+
+    def test_order_item_list_query_count_is_constant(self):
+        self.create_orders(5)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("orderitem-list"))
+        self.assertEqual(len(response.data["results"]), 15)
+        row = response.data["results"][0]
+        self.assertEqual(Decimal(row["total_price"]), 2 * Decimal(row["product"]["price"]))
+
+
+class OrderTotalsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="totaluser", password="pass123", role="admin")
+        self.client.force_authenticate(user=self.user)
+        self.beef = Product.objects.create(name="Sirloin", category="beef", price=12.50, stock_quantity=100)
+        self.goat = Product.objects.create(name="Goat Ribs", category="goat", price=8.00, stock_quantity=100)
+        self.order = Order.objects.create(customer=self.user)
+        OrderItem.objects.create(order=self.order, product=self.beef, quantity=2)
+        OrderItem.objects.create(order=self.order, product=self.goat, quantity=3)
+        self.empty_order = Order.objects.create(customer=self.user)
+
+    def test_with_totals_matches_python_sum(self):
+        with self.assertNumQueries(1):
+            totals = {order.id: order.total_price for order in Order.objects.with_totals()}
+        self.assertEqual(totals[self.order.id], Decimal("49.00"))
+        self.assertEqual(totals[self.empty_order.id], Decimal("0"))
+        self.assertEqual(Order.objects.get(pk=self.order.pk).get_total_price(), Decimal("49.00"))
+
+    def test_revenue_aggregate(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(Order.objects.revenue(), Decimal("49.00"))
+
+    def test_order_list_includes_total(self):
+        response = self.client.get(reverse("order-detail", args=[self.order.id]))
+        self.assertEqual(Decimal(response.data["total_price"]), Decimal("49.00"))
+
+
+class DailyReportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reportuser", password="pass123", role="admin")
+        self.client.force_authenticate(user=self.user)
+        self.beef = Product.objects.create(name="Topside", category="beef", price=10.00, stock_quantity=100)
+        self.pork = Product.objects.create(name="Pork Belly", category="pork", price=6.00, stock_quantity=100)
+        self.today = timezone.now().date()
+        for product in (self.beef, self.pork):
+            StockTransaction.objects.create(product=product, transaction_type="IN", quantity=50, date=self.today)
+            StockTransaction.objects.create(product=product, transaction_type="OUT", quantity=4, date=self.today)
+            StockTransaction.objects.create(product=product, transaction_type="CLOSE", quantity=46, date=self.today)
+        StockTransaction.objects.create(product=self.beef, transaction_type="IN", quantity=99, date=self.today - timedelta(days=40))
+        order = Order.objects.create(customer=self.user)
+        OrderItem.objects.create(order=order, product=self.beef, quantity=4)
+        OrderItem.objects.create(order=order, product=self.pork, quantity=4)
+
+    def test_daily_report_totals(self):
+        url = reverse("daily_report", args=[self.today.isoformat()])
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["opening_stock"], 100)
+        self.assertEqual(response.data["sales"], 8)
+        self.assertEqual(response.data["closing_stock"], 92)
+        self.assertEqual(response.data["revenue"], Decimal("64.00"))
+
+    def test_range_breakdown_by_category(self):
+        start = self.today - timedelta(days=60)
+        url = reverse("daily_report", args=[start.isoformat()])
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"end": self.today.isoformat(), "group_by": "category"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["opening_stock"], 199)
+        rows = {row["category"]: row for row in response.data["breakdown"]}
+        self.assertEqual(rows["beef"]["opening_stock"], 149)
+        self.assertEqual(rows["pork"]["revenue"], Decimal("24.00"))
+
+    def test_invalid_group_by(self):
+        url = reverse("daily_report", args=[self.today.isoformat()])
+        response = self.client.get(url, {"group_by": "weekday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DailyRollupTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="rollupuser", password="pass123", role="admin")
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(name="Chuck", category="beef", price=9.00, stock_quantity=100)
+        self.today = timezone.now().date()
+
+    def rollup(self):
+        return DailyRollup.objects.get(date=self.today, product=self.product)
+
+    def test_ledger_writes_update_rollup(self):
+        txn = StockTransaction.objects.create(product=self.product, transaction_type="IN", quantity=20)
+        StockTransaction.objects.create(product=self.product, transaction_type="OUT", quantity=5)
+        self.assertEqual(self.rollup().stock_in, 20)
+        self.assertEqual(self.rollup().stock_out, 5)
+
+        txn.quantity = 30
+        txn.save()
+        self.assertEqual(self.rollup().stock_in, 30)
+        txn.delete()
+        self.assertEqual(self.rollup().stock_in, 0)
+
+    def test_order_items_update_revenue(self):
+        order = Order.objects.create(customer=self.user)
+        item = OrderItem.objects.create(order=order, product=self.product, quantity=3)
+        self.assertEqual(self.rollup().revenue, Decimal("27.00"))
+        item.delete()
+        self.assertEqual(self.rollup().revenue, Decimal("0.00"))
+
+    def test_price_change_keeps_sale_revenue(self):
+        order = Order.objects.create(customer=self.user)
+        item = OrderItem.objects.create(order=order, product=self.product, quantity=2)
+        self.assertEqual(item.unit_price, Decimal("9.00"))
+        self.product.price = Decimal("15.00")
+        self.product.save()
+
+        item.refresh_from_db()
+        self.assertEqual(item.get_total_price(), Decimal("18.00"))
+        call_command("rebuild_rollups", stdout=StringIO())
+        self.assertEqual(self.rollup().revenue, Decimal("18.00"))
+        item.delete()
+        self.assertEqual(self.rollup().revenue, Decimal("0.00"))
+
+    def test_rebuild_matches_incremental(self):
+        StockTransaction.objects.create(product=self.product, transaction_type="IN", quantity=12)
+        StockTransaction.objects.create(product=self.product, transaction_type="CLOSE", quantity=7)
+        order = Order.objects.create(customer=self.user)
+        OrderItem.objects.create(order=order, product=self.product, quantity=2)
+        incremental = self.rollup()
+        DailyRollup.objects.update(stock_in=0, revenue=0)
+
+        call_command("rebuild_rollups", stdout=StringIO())
+        rebuilt = self.rollup()
+        self.assertEqual(rebuilt.stock_in, incremental.stock_in)
+        self.assertEqual(rebuilt.stock_closed, incremental.stock_closed)
+        self.assertEqual(rebuilt.revenue, incremental.revenue)
+
+    def test_recompute_sales_insight(self):
+        StockTransaction.objects.create(product=self.product, transaction_type="OUT", quantity=4)
+        response = self.client.post(reverse("salesinsight-recompute"))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["best_selling_product"], "Chuck")
+        self.assertEqual(response.data["total_quantity_sold"], 4)
+
+
+@override_settings(REQUEST_QUERY_BUDGET=None, REQUEST_LATENCY_BUDGET_MS=None)
+class ConcurrentStockTests(APITransactionTestCase):
+    """Parallel sales of the same product must neither lose updates nor oversell."""
+
+    workers = 8
+    sales_per_worker = 5
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="rushuser", password="pass123", role="staff")
+        # Less stock than requested in total, so some sales must be refused.
+        self.product = Product.objects.create(name="Fillet", category="beef", price=20.00, stock_quantity=30)
+        self.orders = [
+            Order.objects.create(customer=self.user)
+            for _ in range(self.workers * self.sales_per_worker)
+        ]
+
+    def sell(self, orders, results):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        try:
+            for order in orders:
+                for _ in range(20):
+                    try:
+                        response = client.post(
+                            reverse("orderitem-list"),
+                            {"order": order.id, "product_id": self.product.id, "quantity": 1},
+                        )
+                    except OperationalError:
+                        continue  # SQLite table lock under contention; retry.
+                    results.append(response.status_code)
+                    break
+        finally:
+            connection.close()
+
+    def test_parallel_order_items_do_not_lose_updates(self):
+        results = []
+        chunks = [self.orders[i::self.workers] for i in range(self.workers)]
+        threads = [threading.Thread(target=self.sell, args=(chunk, results)) for chunk in chunks]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Every attempt got a definitive answer, so all 30 units must be sold,
+        # each exactly once, with one ledger row per sale.
+        self.assertEqual(len(results), len(self.orders))
+        sold = OrderItem.objects.filter(product=self.product).count()
+        self.product.refresh_from_db()
+        self.assertEqual(sold, 30)
+        self.assertEqual(self.product.stock_quantity, 0)
+        self.assertEqual(StockTransaction.objects.filter(product=self.product, transaction_type="OUT").count(), sold)
+
+
+class CheckoutTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="checkoutuser", password="pass123", role="staff")
+        self.client.force_authenticate(user=self.user)
+        self.products = [
+            Product.objects.create(name=f"Basket Cut {i}", category="beef", price=10 + i, stock_quantity=10)
+            for i in range(4)
+        ]
+        self.url = reverse("order-checkout")
+
+    def test_checkout_creates_order_with_items(self):
+        data = {
+            "customer_id": self.user.id,
+            "payment_type": "MOBILE",
+            "items": [{"product_id": product.id, "quantity": 2} for product in self.products]
+            + [{"product_id": self.products[0].id, "quantity": 1}],
+        }
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["items"]), 4)
+        self.assertEqual(Decimal(response.data["total_price"]), Decimal("3") * 10 + 2 * 11 + 2 * 12 + 2 * 13)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock_quantity, 7)
+        self.assertEqual(StockTransaction.objects.filter(transaction_type="OUT").count(), 4)
+        self.assertEqual(DailyRollup.objects.get(product=self.products[0]).stock_out, 3)
+
+    def test_checkout_is_all_or_nothing(self):
+        data = {
+            "customer_id": self.user.id,
+            "items": [
+                {"product_id": self.products[0].id, "quantity": 2},
+                {"product_id": self.products[1].id, "quantity": 11},
+            ],
+        }
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock_quantity, 10)
+
+
+class ScaleReadingBatchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="batchuser", password="pass123", role="staff")
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(name="Minced Beef", category="beef", price=7.35, stock_quantity=50)
+        self.url = reverse("scalereading-batch")
+
+    def test_json_batch_reports_row_errors(self):
+        rows = [
+            {"product_id": self.product.id, "weight_kg": 1.1},
+            {"product_id": self.product.id, "weight_kg": 0.333, "price_per_kg": "10.00"},
+            {"product_id": 999999, "weight_kg": 1},
+            {"product_id": self.product.id, "weight_kg": "heavy"},
+        ]
+        with self.assertNumQueries(2):
+            response = self.client.post(self.url, rows, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual([error["index"] for error in response.data["errors"]], [2, 3])
+        totals = sorted(ScaleReading.objects.values_list("total_price", flat=True))
+        self.assertEqual(totals, [Decimal("3.33"), Decimal("8.09")])
+
+    def test_ndjson_batch(self):
+        body = "\n".join([
+            json.dumps({"product_id": self.product.id, "weight_kg": 2}),
+            "not json",
+            json.dumps({"product_id": self.product.id, "weight_kg": 0.5}),
+        ])
+        response = self.client.post(self.url, body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(response.data["errors"][0]["index"], 1)
+
+
+class PricingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="priceuser", password="pass123", role="staff")
+        self.client.force_authenticate(user=self.user)
+        self.ribeye = Product.objects.create(name="Ribeye", category="beef", price=Decimal("12.99"), stock_quantity=10)
+        self.wings = Product.objects.create(name="Wings", category="chicken", price=Decimal("4.50"), stock_quantity=10)
+        self.url = reverse("price_quote")
+
+    def test_weighted_line_rounds_half_up_from_exact_weight(self):
+        # 1.005 kg as a float is 1.00499999...; priced exactly it is 1.005.
+        self.assertEqual(pricing.line_total(1.005, "1.00"), Decimal("1.01"))
+        self.assertEqual(pricing.line_total(0.333, Decimal("10.00")), Decimal("3.33"))
+
+    def test_discount_and_tax(self):
+        line = pricing.price_line(Decimal("2.5"), Decimal("12.99"), discount_percent=10, rate="0.16", inclusive=False)
+        self.assertEqual((line.subtotal, line.discount, line.tax, line.total),
+                         (Decimal("32.48"), Decimal("3.25"), Decimal("4.68"), Decimal("33.91")))
+        line = pricing.price_line(1, Decimal("116.00"), rate="0.16", inclusive=True)
+        self.assertEqual((line.tax, line.total), (Decimal("16.00"), Decimal("116.00")))
+        line = pricing.price_line(1, Decimal("5.00"), discount=Decimal("9.00"), rate=0)
+        self.assertEqual(line.total, Decimal("0.00"))
+
+    def test_invalid_lines_are_rejected(self):
+        with self.assertRaises(ValueError):
+            pricing.price_line(-1, "5.00")
+        with self.assertRaises(ValueError):
+            pricing.price_line(1, "5.00", discount_percent=150)
+
+    def test_batch_totals_are_sums_of_lines(self):
+        lines = [pricing.Line(0.1 * n, "3.33", n % 3 * 5) for n in range(1, 200)]
+        quote = pricing.price_lines(lines, rate="0.16", inclusive=True)
+        self.assertEqual(quote.total, sum(line.total for line in quote.lines))
+        self.assertEqual(quote.lines, [pricing.price_line(*line, rate="0.16", inclusive=True) for line in lines])
+
+    @override_settings(SALES_TAX_RATE=Decimal("0.16"), PRICES_INCLUDE_TAX=False)
+    def test_quote_endpoint(self):
+        lines = [
+            {"product_id": self.ribeye.id, "quantity": "1.250"},
+            {"product_id": self.wings.id, "quantity": "3", "discount_percent": "10"},
+        ]
+        with self.assertNumQueries(1):
+            response = self.client.post(self.url, {"lines": lines}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([line["total"] for line in response.data["lines"]], [Decimal("18.84"), Decimal("14.09")])
+        self.assertEqual(response.data["total"], Decimal("32.93"))
+
+        lines.append({"product_id": 999999, "quantity": "1"})
+        response = self.client.post(self.url, {"lines": lines}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bench_pricing_command(self):
+        out = StringIO()
+        call_command("bench_pricing", "--lines", "500", "--tax-rate", "0.16", stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual(results["lines"], 500)
+        self.assertGreater(results["price_lines"]["lines_per_second"], 0)
+
+
+class LeanListTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="leanuser", password="pass123", role="admin")
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(name="Brisket", category="beef", price=Decimal("11.40"), stock_quantity=100)
+        for weight in (0.5, 1.25, 2.0):
+            ScaleReading.objects.create(product=self.product, weight_kg=weight, price_per_kg=self.product.price)
+        self.order = Order.objects.create(customer=self.user)
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=3)
+
+    def flattened(self, row, *relations):
+        return {**row, **{name: row[name]["id"] for name in relations}}
+
+    def test_flat_rows_match_full_rows_with_ids(self):
+        url = reverse("scalereading-list")
+        full = self.client.get(url).data["results"]
+        with self.assertNumQueries(1):
+            flat = self.client.get(url, {"flat": "true"}).data["results"]
+        self.assertEqual(flat, [self.flattened(row, "product") for row in full])
+
+        full = self.client.get(reverse("orderitem-list")).data["results"]
+        flat = self.client.get(reverse("orderitem-list"), {"flat": "true"}).data["results"]
+        self.assertEqual(flat, [self.flattened(row, "product") for row in full])
+
+        full = self.client.get(reverse("order-list")).data["results"]
+        flat = self.client.get(reverse("order-list"), {"flat": "true"}).data["results"]
+        self.assertEqual(flat, [self.flattened({k: v for k, v in row.items() if k != "items"}, "customer") for row in full])
+
+    def test_sparse_fieldset(self):
+        url = reverse("scalereading-list")
+        response = self.client.get(url, {"fields": "id,total_price", "page_size": 2})
+        self.assertEqual([list(row) for row in response.data["results"]], [["id", "total_price"]] * 2)
+        rest = self.client.get(response.data["next"]).data["results"]
+        self.assertEqual(len(rest), 1)
+        self.assertEqual(self.client.get(url, {"fields": "id,items"}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_lean_stream(self):
+        StockTransaction.objects.create(product=self.product, transaction_type="OUT", quantity=3)
+        response = self.client.get(reverse("stocktransaction-list"), {"stream": "true", "fields": "product,quantity"})
+        rows = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(rows, [{"product": self.product.id, "quantity": 3.0}])
+
+    def test_bench_lean_command(self):
+        out = StringIO()
+        call_command("bench_lean", "--username", "leanuser", "--pages", "1", stdout=out)
+        results = json.loads(out.getvalue())["results"]
+        self.assertEqual(results["scale-readings"]["flat"]["rows"], 3)
+        self.assertIn("speedup", results["orders"])
+
+
+class JSONRendererTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="jsonuser", password="pass123", role="admin")
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(name="Oxtail", category="beef", price=Decimal("9.80"), stock_quantity=10)
+
+    @skipUnless(renderers.orjson, "orjson is not installed")
+    def test_backends_render_identical_bytes(self):
+        data = {
+            "price": Decimal("9.80"),
+            "at": timezone.now(),
+            "day": date(2025, 8, 1),
+            "name": "Nyama\u2028choma ✓",
+            "counts": {1: 2},
+            "delay": timedelta(seconds=90),
+            "rows": [{"id": 1, "weight": 1.25, "missing": None}],
+        }
+        with override_settings(JSON_BACKEND="stdlib"):
+            expected = renderers.dumps(data)
+        self.assertEqual(renderers.dumps(data), expected)
+        self.assertEqual(renderers.loads(expected), json.loads(expected))
+
+    def test_parser_rejects_invalid_json(self):
+        response = self.client.post(reverse("product-list"), b"{not json", content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stream_array_chunks_rows(self):
+        chunks = list(renderers.stream_array(({"n": n} for n in range(5)), chunk_size=2))
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(json.loads(b"".join(chunks)), [{"n": n} for n in range(5)])
+        self.assertEqual(b"".join(renderers.stream_array([])), b"[]")
+
+    def test_bench_json_command(self):
+        ScaleReading.objects.create(product=self.product, weight_kg=1.5, price_per_kg=self.product.price)
+        out = StringIO()
+        call_command("bench_json", "--rows", "10", "--repeat", "2", stdout=out)
+        results = json.loads(out.getvalue())["results"]
+        self.assertEqual(results["scale-readings"]["rows"], 1)
+        self.assertIn("stdlib", results["stock-transactions (flat)"])
+
+
+class StockLedgerTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="ledgeruser", password="pass123", role="admin")
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(name="T-Bone", category="beef", price=15.00, stock_quantity=0)
+        self.day = date(2025, 8, 1)
+        self.add("IN", 50, self.day)
+        self.add("OUT", 8, self.day)
+        self.add("CLOSE", 40, self.day + timedelta(days=1))
+        self.add("OUT", 5, self.day + timedelta(days=2))
+        self.add("IN", 10, self.day + timedelta(days=3))
+
+    def add(self, transaction_type, quantity, day):
+        return StockTransaction.objects.create(
+            product=self.product, transaction_type=transaction_type, quantity=quantity, date=day
+        )
+
+    def test_balance_replays_ledger(self):
+        self.assertEqual(ledger.balance_at(self.product.id, self.day)[0], 42)
+        self.assertEqual(ledger.balance_at(self.product.id, self.day + timedelta(days=3))[0], 45)
+
+    def test_balance_reads_snapshot_plus_tail(self):
+        call_command("snapshot_stock", date=(self.day + timedelta(days=1)).isoformat(), stdout=StringIO())
+        with self.assertNumQueries(2):
+            balance, snapshot = ledger.balance_at(self.product.id, self.day + timedelta(days=3))
+        self.assertEqual(balance, 45)
+        self.assertEqual(snapshot.balance, 40)
+
+    def test_archive_keeps_balances_and_rollups(self):
+        stream = StringIO()
+        with self.assertRaises(ledger.ArchiveError):
+            ledger.archive(self.day + timedelta(days=2), stream)
+
+        ledger.take_snapshots(self.day + timedelta(days=1))
+        self.assertEqual(ledger.archive(self.day + timedelta(days=2), stream), 3)
+        self.assertEqual(len(stream.getvalue().splitlines()), 3)
+        self.assertEqual(StockTransaction.objects.count(), 2)
+        self.assertEqual(ledger.balance_at(self.product.id, self.day + timedelta(days=3))[0], 45)
+        self.assertEqual(DailyRollup.objects.get(product=self.product, date=self.day).stock_in, 50)
+
+    def test_rebuild_keeps_archived_stock_totals(self):
+        ledger.take_snapshots(self.day + timedelta(days=1))
+        ledger.archive(self.day + timedelta(days=2), StringIO())
+        before = dict(DailyRollup.objects.values_list("date", "stock_in"))
+        self.assertEqual(rollups.rebuild(), 4)
+        self.assertEqual(dict(DailyRollup.objects.values_list("date", "stock_in")), before)
+        closed = DailyRollup.objects.get(product=self.product, date=self.day + timedelta(days=1))
+        self.assertEqual(closed.stock_closed, 40)
+
+    def test_backdated_rows_refresh_snapshots(self):
+        ledger.take_snapshots(self.day)
+        ledger.take_snapshots(self.day + timedelta(days=2))
+        self.add("IN", 5, self.day)
+        self.add("OUT", 1, self.day + timedelta(days=1))
+        snapshots = dict(StockSnapshot.objects.values_list("date", "balance"))
+        self.assertEqual(snapshots[self.day], 47)
+        self.assertEqual(snapshots[self.day + timedelta(days=2)], 34)
+        # The snapshot plus its tail agrees with replaying the whole ledger.
+        StockSnapshot.objects.all().delete()
+        self.assertEqual(ledger.balance_at(self.product.id, self.day + timedelta(days=2))[0], 34)
+
+    def test_archive_skips_signals_and_seals_snapshots(self):
+        ledger.take_snapshots(self.day + timedelta(days=1))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(ledger.archive(self.day + timedelta(days=2), StringIO()), 3)
+        self.assertEqual(sum(q["sql"].startswith("DELETE") for q in queries), 1)
+        self.assertFalse(Tombstone.objects.exists())
+        self.assertTrue(StockSnapshot.objects.get().archived)
+
+        with self.assertLogs("butchery.ledger", "WARNING"):
+            self.add("IN", 100, self.day)
+        self.assertEqual(StockSnapshot.objects.get().balance, 40)
+        with self.assertRaises(ledger.ArchiveError):
+            ledger.take_snapshots(self.day)
+
+    def test_paused_restores_previous_state(self):
+        with rollups.paused():
+            with rollups.paused():
+                pass
+            self.assertTrue(rollups.is_paused())
+        self.assertFalse(rollups.is_paused())
+
+    def test_balance_endpoint_and_append_only_api(self):
+        url = reverse("stocktransaction-balance")
+        response = self.client.get(url, {"product": self.product.id, "date": "2025-08-03"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["balance"], 35)
+
+        txn = StockTransaction.objects.first()
+        response = self.client.delete(reverse("stocktransaction-detail", args=[txn.id]))
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class QueryPlanTests(APITestCase):
+    """
+    EXPLAIN every query behind the hot list, report and admin pages and fail
+    if any of them falls back to reading a whole table.
+    """
+
+    # SQLite reports a full scan as a bare "SCAN <table>" line.
+    full_scan = re.compile(r"^SCAN (\w+)$")
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username="planuser", password="pass123", role="admin")
+        self.client.force_authenticate(user=self.user)
+        product = Product.objects.create(name="Shank", category="beef", price=5.00, stock_quantity=100)
+        order = Order.objects.create(customer=self.user)
+        OrderItem.objects.create(order=order, product=product, quantity=1)
+        StockTransaction.objects.create(product=product, transaction_type="IN", quantity=10, date=date(2025, 8, 1))
+        ScaleReading.objects.create(product=product, weight_kg=1.5, price_per_kg=5.00)
+
+    def full_scans(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # Tiny test tables make a seq scan look cheap; only accept one
+                # when no usable index exists.
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute("EXPLAIN " + sql)
+                return [row[0] for row in cursor.fetchall() if "Seq Scan" in row[0]]
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            return [row[-1] for row in cursor.fetchall() if self.full_scan.match(row[-1])]
+
+    def assertIndexedRequest(self, url, allow=()):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for query in queries.captured_queries:
+            if not query["sql"].lstrip().upper().startswith("SELECT"):
+                continue
+            scans = [scan for scan in self.full_scans(query["sql"]) if not any(table in scan for table in allow)]
+            self.assertEqual(scans, [], query["sql"])
+
+    def test_list_endpoints(self):
+        for name in ["product-list", "order-list", "stocktransaction-list", "scalereading-list"]:
+            with self.subTest(name=name):
+                self.assertIndexedRequest(reverse(name))
+        # Ordered by primary key, which SQLite walks as the table itself.
+        self.assertIndexedRequest(reverse("orderitem-list"), allow=["butchery_orderitem"])
+
+    def test_report_and_ledger_queries(self):
+        url = reverse("daily_report", args=["2025-08-01"])
+        self.assertIndexedRequest(url + "?end=2025-08-31&group_by=category")
+        product = Product.objects.get()
+        self.assertIndexedRequest(reverse("stocktransaction-balance") + f"?product={product.id}&date=2025-08-31")
+
+    def test_admin_changelists(self):
+        self.client.force_login(self.user)
+        for url in [
+            "/admin/butchery/order/",
+            "/admin/butchery/order/?status__exact=PENDING",
+            "/admin/butchery/stocktransaction/?transaction_type__exact=IN",
+            "/admin/butchery/stocktransaction/?date__gte=2025-08-01&date__lt=2025-09-01",
+        ]:
+            with self.subTest(url=url):
+                self.assertIndexedRequest(url)
+
+
+class CatalogCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="catalogadmin", password="pass123", role="admin")
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(name="Oxtail", category="beef", price=9.00, stock_quantity=10)
+        self.url = reverse("product-list")
+
+    def test_conditional_get_skips_database(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        tag = response["ETag"]
+        self.assertEqual(json.loads(response.content)["results"][0]["name"], "Oxtail")
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=tag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response["ETag"], tag)
+
+    def test_if_none_match_compares_whole_tags(self):
+        tag = self.client.get(self.url)["ETag"]
+        longer = '"x' + tag.strip('"') + 'x"'
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=longer)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"other", W/{tag}')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_product_change_invalidates_catalog(self):
+        tag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(reverse("product-detail", args=[self.product.id]), {"price": "9.50"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=tag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], tag)
+        self.assertEqual(json.loads(response.content)["results"][0]["price"], "9.50")
+
+
+@override_settings(NOTIFICATION_BACKEND="butchery.notifications.LocmemBackend")
+class LowStockNotificationTests(APITestCase):
+    def setUp(self):
+        notifications.LocmemBackend.outbox = []
+        self.user = User.objects.create_user(username="alertuser", password="pass123", role="admin")
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(name="Liver", category="beef", price=4.00, stock_quantity=10)
+        self.notification = StockNotification.objects.create(product=self.product, threshold_kg=5)
+        self.order = Order.objects.create(customer=self.user)
+
+    def test_sale_below_threshold_triggers_alert(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("orderitem-list"),
+                {"order": self.order.id, "product_id": self.product.id, "quantity": 6},
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        notifications.dispatcher.flush()
+        self.notification.refresh_from_db()
+        self.assertTrue(self.notification.is_triggered)
+        self.assertEqual([alert.product_name for alert in notifications.LocmemBackend.outbox], ["Liver"])
+
+    def test_evaluate_only_writes_changes(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(notifications.evaluate([self.product.id]), [])
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=2)
+        with self.assertNumQueries(2):
+            alerts = notifications.evaluate([self.product.id])
+        self.assertEqual(len(alerts), 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(notifications.evaluate([self.product.id]), [])
+
+    def test_restock_clears_without_alert(self):
+        StockNotification.objects.filter(pk=self.notification.pk).update(is_triggered=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse("product-detail", args=[self.product.id]), {"stock_quantity": 50})
+        notifications.dispatcher.flush()
+        self.notification.refresh_from_db()
+        self.assertFalse(self.notification.is_triggered)
+        self.assertEqual(notifications.LocmemBackend.outbox, [])
+
+
+class JobTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="jobuser", password="pass123", role="admin")
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(name="Kidney", category="beef", price=3.00, stock_quantity=10)
+        StockTransaction.objects.create(product=self.product, transaction_type="OUT", quantity=2, date=date(2025, 8, 1))
+
+    def test_async_report_job(self):
+        response = self.client.get(reverse("daily_report", args=["2025-08-01"]), {"async": "true"})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], "PENDING")
+
+        call_command("run_jobs", processes=1, once=True)
+        response = self.client.get(reverse("job-detail", args=[response.data["id"]]))
+        self.assertEqual(response.data["status"], "SUCCEEDED")
+        self.assertEqual(response.data["result"]["sales"], 2)
+
+    def test_idempotency_key(self):
+        data = {"name": "insights.recompute", "idempotency_key": "close-2025-08-01"}
+        first = self.client.post(reverse("job-list"), data, format="json")
+        second = self.client.post(reverse("job-list"), data, format="json")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data["id"], second.data["id"])
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_unknown_job_rejected(self):
+        response = self.client.post(reverse("job-list"), {"name": "nope"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_failed_job_is_retried_then_failed(self):
+        job, _ = jobs.submit("rollups.rebuild", {"since": "not-a-date"}, max_attempts=2)
+        with self.assertLogs("butchery.jobs", "WARNING"):
+            jobs.run_next()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("PENDING", 1))
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs("butchery.jobs", "WARNING"):
+            jobs.run_next()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("FAILED", 2))
+        self.assertIn("ValueError", job.error)
+
+    def test_stale_jobs_are_reclaimed_until_out_of_attempts(self):
+        job, _ = jobs.submit("insights.recompute", max_attempts=2)
+        first = jobs.claim()
+        self.assertIsNone(jobs.claim())  # still heartbeating
+
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - jobs.STALE_AFTER * 2)
+        second = jobs.claim()
+        self.assertEqual(second.attempts, 2)
+        # The presumed-dead worker finishes late; its outcome is discarded.
+        with self.assertLogs("butchery.jobs", "WARNING"):
+            jobs.run(first)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "RUNNING")
+
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - jobs.STALE_AFTER * 2)
+        with self.assertLogs("butchery.jobs", "WARNING"):
+            self.assertIsNone(jobs.claim())
+        job.refresh_from_db()
+        self.assertEqual(job.status, "FAILED")
+
+    def test_async_flag_is_parsed(self):
+        response = self.client.get(reverse("daily_report", args=["2025-08-01"]), {"async": "false"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Job.objects.exists())
+
+
+@skipUnless(connection.vendor == "sqlite", "SQLite pragmas")
+class AuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="authadmin", password="pass123", role="admin")
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.user)}"}
+        self.url = reverse("metrics")
+
+    def test_token_carries_role(self):
+        response = self.client.post(reverse("token_obtain_pair"), {"username": "authadmin", "password": "pass123"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(AccessToken(response.data["access"])["role"], "admin")
+
+    def test_user_is_cached_between_requests(self):
+        with CaptureQueriesContext(connection) as first:
+            self.assertEqual(self.client.get(self.url, **self.headers).status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(self.client.get(self.url, **self.headers).status_code, status.HTTP_200_OK)
+        self.assertEqual(len(second), len(first) - 1)
+
+    def test_cache_holds_no_password_hash(self):
+        self.client.get(self.url, **self.headers)
+        cached = cache.get(f"auth:user:{self.user.id}")
+        self.assertNotIn(self.user.password, repr(cached))
+        user = CachedJWTAuthentication().get_user(AccessToken.for_user(self.user))
+        self.assertEqual((user.pk, user.role, user.is_active), (self.user.pk, "admin", True))
+        self.assertEqual(user.get_deferred_fields(), {
+            field.attname for field in User._meta.concrete_fields
+        } - {"id", "username", "role", "is_active", "is_staff", "is_superuser"})
+
+    def test_saving_user_invalidates_cache(self):
+        self.client.get(self.url, **self.headers)
+        self.user.role = User.Role.STAFF
+        self.user.save()
+        self.assertEqual(self.client.get(self.url, **self.headers).status_code, status.HTTP_403_FORBIDDEN)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url, **self.headers).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_basic_auth_is_not_accepted_by_api_endpoints(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Basic " + base64.b64encode(b"authadmin:pass123").decode())
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.post(reverse("token_basic")).status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(BASIC_AUTH_ENABLED=True, BASIC_AUTH_RATE="3/minute")
+    def test_basic_token_exchange_is_throttled(self):
+        url = reverse("token_basic")
+        self.client.credentials(HTTP_AUTHORIZATION="Basic " + base64.b64encode(b"authadmin:wrong").decode())
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION="Basic " + base64.b64encode(b"authadmin:pass123").decode())
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(AccessToken(response.data["access"])["role"], "admin")
+        self.client.post(url)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class SQLitePragmaTests(APITestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        # The in-memory test database cannot use WAL; bench_writes covers files.
+        self.assertEqual(self.pragma("synchronous"), 1)  # NORMAL
+        self.assertEqual(self.pragma("busy_timeout"), 5000)
+        self.assertEqual(self.pragma("cache_size"), -20000)
+
+
+class AsyncEndpointTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="asyncadmin", password="pass123", role="admin")
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+        self.product = Product.objects.create(name="Oxtail", category="beef", price=9.00, stock_quantity=30)
+        StockTransaction.objects.create(product=self.product, transaction_type="OUT", quantity=4, date=date(2025, 8, 1))
+        self.readings = [
+            ScaleReading.objects.create(product=self.product, weight_kg=1.5, price_per_kg=9.00)
+            for _ in range(3)
+        ]
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get(reverse("async_products"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_product_catalog_and_etag(self):
+        response = await self.async_client.get(reverse("async_products"), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p["name"] for p in response.json()], ["Oxtail"])
+        cached = await self.async_client.get(
+            reverse("async_products"), headers={**self.headers, "If-None-Match": response["ETag"]}
+        )
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_daily_report_matches_sync_view(self):
+        response = await self.async_client.get(reverse("async_daily_report", args=["2025-08-01"]), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["sales"], 4)
+
+    async def test_scale_reading_feed_polls_after_last_id(self):
+        first = self.readings[0].id
+        response = await self.async_client.get(
+            reverse("async_scale_readings"), {"after": first, "limit": 1}, headers=self.headers
+        )
+        data = response.json()
+        self.assertEqual([r["id"] for r in data["results"]], [self.readings[1].id])
+        self.assertEqual(data["last_id"], self.readings[1].id)
+
+        response = await self.async_client.get(reverse("async_scale_readings"), {"limit": -1}, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["results"]), 1)
+
+
+class AsyncBenchmarkTests(APITransactionTestCase):
+    """The benchmark drives the WSGI handler from worker threads, so data must be committed."""
+
+    def test_bench_async_command(self):
+        User.objects.create_user(username="asyncadmin", password="pass123", role="admin")
+        Product.objects.create(name="Oxtail", category="beef", price=9.00, stock_quantity=30)
+        out = StringIO()
+        call_command("bench_async", username="asyncadmin", requests=4, concurrency=2, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual(set(results), {"products", "report", "scale-readings"})
+        self.assertEqual(results["products"]["asgi"]["requests"], 4)
+
+
+class LiveFeedTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="displayuser", password="pass123", role="staff")
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+        self.product = Product.objects.create(name="Brisket", category="beef", price=11.00, stock_quantity=40)
+        self.addCleanup(live.hub.subscriptions.clear)
+
+    async def test_slow_subscriber_is_told_to_resync(self):
+        hub = live.Hub(buffer_size=2)
+        subscription = hub.subscribe()
+        for weight in (1, 2, 3):
+            hub.publish("scale_reading", {"weight_kg": weight})
+        self.assertEqual(await subscription.get(timeout=0.1), ([], True))
+        hub.publish("stock", {"stock_quantity": 5})
+        events, overflowed = await subscription.get(timeout=0.1)
+        self.assertEqual(([event.data for event in events], overflowed), ([{"stock_quantity": 5}], False))
+
+    async def test_reconnect_replays_missed_events(self):
+        hub = live.Hub()
+        first = hub.publish("stock", {"stock_quantity": 1})
+        hub.publish("scale_reading", {"weight_kg": 2})
+        hub.publish("stock", {"stock_quantity": 3})
+        events, _ = await hub.subscribe(["stock"], last_event_id=first.id).get(timeout=0.1)
+        self.assertEqual([event.data for event in events], [{"stock_quantity": 3}])
+        self.assertEqual(await hub.subscribe(last_event_id=99).get(timeout=0.1), ([], True))
+
+    def record_sale(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ScaleReading.objects.create(product=self.product, weight_kg=2, price_per_kg=11.00)
+            self.client.force_authenticate(user=self.user)
+            self.client.post(reverse("orderitem-list"), {
+                "order": Order.objects.create(customer=self.user).id,
+                "product_id": self.product.id,
+                "quantity": 3,
+            }, format="json")
+
+    async def test_stream_pushes_committed_writes(self):
+        response = await self.async_client.get(reverse("live_feed"), headers=self.headers)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = response.streaming_content
+        self.assertEqual(await anext(stream), b"retry: 3000\n\n")
+        await sync_to_async(self.record_sale)()
+        chunks = [(await anext(stream)).decode() for _ in range(2)]
+        await stream.aclose()
+        self.assertIn("event: scale_reading", chunks[0])
+        self.assertIn('"total_price": "22.00"', chunks[0])
+        self.assertIn("event: stock", chunks[1])
+        self.assertIn('"stock_quantity": 37', chunks[1])
+
+    async def test_unknown_topic_rejected(self):
+        response = await self.async_client.get(reverse("live_feed"), {"topics": "orders"}, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RequestMetricsTests(APITestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        self.user = User.objects.create_user(username="metricsadmin", password="pass123", role="admin")
+        self.client.force_authenticate(user=self.user)
+        product = Product.objects.create(name="Ribeye", category="beef", price=15.00, stock_quantity=10)
+        order = Order.objects.create(customer=self.user)
+        OrderItem.objects.create(order=order, product=product, quantity=1)
+
+    def test_metrics_endpoint_exposes_histograms(self):
+        self.client.get(reverse("order-list"))
+        self.client.get(reverse("order-list"))
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        labels = 'endpoint="order-list",method="GET",action="list"'
+        self.assertIn("# TYPE tamucuts_request_duration_seconds histogram", body)
+        self.assertIn(f"tamucuts_request_queries_count{{{labels}}} 2", body)
+        self.assertIn(f'tamucuts_request_queries_bucket{{{labels},le="+Inf"}} 2', body)
+        queries = float(re.search(rf"tamucuts_request_queries_sum{{{labels}}} (\S+)", body).group(1))
+        self.assertGreater(queries, 0)
+        serialize = float(re.search(rf"tamucuts_request_serialize_seconds_sum{{{labels}}} (\S+)", body).group(1))
+        self.assertGreater(serialize, 0)
+
+    def test_metrics_endpoint_is_admin_only(self):
+        staff = User.objects.create_user(username="metricsstaff", password="pass123", role="staff")
+        self.client.force_authenticate(user=staff)
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(REQUEST_QUERY_BUDGET=1)
+    def test_query_budget_warning(self):
+        with self.assertLogs("butchery.metrics", "WARNING") as logs:
+            self.client.get(reverse("order-list"))
+        self.assertIn("order-list/list", logs.output[0])
+
+
+class BenchmarkSuiteTests(APITransactionTestCase):
+    def generate(self):
+        out = StringIO()
+        call_command(
+            "generate_data", products=20, customers=5, orders=30, max_items=3,
+            transactions=200, readings=150, days=10, batch_size=50, stdout=out,
+        )
+        return out.getvalue()
+
+    def test_generate_data(self):
+        self.generate()
+        self.assertTrue(User.objects.filter(username="bench", role="admin").exists())
+        self.assertEqual(Product.objects.count(), 20)
+        self.assertEqual(Order.objects.count(), 30)
+        self.assertEqual(StockTransaction.objects.count(), 200)
+        self.assertEqual(ScaleReading.objects.count(), 150)
+        self.assertGreater(Order.objects.dates("created_at", "day").count(), 1)
+        self.assertTrue(OrderItem.objects.exists())
+        self.assertTrue(DailyRollup.objects.filter(revenue__gt=0).exists())
+
+    def test_bench_writes_comparable_results(self):
+        self.generate()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "bench.json")
+        call_command("bench", requests=3, concurrency=2, output=path, stdout=StringIO())
+        with open(path) as stream:
+            baseline = json.load(stream)
+        self.assertEqual(
+            set(baseline["results"]), {"products", "orders", "order-items", "reports", "scale-readings"}
+        )
+        orders = baseline["results"]["orders"]
+        self.assertEqual(orders["requests"], 3)
+        self.assertGreater(orders["queries"], 0)
+        self.assertLessEqual(orders["p50_ms"], orders["p95_ms"])
+        self.assertEqual(baseline["environment"]["rows"]["order"], 30)
+
+        out = StringIO()
+        call_command("bench", requests=2, endpoint=["reports"], compare=path, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual(set(results["results"]), {"reports"})
+        self.assertIn("p95_ms", results["comparison"]["reports"])
+
+    def test_bench_writes_compares_sqlite_modes(self):
+        out = StringIO()
+        call_command("bench_writes", writers=2, writes=5, stdout=out, stderr=StringIO())
+        results = json.loads(out.getvalue())
+        self.assertEqual(set(results) - {"postgresql"}, {"sqlite-rollback-journal", "sqlite-wal"})
+        self.assertEqual(results["sqlite-wal"]["writes"] + results["sqlite-wal"]["errors"], 10)
+        self.assertEqual(results["sqlite-wal"]["journal_mode"], "wal")
+        self.assertEqual(results["sqlite-rollback-journal"]["journal_mode"], "delete")
+        self.assertNotIn("bench_sqlite_wal", connections)
+
+
+class ReplicaRoutingTests(APITransactionTestCase):
+    """
+    Two-database setup: "replica" is a second connection to the test
+    database, registered after the runner has set up the databases.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        connections.settings["replica"] = {**connections.settings["default"], "TEST": {"MIRROR": "default"}}
+        cls.addClassCleanup(cls.remove_replica)
+
+    @classmethod
+    def remove_replica(cls):
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username="replicaadmin", password="pass123", role="admin")
+        self.client.force_authenticate(user=self.admin)
+        self.product = Product.objects.create(name="Silverside", category="beef", price=8.00, stock_quantity=50)
+        StockTransaction.objects.create(product=self.product, transaction_type="OUT", quantity=3, date=date(2025, 8, 1))
+        self.report_url = reverse("daily_report", args=["2025-08-01"])
+
+    def queries(self, method, *args, **kwargs):
+        with CaptureQueriesContext(connection) as primary, CaptureQueriesContext(connections["replica"]) as replica:
+            response = method(*args, **kwargs)
+        return response, [q["sql"] for q in primary], [q["sql"] for q in replica]
+
+    def test_reports_and_lists_read_from_replica(self):
+        response, primary, replica = self.queries(self.client.get, self.report_url)
+        self.assertEqual(response.data["sales"], 3)
+        self.assertEqual(primary, [])
+        self.assertIn("butchery_dailyrollup", replica[0])
+
+        _, primary, replica = self.queries(self.client.get, reverse("stocktransaction-list"))
+        self.assertEqual(primary, [])
+        self.assertTrue(replica)
+
+    def test_writes_pin_user_to_primary(self):
+        data = {"customer_id": self.admin.id, "items": [{"product_id": self.product.id, "quantity": 2}]}
+        response, _, replica = self.queries(self.client.post, reverse("order-checkout"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replica, [])
+        self.assertTrue(routers.is_pinned(self.admin.id))
+
+        _, primary, replica = self.queries(self.client.get, self.report_url)
+        self.assertEqual(replica, [])
+        self.assertIn("butchery_dailyrollup", primary[0])
+
+        # Another user is not pinned.
+        clerk = User.objects.create_user(username="replicaclerk", password="pass123", role="admin")
+        self.client.force_authenticate(user=clerk)
+        _, primary, replica = self.queries(self.client.get, self.report_url)
+        self.assertEqual(primary, [])
+        self.assertTrue(replica)
+
+    def test_detail_and_write_actions_stay_on_primary(self):
+        _, primary, replica = self.queries(self.client.get, reverse("stocktransaction-detail", args=[1]))
+        self.assertEqual(replica, [])
+        self.assertTrue(primary)
+
+
+class BulkTransferTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username="bulkadmin", password="pass123", role="admin")
+        self.client.force_authenticate(user=self.admin)
+        self.product = Product.objects.create(name="Brisket", category="beef", price=12.00, stock_quantity=0)
+
+    def test_import_stock_transactions_csv(self):
+        body = (
+            "product_id,transaction_type,quantity,date,remarks\n"
+            f"{self.product.id},IN,20,2025-08-01,delivery\n"
+            f"{self.product.id},OUT,5,2025-08-01,\n"
+            f"{self.product.id},IN,-3,2025-08-01,bad quantity\n"
+            "9999,IN,4,2025-08-01,unknown product\n"
+        )
+        response = self.client.post(
+            reverse("stocktransaction-import-rows"), body, content_type="text/csv"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual([error["index"] for error in response.data["errors"]], [2, 3])
+        self.assertIn("product_id", response.data["errors"][1]["errors"])
+
+        self.assertEqual(StockTransaction.objects.filter(product=self.product).count(), 2)
+        rollup = DailyRollup.objects.get(date=date(2025, 8, 1), product=self.product)
+        self.assertEqual((rollup.stock_in, rollup.stock_out), (20, 5))
+
+    def test_import_products_ndjson_creates_and_updates(self):
+        body = "\n".join([
+            json.dumps({"name": "Oxtail", "category": "beef", "price": "15.50", "stock_quantity": 3}),
+            json.dumps({"id": self.product.id, "price": "13.25"}),
+            json.dumps({"id": 9999, "price": "1.00"}),
+            "not json",
+        ])
+        response = self.client.post(
+            reverse("product-import-rows"), body, content_type="application/x-ndjson"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data["created"], response.data["updated"]), (1, 1))
+        self.assertEqual(sorted(error["index"] for error in response.data["errors"]), [2, 3])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.price, Decimal("13.25"))
+        self.assertTrue(Product.objects.filter(name="Oxtail", stock_quantity=3).exists())
+
+    def test_import_keeps_product_timestamps(self):
+        created_at = self.product.created_at
+        body = (
+            "id,name,price,created_at,updated_at\n"
+            f"{self.product.id},Brisket,14.00,2001-01-01T00:00:00Z,2001-01-01T00:00:00Z\n"
+        )
+        response = self.client.post(reverse("product-import-rows"), body, content_type="text/csv")
+        self.assertEqual(response.data["updated"], 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.price, Decimal("14.00"))
+        self.assertEqual(self.product.created_at, created_at)
+        self.assertGreater(self.product.updated_at.year, 2001)
+
+    def test_import_validates_ledger_rows_with_id_in_full(self):
+        body = (
+            "id,product_id,transaction_type,quantity,date\n"
+            f"1,{self.product.id},IN,,2025-08-01\n"
+            "2,,IN,4,2025-08-01\n"
+            f"3,{self.product.id},IN,4,2025-08-01\n"
+        )
+        response = self.client.post(reverse("stocktransaction-import-rows"), body, content_type="text/csv")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 1)
+        errors = {error["index"]: error["errors"] for error in response.data["errors"]}
+        self.assertIn("quantity", errors[0])
+        self.assertIn("product_id", errors[1])
+
+    def test_import_requires_admin_and_known_format(self):
+        response = self.client.post(reverse("product-import-rows"), "name\nX\n", content_type="text/plain")
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+        staff = User.objects.create_user(username="bulkstaff", password="pass123", role="staff")
+        self.client.force_authenticate(user=staff)
+        response = self.client.post(reverse("product-import-rows"), "name\nX\n", content_type="text/csv")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_streams_csv_and_ndjson(self):
+        StockTransaction.objects.create(product=self.product, transaction_type="IN", quantity=8, date=date(2025, 7, 1))
+        StockTransaction.objects.create(product=self.product, transaction_type="OUT", quantity=2, date=date(2025, 8, 1))
+        url = reverse("stocktransaction-export")
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "id,product_id,transaction_type,quantity,date,remarks,created_at")
+        self.assertEqual(len(lines), 3)
+
+        response = self.client.get(url, {"file_format": "ndjson", "since": "2025-08-01"})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([(row["transaction_type"], row["date"]) for row in rows], [("OUT", "2025-08-01")])
+
+        self.assertEqual(self.client.get(url, {"since": "August"}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_commands_round_trip(self):
+        for quantity in (4, 6):
+            StockTransaction.objects.create(product=self.product, transaction_type="IN", quantity=quantity)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "ledger.ndjson")
+            call_command("export_rows", "stock-transactions", path, stderr=StringIO())
+            StockTransaction.objects.all().delete()
+            out = StringIO()
+            call_command("import_rows", "stock-transactions", path, "--chunk-size", "1", stdout=out)
+        self.assertIn("Created 2", out.getvalue())
+        self.assertEqual(sorted(StockTransaction.objects.values_list("quantity", flat=True)), [4, 6])
+
+    def test_many_buckets_match_rebuild(self):
+        rows = "".join(
+            f"{self.product.id},IN,{day},2025-06-{day:02d},\n{self.product.id},OUT,1,2025-06-{day:02d},\n"
+            for day in range(1, 31)
+        ) + "".join(f"{self.product.id},CLOSE,2,2025-07-{day:02d},\n" for day in range(1, 31))
+        DailyRollup.objects.create(date=date(2025, 6, 1), product=self.product, stock_in=0)
+        body = "product_id,transaction_type,quantity,date,remarks\n" + rows
+        response = self.client.post(reverse("stocktransaction-import-rows"), body, content_type="text/csv")
+        self.assertEqual(response.data["created"], 90)
+
+        incremental = list(DailyRollup.objects.order_by("date").values_list("date", "stock_in", "stock_out", "stock_closed"))
+        call_command("rebuild_rollups", stdout=StringIO())
+        rebuilt = list(DailyRollup.objects.order_by("date").values_list("date", "stock_in", "stock_out", "stock_closed"))
+        self.assertEqual(len(incremental), 60)
+        self.assertEqual(incremental, rebuilt)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncTests(APITestCase):
+    def setUp(self):
+        self.clerk = User.objects.create_user(username="synclerk", password="pass123", role="staff")
+        self.client.force_authenticate(user=self.clerk)
+        self.product = Product.objects.create(name="Tenderloin", category="beef", price=20.00, stock_quantity=10)
+        self.url = reverse("sync")
+
+    def sync(self, cursor=None, **params):
+        if cursor:
+            params["cursor"] = cursor
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def ids(self, data, stream):
+        return [row["id"] for row in data["changes"][stream]]
+
+    def test_full_then_delta(self):
+        first = self.sync()
+        self.assertTrue(first["reset"])
+        self.assertEqual(self.ids(first, "products"), [self.product.id])
+
+        other = Product.objects.create(name="Flank", category="beef", price=11.00, stock_quantity=4)
+        txn = StockTransaction.objects.create(product=other, transaction_type="IN", quantity=3)
+        reading = ScaleReading.objects.create(product=other, weight_kg=1.5, price_per_kg=11)
+        delta = self.sync(first["cursor"])
+        self.assertFalse(delta["reset"])
+        self.assertEqual(self.ids(delta, "products"), [other.id])
+        self.assertEqual(self.ids(delta, "stock_transactions"), [txn.id])
+        self.assertEqual(delta["changes"]["scale_readings"][0]["total_price"], "16.50")
+
+        again = self.sync(delta["cursor"])
+        self.assertEqual(sum(len(rows) for rows in again["changes"].values()), 0)
+
+    def test_pages_by_limit(self):
+        for name in ("Rump", "Shank", "Tongue"):
+            Product.objects.create(name=name, category="beef", price=5.00)
+        seen, cursor, more = [], None, True
+        while more:
+            data = self.sync(cursor, limit=2)
+            seen += self.ids(data, "products")
+            cursor, more = data["cursor"], data["has_more"]
+        self.assertEqual(sorted(seen), sorted(Product.objects.values_list("id", flat=True)))
+
+    def test_deletes_are_tombstoned(self):
+        txn = StockTransaction.objects.create(product=self.product, transaction_type="IN", quantity=3)
+        product_id = self.product.id
+        cursor = self.sync()["cursor"]
+        self.product.delete()
+        delta = self.sync(cursor)
+        self.assertEqual(delta["deleted"]["products"], [product_id])
+        self.assertEqual(delta["deleted"]["stock_transactions"], [txn.id])
+
+        Tombstone.objects.update(deleted_at=timezone.now() - timedelta(days=31))
+        self.assertEqual(sync.prune_tombstones(), 2)
+
+    def test_rejects_bad_and_expired_cursors(self):
+        self.assertEqual(self.client.get(self.url, {"cursor": "nonsense"}).status_code, status.HTTP_400_BAD_REQUEST)
+        old = timezone.now() - timedelta(days=60)
+        cursor = sync.encode_cursor({"products": (old, None), "deleted": (old, None)})
+        self.assertEqual(self.client.get(self.url, {"cursor": cursor}).status_code, status.HTTP_410_GONE)
+
+    def test_recent_rows_wait_for_settle_window(self):
+        cursor = self.sync()["cursor"]
+        Product.objects.create(name="Heart", category="beef", price=3.00)
+        with override_settings(SYNC_SETTLE_SECONDS=60):
+            self.assertEqual(self.ids(self.sync(cursor), "products"), [])
+        self.assertEqual(len(self.ids(self.sync(cursor), "products")), 1)
+
+    def test_item_changes_resync_order(self):
+        order = Order.objects.create(customer=self.clerk)
+        cursor = self.sync()["cursor"]
+        item = OrderItem.objects.create(order=order, product=self.product, quantity=2)
+        rows = self.sync(cursor)["changes"]["orders"]
+        self.assertEqual([row["id"] for row in rows], [order.id])
+        self.assertEqual(rows[0]["items"], [{"id": item.id, "product": self.product.id, "quantity": 2}])
+
+    def test_offline_sales_replay_is_idempotent(self):
+        url = reverse("sync_sales")
+        sold_at = timezone.now() - timedelta(days=1)
+        sales = [
+            {"client_ref": "tab1-0001", "sold_at": sold_at.isoformat(), "items": [{"product_id": self.product.id, "quantity": 4}]},
+            {"client_ref": "tab1-0002", "items": [{"product_id": self.product.id, "quantity": 7}]},
+            {"client_ref": "tab1-0003", "items": [{"product_id": self.product.id, "quantity": 6}]},
+        ]
+        response = self.client.post(url, {"sales": sales}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result["status"] for result in response.data["results"]], ["created", "rejected", "created"])
+        self.assertIn("items", response.data["results"][1]["errors"])
+
+        order = Order.objects.get(client_ref="tab1-0001")
+        self.assertEqual(order.customer, self.clerk)
+        self.assertEqual(order.created_at, sold_at)
+        self.assertEqual(StockTransaction.objects.get(remarks__contains=f"#{order.id}").date, sold_at.date())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
+
+        retry = self.client.post(url, {"sales": sales[:1] + sales[2:]}, format="json")
+        self.assertEqual((retry.data["created"], retry.data["duplicate"]), (0, 2))
+        self.assertEqual(retry.data["results"][0]["order_id"], order.id)
+        self.assertEqual(Order.objects.count(), 2)
+
+        self.assertEqual(self.client.post(url, {"sales": []}, format="json").status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_duplicate_client_ref_is_detected_explicitly(self):
+        sale = {"client_ref": "tab2-0001", "items": [{"product_id": self.product.id, "quantity": 1}]}
+        serializer = OfflineSaleSerializer(data=sale)
+        self.assertTrue(serializer.is_valid())
+        # Another upload records the same sale between validation and save.
+        Order.objects.create(customer=self.clerk, client_ref="tab2-0001")
+        with self.assertRaises(DuplicateSale):
+            serializer.save(customer=self.clerk)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 10)
+
+    def test_duplicate_of_another_users_sale_hides_order(self):
+        other = User.objects.create_user(username="synclerk2", password="pass123", role="staff")
+        Order.objects.create(customer=other, client_ref="tab3-0001")
+        sale = {"client_ref": "tab3-0001", "items": [{"product_id": self.product.id, "quantity": 1}]}
+        response = self.client.post(reverse("sync_sales"), {"sales": [sale]}, format="json")
+        self.assertEqual(response.data["results"][0]["status"], "duplicate")
+        self.assertNotIn("order_id", response.data["results"][0])
+
+    def test_paused_deletes_leave_no_tombstones(self):
+        with rollups.paused():
+            Product.objects.create(name="Liver", category="beef", price=2.00).delete()
+        self.assertFalse(Tombstone.objects.exists())
@@ -1,86 +1,307 @@
-from rest_framework import viewsets
-from .models import User, Product, Order, OrderItem , ScaleReading, StockNotification , StockTransaction , SalesInsight
+from rest_framework import mixins, viewsets
+from rest_framework.decorators import action
+from .models import User, Product, Order, OrderItem , ScaleReading, StockNotification , StockTransaction , SalesInsight, Job, line_total
 from .serializers import (UserSerializer,
     ProductSerializer, OrderSerializer, OrderItemSerializer, 
-    ScaleReadingSerializer, StockNotificationSerializer,StockTransactionSerializer, SalesInsightSerializer)
+    ScaleReadingSerializer, StockNotificationSerializer,StockTransactionSerializer, SalesInsightSerializer,
+    CheckoutSerializer, ScaleReadingBatch, JobSerializer, PriceQuoteSerializer)
 from rest_framework.views import APIView 
+from rest_framework.renderers import JSONRenderer
+from django.http import HttpResponse, HttpResponseNotModified
 from rest_framework.response import Response
 from rest_framework.permissions import BasePermission , IsAuthenticated
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.exceptions import NotFound
+from django.conf import settings
 from datetime import datetime
-from django.db.models import Sum 
+from django.utils import timezone
+from django.db.models import Prefetch
+from .pagination import StreamingListMixin
+from .lean import TRUE, LeanListMixin
+from .bulk import BulkTransferMixin
+from .parsers import NDJSONParser
+from .renderers import FastJSONParser, FastJSONRenderer
+from . import catalog, jobs, ledger, metrics, reports, sync
+from .metrics import InstrumentedViewMixin
+from .routers import ReplicaRoutingMixin
+from .authentication import BasicAuthRateThrottle, RoleTokenObtainPairSerializer
 
 
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(InstrumentedViewMixin, ReplicaRoutingMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(InstrumentedViewMixin, ReplicaRoutingMixin, BulkTransferMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
+    bulk_kind = "products"
+    # The list is cached per catalog version; a lagging replica could cache
+    # stale rows under the new version.
+    replica_actions = ()
 
     def get_permissions(self):
-        if self.action in ["create", "update", "partial_update", "destroy"]:
+        if self.action in ["create", "update", "partial_update", "destroy", "import_rows"]:
             return [IsAdmin()]
         return [IsAuthenticated()]
 
+    def list(self, request, *args, **kwargs):
+        # Serve the polled price list from the versioned catalog cache; the
+        # browsable API and streaming exports take the normal path.
+        if request.query_params.get(self.stream_param) or not isinstance(request.accepted_renderer, JSONRenderer):
+            return super().list(request, *args, **kwargs)
+        tag = catalog.etag(catalog.get_version(), request)
+        if catalog.etag_matches(tag, request.headers.get("If-None-Match")):
+            response = HttpResponseNotModified()
+            response["ETag"] = tag
+            return response
+        body = catalog.get_body(tag)
+        if body is None:
+            body = FastJSONRenderer().render(super().list(request, *args, **kwargs).data)
+            catalog.set_body(tag, body)
+        response = HttpResponse(body, content_type="application/json")
+        response["ETag"] = tag
+        response["Cache-Control"] = "private, no-cache"
+        return response
 
-class OrderViewSet(viewsets.ModelViewSet):
+
+class OrderViewSet(InstrumentedViewMixin, ReplicaRoutingMixin, LeanListMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related("customer")
+        if self.action in ["list", "retrieve", "checkout"]:
+            queryset = queryset.with_totals()
+            # Items and their products are nested in the response; fetch them
+            # in one extra query instead of one per order and one per item.
+            queryset = queryset.prefetch_related(
+                Prefetch("items", queryset=OrderItem.objects.select_related("product"))
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == "checkout":
+            return CheckoutSerializer
+        return super().get_serializer_class()
+
+    @action(detail=False, methods=["post"])
+    def checkout(self, request):
+        """Create an order and all of its items in one request."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order = self.get_queryset().get(pk=serializer.save().pk)
+        return Response(OrderSerializer(order, context=self.get_serializer_context()).data, status=201)
 
-class OrderItemViewSet(viewsets.ModelViewSet):
+
+class OrderItemViewSet(InstrumentedViewMixin, ReplicaRoutingMixin, LeanListMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = OrderItem.objects.all()
     serializer_class = OrderItemSerializer
     permission_classes = [IsAuthenticated]
+    lean_annotations = {"total_price": line_total()}
+
+    def get_queryset(self):
+        return super().get_queryset().select_related("product")
 
-class ScaleReadingViewSet(viewsets.ModelViewSet):
-    queryset = ScaleReading.objects.all()
+class ScaleReadingViewSet(InstrumentedViewMixin, ReplicaRoutingMixin, LeanListMixin, StreamingListMixin, viewsets.ModelViewSet):
+    queryset = ScaleReading.objects.select_related("product")
     serializer_class = ScaleReadingSerializer
+    cursor_ordering = ("-recorded_at", "-id")
+
+    @action(detail=False, methods=["post"], parser_classes=[FastJSONParser, NDJSONParser])
+    def batch(self, request):
+        """
+        Store many readings at once from a JSON array or NDJSON body.
+        Valid rows are saved even when others fail; failures are listed by index.
+        """
+        batch = ScaleReadingBatch(request.data)
+        batch.is_valid()
+        created = batch.save()
+        return Response(
+            {"created": len(created), "errors": batch.errors},
+            status=201 if created or not batch.errors else 400,
+        )
 
-class StockNotificationViewSet(viewsets.ModelViewSet):
-    queryset = StockNotification.objects.all()
+class StockNotificationViewSet(InstrumentedViewMixin, ReplicaRoutingMixin, LeanListMixin, viewsets.ModelViewSet):
+    queryset = StockNotification.objects.select_related("product")
     serializer_class = StockNotificationSerializer
 
-class StockTransactionViewSet(viewsets.ModelViewSet):
-    queryset = StockTransaction.objects.all()
+class StockTransactionViewSet(InstrumentedViewMixin, ReplicaRoutingMixin, BulkTransferMixin, LeanListMixin, StreamingListMixin, viewsets.ModelViewSet):
+    queryset = StockTransaction.objects.select_related("product")
     serializer_class = StockTransactionSerializer
     permission_classes = [IsAuthenticated]
+    bulk_kind = "stock-transactions"
+    # The ledger is append-only: corrections are new IN/OUT/CLOSE rows.
+    http_method_names = ["get", "post", "head", "options"]
+
+    @action(detail=False, methods=["get"])
+    def balance(self, request):
+        """Ledger balance of ``?product=<id>`` at the end of ``?date=YYYY-MM-DD`` (default today)."""
+        try:
+            product_id = int(request.query_params["product"])
+            date = request.query_params.get("date")
+            date = datetime.strptime(date, "%Y-%m-%d").date() if date else timezone.localdate()
+        except (KeyError, ValueError):
+            return Response({"error": "Pass ?product=<id> and optionally ?date=YYYY-MM-DD."}, status=400)
+        balance, snapshot = ledger.balance_at(product_id, date)
+        return Response({
+            "product_id": product_id,
+            "date": date,
+            "balance": balance,
+            "snapshot_date": snapshot.date if snapshot else None,
+        })
 
 class IsAdmin(BasePermission):
     def has_permission(self, request, view):
         return request.user.is_authenticated and request.user.role == "admin"
 
-class DailyReportView(APIView):
+class DailyReportView(InstrumentedViewMixin, ReplicaRoutingMixin, APIView):
     permission_classes = [IsAdmin]
+    replica_actions = ("get",)
 
     def get(self, request, date=None):
         try:
-            if date:
-                date_obj = datetime.strptime(date, "%Y-%m-%d").date()
-                transactions = StockTransaction.objects.filter(date=date_obj)
-            else:
-                transactions = StockTransaction.objects.all()
-            opening_stock = transactions.filter(transaction_type="IN").aggregate(Sum("quantity"))["quantity__sum"] or 0
-            sales = transactions.filter(transaction_type="OUT").aggregate(Sum("quantity"))["quantity__sum"] or 0
-            closing_stock = transactions.filter(transaction_type="CLOSE").aggregate(Sum("quantity"))["quantity__sum"] or 0
-            revenue = sum(item.get_total_price() for item in OrderItem.objects.filter(order__created_at__date=date_obj if date else None))
-            return Response({
-                "date": date or "all",
-                "opening_stock": opening_stock,
-                "sales": sales,
-                "closing_stock": closing_stock,
-                "revenue": revenue
-            })
+            start = datetime.strptime(date, "%Y-%m-%d").date() if date else None
+            end = request.query_params.get("end")
+            end = datetime.strptime(end, "%Y-%m-%d").date() if end else start
         except ValueError:
             return Response({"error": "Invalid date format. Use YYYY-MM-DD."}, status=400)
-        
-class SalesInsightViewSet(viewsets.ModelViewSet):
+        group_by = request.query_params.get("group_by")
+        if group_by and group_by not in reports.GROUPINGS:
+            return Response({"error": f"group_by must be one of: {', '.join(reports.GROUPINGS)}."}, status=400)
+
+        if request.query_params.get("async", "").lower() in TRUE:
+            job, _ = jobs.submit("reports.daily", {
+                "start": start.isoformat() if start else None,
+                "end": end.isoformat() if end else None,
+                "group_by": group_by,
+            })
+            return Response(JobSerializer(job, context={"request": request}).data, status=202)
+
+        if group_by:
+            rows = reports.breakdown(start, end, group_by)
+            totals = {
+                name: sum(row[name] for row in rows)
+                for name in [*reports.STOCK_FIELDS, "revenue"]
+            }
+        else:
+            totals = reports.summarize(start, end)
+        report = {"date": date or "all", **totals}
+        if end != start:
+            report["end"] = end.isoformat()
+        if group_by:
+            report["breakdown"] = rows
+        return Response(report)
+
+class SalesInsightViewSet(InstrumentedViewMixin, ReplicaRoutingMixin, viewsets.ModelViewSet):
     queryset = SalesInsight.objects.all()
     serializer_class = SalesInsightSerializer
     permission_classes = [IsAdmin]
+    replica_actions = ("list", "retrieve")
+
+    @action(detail=False, methods=["post"])
+    def recompute(self, request):
+        """Record a new insight from the daily rollup (one grouped query)."""
+        if request.query_params.get("async", "").lower() in TRUE:
+            job, _ = jobs.submit("insights.recompute")
+            return Response(JobSerializer(job, context=self.get_serializer_context()).data, status=202)
+        insight = reports.record_insight()
+        return Response(self.get_serializer(insight).data, status=201)
+
+
+class JobViewSet(InstrumentedViewMixin, ReplicaRoutingMixin, mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """Submit background jobs and poll their status."""
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [IsAdmin]
+    # Workers update jobs on the primary; a lagging replica would show stale status.
+    replica_actions = ()
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job, created = jobs.submit(**serializer.validated_data)
+        return Response(self.get_serializer(job).data, status=201 if created else 200)
+
+
+class BasicTokenView(InstrumentedViewMixin, APIView):
+    """
+    Exchange HTTP Basic credentials for a JWT pair, for clients that cannot
+    call /api/token/. Off unless BASIC_AUTH_ENABLED; throttled per client.
+    """
+    authentication_classes = [BasicAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_classes = []
+
+    def initial(self, request, *args, **kwargs):
+        if not settings.BASIC_AUTH_ENABLED:
+            raise NotFound()
+        # Throttle before authenticating: every attempt costs a password hash.
+        throttle = BasicAuthRateThrottle()
+        if not throttle.allow_request(request, self):
+            self.throttled(request, throttle.wait())
+        super().initial(request, *args, **kwargs)
+
+    def post(self, request):
+        refresh = RoleTokenObtainPairSerializer.get_token(request.user)
+        return Response({"refresh": str(refresh), "access": str(refresh.access_token)})
+
+
+class PriceQuoteView(InstrumentedViewMixin, APIView):
+    """Price many lines (discounts and tax included) without creating an order."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = PriceQuoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.quote())
+
+
+class SyncView(InstrumentedViewMixin, APIView):
+    """
+    Changes since ``?cursor=`` for offline clients (see ``butchery.sync``).
+    Reads the primary: a lagging replica could hide rows behind the cursor.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get("limit", sync.PAGE_SIZE)), 1), sync.MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=400)
+        try:
+            return Response(sync.changes(request.query_params.get("cursor"), limit))
+        except sync.CursorExpired as exc:
+            return Response({"error": str(exc)}, status=410)
+        except sync.CursorError as exc:
+            return Response({"error": str(exc)}, status=400)
+
+
+class OfflineSalesView(InstrumentedViewMixin, APIView):
+    """
+    Replay sales queued offline: ``{"sales": [{client_ref, items, ...}]}``.
+    Safe to retry; already recorded sales come back as duplicates.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        sales = request.data.get("sales") if isinstance(request.data, dict) else None
+        if not isinstance(sales, list) or not sales:
+            return Response({"sales": "Expected a non-empty list of sales."}, status=400)
+        if len(sales) > sync.MAX_SALES:
+            return Response({"sales": f"At most {sync.MAX_SALES} sales per upload."}, status=400)
+        results = sync.replay_sales(sales, request.user)
+        counts = {state: sum(result["status"] == state for result in results) for state in ("created", "duplicate", "rejected")}
+        return Response({**counts, "results": results})
+
+
+class MetricsView(InstrumentedViewMixin, APIView):
+    """Request histograms in the Prometheus text format."""
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return HttpResponse(metrics.registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
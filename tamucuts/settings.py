@@ -12,8 +12,12 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta 
+from decimal import Decimal
 import os
 
+from decouple import config
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'butchery.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,13 +83,107 @@ WSGI_APPLICATION = 'tamucuts.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# Configured from the environment (or a .env file) via python-decouple.
+# DB_ENGINE=postgresql for production; the SQLite file stays the default.
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+
+if DB_ENGINE == 'postgresql':
+    # Needs psycopg2-binary (see requirements.txt). Connections are reused
+    # for DB_CONN_MAX_AGE seconds and health-checked before reuse; put
+    # PgBouncer in front for pooling across many workers (transaction
+    # pooling also needs DB_DISABLE_SERVER_SIDE_CURSORS=True).
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='tamucuts'),
+            'USER': config('DB_USER', default='tamucuts'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+            'DISABLE_SERVER_SIDE_CURSORS': config('DB_DISABLE_SERVER_SIDE_CURSORS', default=False, cast=bool),
+            'OPTIONS': {
+                'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+            },
+        }
+    }
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unknown DB_ENGINE {DB_ENGINE!r}; use 'postgresql' or 'sqlite'.")
+
+# Optional read replica for reports, insights, list endpoints and admin
+# changelists (butchery.routers): a streaming replica of the PostgreSQL
+# primary, or a copy of the SQLite file kept in sync externally.
+if config('DB_REPLICA_HOST', default='') and DB_ENGINE == 'postgresql':
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': config('DB_REPLICA_HOST'),
+        'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+elif config('DB_REPLICA_NAME', default='') and DB_ENGINE != 'postgresql':
+    DATABASES['replica'] = {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': config('DB_REPLICA_NAME'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['butchery.routers.ReplicaRouter']
+REPLICA_DATABASE = 'replica'
+# After writing, a user's reads stay on the primary this long.
+REPLICA_PIN_SECONDS = config('DB_REPLICA_PIN_SECONDS', default=5, cast=int)
+
+# Applied to every SQLite connection as it opens (butchery.database).
+SQLITE_PRAGMAS = {
+    'journal_mode': config('SQLITE_JOURNAL_MODE', default='WAL'),
+    'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT_MS', default=5000, cast=int),
+    'cache_size': config('SQLITE_CACHE_SIZE', default=-20000, cast=int),  # negative = KiB
+    'temp_store': 'MEMORY',
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# Product catalog response cache (butchery.catalog). LocMemCache is per
+# process: point this at a shared alias (FileBasedCache, RedisCache) when
+# running more than one worker.
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 3600
+
+# Low-stock alerts (butchery.notifications) are sent off the request path by
+# this backend; swap in an SMS/email backend with a send(alert) method.
+NOTIFICATION_BACKEND = 'butchery.notifications.LoggingBackend'
+
+# Per-request metrics (butchery.middleware, exposed at /api/metrics/).
+# Requests over either budget are logged as warnings; None disables a budget.
+REQUEST_QUERY_BUDGET = 50
+REQUEST_LATENCY_BUDGET_MS = 500
+
+# Sale pricing (butchery.pricing): tax as a fraction, e.g. 0.16 for 16% VAT.
+# Shelf prices include it by default, so it is carved out of each line.
+SALES_TAX_RATE = config('SALES_TAX_RATE', default='0', cast=Decimal)
+PRICES_INCLUDE_TAX = config('PRICES_INCLUDE_TAX', default=True, cast=bool)
+
+# Offline sync (butchery.sync): rows written in the last few seconds wait for
+# the next sync; deletions are kept this many days for clients to catch up.
+SYNC_SETTLE_SECONDS = 2
+SYNC_TOMBSTONE_DAYS = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -132,15 +231,40 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'butchery.authentication.CachedJWTAuthentication',  # for JWT, tried first
         'rest_framework.authentication.SessionAuthentication',   # for browsable API
-        'rest_framework.authentication.BasicAuthentication',     # optional
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # for JWT
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'butchery.renderers.FastJSONRenderer',  # orjson when installed
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'butchery.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'butchery.pagination.KeysetCursorPagination',
+    'PAGE_SIZE': 50,
 }
+
+# JSON encoding for API responses (butchery.renderers): "orjson" uses it when
+# installed, "stdlib" forces the standard library.
+JSON_BACKEND = config('JSON_BACKEND', default='orjson')
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),  
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),   
-}
\ No newline at end of file
+    'TOKEN_OBTAIN_SERIALIZER': 'butchery.authentication.RoleTokenObtainPairSerializer',
+}
+
+# JWT users are cached between requests (butchery.authentication) and
+# dropped from the cache whenever the User row is saved.
+AUTH_USER_CACHE_ALIAS = 'default'
+AUTH_USER_CACHE_TIMEOUT = 60
+
+# HTTP Basic is only accepted by /api/token/basic/, which exchanges the
+# credentials for a token pair; off unless enabled, and throttled per client.
+BASIC_AUTH_ENABLED = config('BASIC_AUTH_ENABLED', default=False, cast=bool)
+BASIC_AUTH_RATE = '5/minute'
\ No newline at end of file
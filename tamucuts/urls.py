@@ -5,8 +5,9 @@ from butchery.views import (
     UserViewSet, ProductViewSet,
     OrderViewSet, OrderItemViewSet, 
     ScaleReadingViewSet, StockNotificationViewSet,
-    StockTransactionViewSet ,DailyReportView , SalesInsightViewSet)
+    StockTransactionViewSet ,DailyReportView , SalesInsightViewSet, JobViewSet, MetricsView, PriceQuoteView, BasicTokenView, SyncView, OfflineSalesView)
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from butchery import async_views
 
 router = routers.DefaultRouter()
 router.register(r'users', UserViewSet)
@@ -17,6 +18,7 @@ router.register(r'scale-readings', ScaleReadingViewSet)
 router.register(r'sales-insights', SalesInsightViewSet)
 router.register(r'notifications', StockNotificationViewSet)
 router.register(r'stock-transactions', StockTransactionViewSet)
+router.register(r'jobs', JobViewSet)
 
 
 urlpatterns = [
@@ -24,5 +26,15 @@ urlpatterns = [
     path("api/", include(router.urls)),
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"), 
+    path("api/token/basic/", BasicTokenView.as_view(), name="token_basic"),
     path("api/reports/<str:date>/",DailyReportView.as_view(),name="daily_report"),
+    path("api/pricing/quote/", PriceQuoteView.as_view(), name="price_quote"),
+    path("api/metrics/", MetricsView.as_view(), name="metrics"),
+    path("api/sync/", SyncView.as_view(), name="sync"),
+    path("api/sync/sales/", OfflineSalesView.as_view(), name="sync_sales"),
+    # Async read endpoints; serve with an ASGI server (see tamucuts/asgi.py).
+    path("api/async/products/", async_views.product_catalog, name="async_products"),
+    path("api/async/reports/<str:date>/", async_views.daily_report, name="async_daily_report"),
+    path("api/async/scale-readings/", async_views.scale_reading_feed, name="async_scale_readings"),
+    path("api/async/live/", async_views.live_feed, name="live_feed"),
 ] + router.urls